@@ -2,14 +2,34 @@ import snap7
 from snap7.util import get_int, get_bool
 import time
 import math
+import random
+import struct
 import csv
 import gzip
 import glob
 import os
+import socket
+import http.client
+import urllib.parse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sqlite3
+import hashlib
+import secrets
+import contextlib
 from datetime import datetime, timedelta
 from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.client.write_api import WriteOptions
 import threading
+import functools
+import heapq
+import bisect
+import itertools
+import multiprocessing
+import multiprocessing.connection
+from multiprocessing import shared_memory, resource_tracker
+from collections import deque
 import numpy as np
 import sys
 import pystray
@@ -85,10 +105,237 @@ CRANES = [
 CSV_FILE = 'crane_kpi_log.csv'
 RAW_DATA_DIR = 'raw_plc_data'  # Raw PLC samples saved here (gzip compressed)
 RAW_RETENTION_DAYS = 90        # Auto-move raw files older than this to backups
-IDLE_POLL_RATE = 0.5    # Seconds between checks when idle
+IDLE_POLL_RATE = 0.5    # Seconds between fault / flight-recorder checks when idle
 ACTIVE_POLL_RATE = 0.1  # Version 3.0.0 - QC SCR Dedicated Hoist & Manual Operation Algorithm V3.0
 SPEED_THRESHOLD = 50    # Minimum speed to trigger 'movement' event
 
+# Pre-trigger: idle cranes are probed on the speed-order word only (one 2-byte read),
+# so motion is seen within IDLE_PROBE_RATE instead of IDLE_POLL_RATE. A nonzero order
+# still below the trigger threshold arms full-rate sampling into a short ring that is
+# prepended to the event, so the acceleration ramp (largest torque_deriv) is kept.
+IDLE_PROBE_RATE = 0.1   # Seconds between order-only probes when idle
+# The prepended samples add to the per-sample damage but not to `duration`: the 3.0 s / 1.5 s
+# "too short" filters and the QC duration term count from the trigger, as before pre-trigger,
+# so event counts and damage stay comparable with the history. Raw files mark them ('pre').
+PRETRIGGER_ARM = 5      # ARMGC |order| above this (below SPEED_THRESHOLD) arms pre-trigger sampling
+PRETRIGGER_S = 1.0      # Seconds of armed samples kept for prepending
+
+# Acquisition threading. "pool": IDLE_WORKERS threads round-robin the idle probe over
+# all cranes and a moving crane gets its own capture thread (max ACTIVE_SLOTS).
+# "threads": the original one-thread-per-crane loop.
+# "processes": CRANES split over ACQUISITION_PROCESSES worker processes (own GIL each),
+# each running the pool scheduler; the parent supervises them and owns CSV + InfluxDB.
+ACQUISITION_MODE = "pool"
+IDLE_WORKERS = 8        # Shared idle scanners (snap7 reads release the GIL while waiting)
+ACTIVE_SLOTS = 64       # Max concurrent captures; keep >= len(CRANES), a crane waiting for a slot loses samples
+SCHEDULER_REPORT_S = 300  # Period of the scheduler lateness/fairness summary
+ACQUISITION_PROCESSES = 4   # Worker processes in "processes" mode
+WORKER_RESTART_S = 5.0      # Delay before a dead worker process is restarted
+SHARD_STATS_S = 60          # Period workers forward their PLC link stats to the parent
+
+# Multi-node ownership. With LEASE_DB set (SQLite file on storage every logger host can
+# reach), each instance only monitors the cranes it holds a lease on, spread over the live
+# instances by rendezvous hashing. Leases are renewed every LEASE_RENEW_S and lapse after
+# LEASE_TTL_S, so a dead host's cranes move to the survivors. Lease mode runs the pool
+# scheduler. Hosts must be NTP-synced: LEASE_GUARD_S has to cover their clock skew.
+LEASE_DB = None             # e.g. r"\\pdm-nas\cranepdm\leases.sqlite"; None = one instance owns all CRANES
+NODE_ID = os.environ.get("CRANEPDM_NODE") or socket.gethostname()
+LEASE_TTL_S = 20.0          # Lease lifetime without renewal
+LEASE_RENEW_S = 5.0         # Heartbeat / renew period
+LEASE_GUARD_S = 5.0         # Stop acquiring and writing this long before our lease expires
+
+# Hot restart (pool mode, no LEASE_DB): the running instance listens on HANDOFF_PORT. A new
+# instance (update_exe.ps1) connects, samples with captures held and output fenced until
+# its PLC sessions are up, then takes over: events in flight are carried over and finished
+# by the successor, so a restart costs one longer sample interval instead of lost events.
+HANDOFF_PORT = 47651        # localhost only
+# The handoff (and broker) listeners unpickle what they receive, so the key is what keeps other
+# local processes out: random per install, created on first use in IPC_KEY_FILE (in the user's
+# profile, so only this Windows account can read it). CRANEPDM_IPC_KEY (hex) overrides it.
+IPC_KEY_FILE = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "CranePdMLogger", "ipc.key")
+HANDOFF_WARMUP_S = 30.0     # Max time the successor spends connecting before it takes over
+HANDOFF_TIMEOUT_S = 10.0    # Max wait for the predecessor's carry-over state
+HANDOFF_QUIESCE_S = 2.0     # Max wait for the predecessor's sampling threads to stop
+
+# Local PLC broker: diagnostic tools (scripts/maintenance/plc_read.py) read through the
+# logger's own S7 sessions instead of opening extra connections to PLCs with few slots.
+# Not available in "processes" mode (the sessions live in the worker processes).
+BROKER_PORT = 47652         # localhost only; None disables the broker (authkey: IPC_KEY_FILE)
+BROKER_READ_RATE = 2.0      # On-demand reads per second per crane (token bucket)
+BROKER_READ_BURST = 5       # Token bucket size
+BROKER_MAX_BYTES = 512      # Largest on-demand read
+BROKER_READ_TIMEOUT_S = 2.0
+BROKER_QUEUE = 2000         # Live samples buffered per subscriber; a slow one loses the oldest
+
+# Shared-memory sample bus: every probe / sample also goes into a per-crane ring of fixed
+# 23-byte records (FlightRecorder.DTYPE) that local processes read in place (SampleBusReader).
+SAMPLE_BUS = True
+BUS_PREFIX = "cranepdm_bus_"   # Segment name = prefix + crane id
+BUS_CAPACITY = 4096            # Records per crane (~7 min at ACTIVE_POLL_RATE)
+
+# Grafana Live push: low-rate live state per crane (moving, speed, position, running damage
+# of the event in progress, latest fault) for live panels that update without querying
+# InfluxDB. A panel subscribes to stream/<GRAFANA_LIVE_STREAM>/crane_<id>. Best effort:
+# updates are dropped while Grafana is unreachable. See DASHBOARD_GUIDE.md.
+GRAFANA_URL = "http://localhost:3000"
+GRAFANA_LIVE_TOKEN = os.environ.get("CRANEPDM_GRAFANA_TOKEN")  # Service account token (Editor); None disables
+GRAFANA_LIVE_STREAM = "cranepdm"
+LIVE_PUSH_S = 1.0           # Push period; a crane is sent when its state changed
+LIVE_KEEPALIVE_S = 10.0     # Unchanged cranes are re-sent this often (new subscribers, stale check)
+LIVE_PUSH_TIMEOUT_S = 2.0
+
+# Fleet state service: per-crane aggregates (daily / rolling damage, top-N, last event and
+# fault) kept in memory from every logged event and served as JSON on FLEET_PORT, so
+# "top 5 risk cranes today" needs no Flux pivot over crane_movement. Rebuilt from CSV_FILE
+# at startup. Endpoints: /fleet, /fleet/<crane_id>, /top?n=5&by=damage_today, /health.
+FLEET_HOST = "127.0.0.1"    # "0.0.0.0" to let a Grafana JSON datasource on another host query it
+FLEET_PORT = 47653          # None disables the service
+FLEET_DAYS = 30             # Daily aggregates kept per crane
+FLEET_ROLLING_H = (1, 24)   # Rolling damage windows (hours)
+
+# Rail damage cube: calculate_kpis spreads every ARMGC sample's damage and shock over
+# RAIL_BIN_M wide gantry position bins ('rail_bins'); RailCube sums them per crane x day x
+# bin x loaded/empty in RAIL_CUBE_DB and every RAIL_FLUSH_S writes the touched cells' day
+# totals as rail_cube points (timestamp = local midnight, so a rewrite overwrites). Rail
+# heatmaps over months read these sparse points instead of one peak_shock_pos per event.
+RAIL_BIN_M = 10                     # Bin width (m); changing it needs a fresh RAIL_CUBE_DB
+RAIL_CUBE_DB = 'rail_cube.sqlite'   # None disables the cube
+RAIL_FLUSH_S = 60.0                 # Pending cells are persisted and written this often
+
+# Rail anomaly detection on the cube (RailAnomalyDetector): cranes of one block share its
+# rails, so a bin where several of them shock harder than they do elsewhere is a rail
+# site, not a crane fault. Runs once a day over the completed days (scan() = full history).
+RAIL_ANOMALY_WINDOW_D = 7       # Trailing days pooled per crane x bin
+RAIL_ANOMALY_MIN_SAMPLES = 20   # Samples a crane needs in a bin (within the window) to count
+RAIL_ANOMALY_RATIO = 1.5        # Bin mean shock / the crane's median bin mean shock = elevated
+RAIL_ANOMALY_CRANES = 3         # Elevated cranes needed (capped at the block size) ...
+RAIL_ANOMALY_SHARE = 0.5        # ... and at least this share of the cranes with data in the bin
+RAIL_RECOVER_D = 7              # Consecutive normal days (with data) before a site counts as recovered
+
+# Rainflow counting of reel torque: calculate_kpis / calculate_kpis_qc count each event's load
+# reversals (4-point rainflow over the torque turning points) into a range x mean histogram
+# of torque-% bins ('rainflow'), written with the event as rainflow_cycles and rainflow_damage
+# = sum(cycles x range^RAINFLOW_SN_K) / 1e6, the reversal-based alternative to the per-sample
+# |torque|^3 x |speed| Base Fatigue. RainflowStore sums the histograms per crane x day in
+# RAINFLOW_DB; S-N damage for another slope or mean correction is derived from those
+# (scripts/analysis/rainflow_fatigue.py, which also benchmarks the stage).
+RAINFLOW_RANGE_STEP = 5         # Cycle range bin width (torque %)
+RAINFLOW_MEAN_STEP = 20         # Cycle mean bin width (torque %)
+RAINFLOW_SN_K = 3.0             # S-N slope of rainflow_damage (cube law as Base Fatigue; ISO 6336 bending ~6.2)
+RAINFLOW_DB = 'rainflow.sqlite' # None disables the stage
+RAINFLOW_FLUSH_S = 60.0         # Pending histogram cells are persisted this often
+
+# Spectral features of the reel drive signals: each event's speed / current / torque are
+# resampled onto a uniform ACTIVE_POLL_RATE grid, cut into Hann windows (50 % overlap) and
+# FFT'd; per signal the event gets its AC rms, the dominant frequency and the share of AC
+# power in each SPECTRAL_BANDS_HZ band ('spectral', written as sp_<signal>_<feature> fields).
+# Periodic content (gear mesh / tooth defects, cable sag oscillation) shows up here while the
+# time-domain penalties average it away. spectral_features() takes a batch of events and
+# runs one FFT over all their windows (replays: scripts/analysis/spectral_features.py).
+SPECTRAL_SIGNALS = ('speed', 'current', 'torque')  # Order of the DB170 / DB180 tuple
+SPECTRAL_WINDOW = 32            # Samples per FFT window (3.2 s at 10 Hz: 0.31 Hz resolution)
+SPECTRAL_BANDS_HZ = ((0.0, 0.5), (0.5, 1.5), (1.5, 3.0), (3.0, 5.0))  # None disables the stage
+
+# Streaming anomaly score (AnomalyScorer): per crane and loaded/empty, an EWMA mean / variance
+# of each ANOMALY_METRICS value over about ANOMALY_SPAN events (O(1) state). Each event is
+# scored against its baseline before being folded in: a z per metric, and anomaly_score =
+# the largest z, written with the event (V26_VALIDATION.md: >= 1.5 sigma). Outliers move the
+# baseline only as far as ANOMALY_CLIP sigma, so a developing failure does not become normal.
+ANOMALY_METRICS = ('reducer_damage', 'peak_shock', 'shock_penalty', 'curr_penalty')
+ANOMALY_LOG_METRICS = ('reducer_damage', 'peak_shock')  # Heavy-tailed: scored as log(1 + x)
+ANOMALY_SPAN = 200              # EWMA span (events per crane and load state)
+ANOMALY_WARMUP = 30             # Events before a baseline scores
+ANOMALY_CLIP = 3.0              # Sigma an outlier is clipped to before it updates the baseline
+ANOMALY_STATE_FILE = 'anomaly_state.json'  # Baselines survive restarts; None disables scoring
+ANOMALY_SAVE_S = 60.0           # Changed baselines are saved this often (and at shutdown)
+
+# Edge alerting (AlertEngine): ALERT_RULES are evaluated in LiveSink on every event and fault
+# edge as it is written, so no Grafana alert has to poll Flux. Rules fire per crane. A
+# (rule, crane) that fired is notified again at most every ALERT_REPEAT_S (the repeats in
+# between are counted into the next notification) and at most ALERT_RATE_PER_MIN
+# notifications go out per minute in total. A delivery thread hands them to ALERT_SINKS, so
+# a slow webhook never stalls the output stage. Evaluation cost is reported every ALERT_REPORT_S.
+#   "on": "event" - "metric" (any KPI, incl. anomaly_score) at or "above" / "below" a value,
+#                   "count" matches within "window_s" (default 1: every match); or "sum_above":
+#                   the metric summed over "window_s"
+#   "on": "fault" - edges of "fault" ("*" = any), "count" within "window_s" or per shift ("window": "shift")
+#   optional: "type" ("ARMGC" / "QC") limits the cranes, "severity" is passed through
+ALERT_RULES = [
+    {"name": "shock25_burst", "on": "event", "metric": "peak_shock", "above": 25.0, "count": 5, "window_s": 3600,
+     "severity": "warning"},
+    {"name": "anomaly_high", "on": "event", "metric": "anomaly_score", "above": 3.0, "severity": "warning"},
+    {"name": "slack_per_shift", "on": "fault", "fault": "Cable_Reel_Slack", "count": 3, "window": "shift",
+     "severity": "critical"},
+]
+SHIFT_STARTS = (6, 14, 22)      # Local hours a shift starts ("window": "shift")
+ALERT_REPEAT_S = 1800.0         # Same rule + crane is re-notified at most this often
+ALERT_RATE_PER_MIN = 20         # Global notification budget (token bucket)
+ALERT_SINKS = [{"type": "file", "path": "alerts.jsonl"}]  # + {"type": "webhook", "url": "http://127.0.0.1:9099/alert"}
+ALERT_QUEUE = 1000              # Undelivered notifications kept (oldest dropped beyond)
+ALERT_WEBHOOK_TIMEOUT_S = 3.0
+ALERT_REPORT_S = 3600           # Period of the rule evaluation cost summary
+
+# Damage ledger (DamageLedger): Miner's-rule consumption per reducer part. Every event's
+# reducer_damage is added to its crane's component (ARMGC CableReel / QC SpreaderCable) for
+# the part installed at that time; a maintenance reset starts a new part. Daily sums per part
+# are kept in LEDGER_DB (resets, rebuild from the CSV and re-scoring from raw_plc_data:
+# scripts/maintenance/damage_ledger.py). Totals and the remaining-life projection are served
+# from memory on FLEET_PORT: /ledger (fleet, soonest end of life first), /ledger/<crane_id>.
+LEDGER_DB = 'damage_ledger.sqlite'  # None disables the ledger
+LEDGER_LIFE = {"CableReel": 1.0e8, "SpreaderCable": 2.0e6}  # Damage at end of life; placeholders until
+                                                             # `damage_ledger.py calibrate` has failed parts
+LEDGER_RATE_D = 30              # Completed days the damage rate projection averages
+LEDGER_FLUSH_S = 60.0           # Pending daily sums are persisted (and totals reloaded) this often
+
+# InfluxDB query cache: caching proxy in front of INFLUX_URL for Grafana and the maintenance
+# scripts (point their InfluxDB URL at QUERY_CACHE_PORT). POST /api/v2/query is answered from
+# memory / QUERY_CACHE_DIR, keyed by the normalized Flux with its time range made absolute
+# and snapped to QUERY_ALIGN steps, so every refresh of a panel by every viewer maps to one
+# entry. The TTL grows with the age of the range end. Entries whose range covers newly
+# written points are dropped: this logger's own batches, and writes / deletes sent through
+# the proxy. Other endpoints pass through. GET /cache/stats, POST /cache/flush (both need an
+# Authorization header InfluxDB accepts, like every other endpoint behind the proxy).
+QUERY_CACHE_HOST = "127.0.0.1"  # "0.0.0.0" for Grafana in Docker (datasource URL http://host.docker.internal:<port>)
+QUERY_CACHE_PORT = 8087         # None disables the proxy
+QUERY_CACHE_MEM_MB = 128
+QUERY_CACHE_DIR = 'query_cache' # Long-lived entries are also kept here (survive restarts)
+QUERY_CACHE_DISK_MB = 1024
+QUERY_CACHE_ENTRY_MB = 16       # Larger results are passed through uncached
+QUERY_CACHE_TTL = ((3600, 15.0), (86400, 300.0), (7 * 86400, 3600.0), (None, 86400.0))  # (range end age <= s, TTL s)
+QUERY_CACHE_DISK_TTL_S = 3600.0 # Entries with at least this TTL are written to disk
+QUERY_CACHE_MIN_FRESH_S = 5.0   # A write does not drop an entry younger than this (events arrive constantly)
+QUERY_ALIGN = ((3600, 10), (86400, 60), (7 * 86400, 300), (35 * 86400, 900), (None, 3600))  # (range <= s, snap step s)
+
+# Fault flight recorder: per-crane fixed-size ring of recent samples, fed in both idle
+# and active states. A fault edge freezes the pre-fault window plus a post-fault window
+# into raw_plc_data/{date}/faults/. Memory per crane is fixed (see FlightRecorder.nbytes).
+RECORDER_RATE = 1.0     # Seconds between recorder samples (idle and active); idle full reads cost PLC load
+RECORDER_PRE_S = 30.0   # Seconds of history frozen before a fault edge
+RECORDER_POST_S = 10.0  # Seconds captured after a fault edge
+
+# PLC connection management (per crane): exponential backoff with jitter, a circuit
+# breaker that parks unreachable PLCs (e.g. crane down for maintenance) behind a slow
+# health probe, and staggered first connects so 50 PLCs are not dialled at once.
+RECONNECT_BASE_S = 2.0      # First retry delay after a failure (doubles per failure)
+RECONNECT_MAX_S = 120.0     # Backoff ceiling
+LINK_STABLE_S = 60.0        # A link up this long before failing restarts the backoff
+BREAKER_FAILURES = 10       # Consecutive failures before the PLC is parked
+BREAKER_PROBE_S = 600.0     # Health-probe interval while parked
+CONNECT_STAGGER_S = 0.25    # Startup spacing between cranes' first connects
+CONNECT_SETTLE_S = 1.0      # Pause between a fresh session and its first read
+LINK_REPORT_S = 3600        # Period of the connection stats summary
+
+# DB59 fault bits, scanned every cycle with ONE read covering all mapped bytes.
+# Adding a fault is a config entry here: DB59.DBX<byte>.<bit> (see AI_GUIDE.md).
+FAULT_DB = 59
+FAULT_MAP = [
+    {"name": "Cable_Reel_Slack", "byte": 126, "bit": 0},
+    {"name": "Land_Fault_XT", "byte": 202, "bit": 3},
+    {"name": "Land_Fault_YT", "byte": 202, "bit": 4},
+    {"name": "Land_Fault_YD", "byte": 202, "bit": 5},
+    {"name": "SPSS_Trolley_Dir_Not_Clear", "byte": 212, "bit": 6},
+]
+
 # V2.6: Geo-fence / hotspot map removed. Position is observational only.
 # Rail condition is surfaced via Grafana Rail Heatmap + anomaly alerts, not
 # baked into the damage formula. The measured shock/current penalties already
@@ -100,10 +347,23 @@ INFLUX_URL = "http://localhost:8086"
 INFLUX_TOKEN = "my-super-secret-auth-token"
 INFLUX_ORG = "myorg"
 INFLUX_BUCKET = "cranepdm_kpis"
+INFLUX_BATCH_SIZE = 500       # Points per batched write
+INFLUX_FLUSH_MS = 1000        # Max time a point waits in the batch
+
+def on_influx_write_error(conf, data, exception):
+    sync_print(f"[!] InfluxDB batch write error: {exception}")
+
+def on_influx_write_ok(conf, data):
+    if QUERY_CACHE_PORT:
+        QUERY_CACHE.written(conf[0], *line_protocol_span(data, conf[2]))
 
 # Initialize InfluxDB Client
+# Batched output path: events/faults from all crane threads are queued and written by
+# the client's background writer, so a slow InfluxDB never stalls PLC sampling.
 influx_client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
-write_api = influx_client.write_api(write_options=SYNCHRONOUS)
+write_api = influx_client.write_api(
+    write_options=WriteOptions(batch_size=INFLUX_BATCH_SIZE, flush_interval=INFLUX_FLUSH_MS),
+    success_callback=on_influx_write_ok, error_callback=on_influx_write_error)
 
 def init_csv():
     # Write header if file doesn't exist
@@ -118,20 +378,21 @@ def init_csv():
                 'start_pos', 'end_pos', 'avg_pos'
             ])
 
-def save_raw_event(crane_id, orders, feedbacks, loads, weights, positions, dt_list, db170_list):
-    """Save raw PLC samples to daily gzip-compressed CSV file."""
+def save_raw_event(crane_id, orders, feedbacks, loads, weights, positions, dt_list, db170_list, ts=None,
+                   pretrigger=0):
+    """Save raw PLC samples to daily gzip-compressed CSV file (the first `pretrigger` rows have pre = 1)."""
+    ts = ts or datetime.now()
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = ts.strftime('%Y-%m-%d')
         day_dir = os.path.join(RAW_DATA_DIR, today)
         os.makedirs(day_dir, exist_ok=True)
         
-        ts = datetime.now().strftime('%H%M%S')
-        filename = os.path.join(day_dir, f"{crane_id}_{ts}.csv.gz")
+        filename = os.path.join(day_dir, f"{crane_id}_{ts.strftime('%H%M%S')}.csv.gz")
         
         with gzip.open(filename, 'wt', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(['dt', 'order', 'feedback', 'loaded', 'weight', 'position',
-                             'reel_speed', 'reel_current', 'reel_torque'])
+                             'reel_speed', 'reel_current', 'reel_torque', 'pre'])
             for i in range(len(orders)):
                 db170 = db170_list[i] if db170_list and db170_list[i] else (0, 0, 0)
                 writer.writerow([
@@ -139,11 +400,37 @@ def save_raw_event(crane_id, orders, feedbacks, loads, weights, positions, dt_li
                     orders[i], feedbacks[i],
                     1 if loads[i] else 0,
                     weights[i], positions[i],
-                    db170[0], db170[1], db170[2]
+                    db170[0], db170[1], db170[2], 1 if i < pretrigger else 0
                 ])
     except Exception as e:
         sync_print(f"[!] [{crane_id}] Raw save error: {e}")
 
+def fault_snapshot_path(crane_id, fault_name, ts):
+    return os.path.join(RAW_DATA_DIR, ts.strftime('%Y-%m-%d'), 'faults',
+                        f"{crane_id}_{ts.strftime('%H%M%S')}_{fault_name}.csv.gz")
+
+def save_fault_snapshot(crane_id, path, t_fault, records):
+    """Save a frozen flight-recorder window (gzip CSV, t_rel = seconds from the fault edge)."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['t_rel', 'order', 'feedback', 'loaded', 'weight', 'position',
+                             'reel_speed', 'reel_current', 'reel_torque', 'db170_valid', 'fault'])
+            for r in records:
+                flags = int(r['flags'])
+                writer.writerow([
+                    round(float(r['t']) - t_fault, 3),
+                    int(r['order']), int(r['feedback']),
+                    1 if flags & FlightRecorder.FLAG_LOADED else 0,
+                    int(r['weight']), int(r['position']),
+                    int(r['reel_speed']), int(r['reel_current']), int(r['reel_torque']),
+                    1 if flags & FlightRecorder.FLAG_DB170 else 0,
+                    1 if flags & FlightRecorder.FLAG_FAULT else 0
+                ])
+    except Exception as e:
+        sync_print(f"[!] [{crane_id}] Fault snapshot save error: {e}")
+
 def cleanup_old_raw_data():
     """Move raw data directories older than RAW_RETENTION_DAYS to backups folder."""
     backup_base = os.path.join("..", "backups", "raw_plc_data")
@@ -218,6 +505,7 @@ def is_autostart_enabled():
         return False
 
 stop_event = threading.Event()
+handoff_event = threading.Event()  # set with stop_event when exiting for a hot restart
 
 def on_quit(icon, item):
     sync_print("Exiting...")
@@ -256,13 +544,150 @@ def setup_tray():
     icon = pystray.Icon(APP_NAME, image, "Crane PdM Logger", menu)
     return icon
 
-def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_list=None):
+def rainflow(signal):
+    """
+    Rainflow cycles of a signal: (ranges, means, counts), counts 1.0 for full cycles and 0.5
+    for the half cycles of the residue (ASTM E1049). 4-point method over the turning points,
+    vectorized per pass: every inner range no larger than both neighbours is a full cycle,
+    all such (non-adjacent) pairs are removed at once, until none is left.
+    """
+    x = np.asarray(signal, dtype=float)
+    if x.size:
+        x = x[np.concatenate(([True], x[1:] != x[:-1]))]
+    if x.size < 2:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    d = x[1:] - x[:-1]
+    r = x[np.concatenate(([True], d[1:] * d[:-1] < 0, [True]))]  # turning points (and both ends)
+    full_ranges, full_means = [], []
+    while r.size >= 4:
+        span = np.abs(r[1:] - r[:-1])
+        inner = span[1:-1]
+        hit = (inner <= span[:-2]) & (inner <= span[2:])
+        hit[1:] &= ~hit[:-1]  # equal neighbouring ranges: overlapping pairs, take the first
+        i = hit.nonzero()[0] + 1
+        if not i.size:
+            break
+        full_ranges.append(span[i])
+        full_means.append((r[i] + r[i + 1]) / 2)
+        hit = np.concatenate(([False], hit, [False, False]))
+        hit[1:] |= hit[:-1]
+        r = r[~hit]
+    ranges = np.concatenate(full_ranges + [np.abs(r[1:] - r[:-1])])
+    means = np.concatenate(full_means + [(r[1:] + r[:-1]) / 2])
+    counts = np.ones(ranges.size)
+    counts[ranges.size - (r.size - 1):] = 0.5
+    return ranges, means, counts
+
+def rainflow_kpis(torques):
+    """Rainflow fields of one event's torque signal (see RAINFLOW_DB); {} when the stage is off."""
+    if not RAINFLOW_DB:
+        return {}
+    ranges, means, counts = rainflow(torques)
+    if not ranges.size:
+        return {'rainflow': {}, 'rainflow_cycles': 0.0, 'rainflow_damage': 0.0}
+    rbin = (ranges // RAINFLOW_RANGE_STEP).astype(np.int64)
+    mbin = (means // RAINFLOW_MEAN_STEP).astype(np.int64)
+    mlow = int(mbin.min())
+    width = int(mbin.max()) - mlow + 1
+    cycles = np.bincount(rbin * width + (mbin - mlow), weights=counts)
+    cells = np.flatnonzero(cycles)
+    hist = {(int(c // width) * RAINFLOW_RANGE_STEP, int(c % width + mlow) * RAINFLOW_MEAN_STEP): float(n)
+            for c, n in zip(cells.tolist(), cycles[cells].tolist())}
+    return {
+        'rainflow': hist,
+        'rainflow_cycles': float(counts.sum()),
+        'rainflow_damage': round(float(np.dot(counts, ranges ** RAINFLOW_SN_K)) / 1e6, 4),
+    }
+
+@functools.lru_cache(maxsize=4)
+def spectral_basis(width, step, bands_hz):
+    """Hann window (width x 1), bin frequencies without DC, and the bin -> band 0/1 matrix."""
+    freqs = np.fft.rfftfreq(width, step)[1:]
+    bands = np.array([(freqs >= lo) & (freqs < hi) for lo, hi in bands_hz], dtype=float).T
+    return np.hanning(width)[:, None], freqs, bands
+
+def spectral_features(events):
+    """
+    Batched spectral features. `events`: [(dt_list, samples)], samples = per-sample
+    (speed, current, torque) tuples. Returns (rms, peak_hz, shares) arrays shaped
+    (events, signals) and (events, signals, bands); see SPECTRAL_BANDS_HZ.
+    """
+    step, width = ACTIVE_POLL_RATE, SPECTRAL_WINDOW
+    hop = width // 2
+    dts, rows, lengths = [], [], []
+    for dt_list, samples in events:
+        n = min(len(samples), len(dt_list))
+        if n < 2:  # a single sample: hold it for one step
+            dt_list, samples, n = (step, step), (samples[0], samples[0]), 2
+        dts.append(dt_list[:n])
+        rows.append(samples[:n])
+        lengths.append(n)
+    # Concatenate the batch; every step below is one array operation over all events
+    lengths = np.array(lengths)
+    first = np.cumsum(lengths) - lengths
+    last = first + lengths - 1
+    x = np.fromiter(itertools.chain.from_iterable(itertools.chain.from_iterable(rows)), dtype=float)
+    x = x.reshape(lengths.sum(), -1)
+    dt = np.fromiter(itertools.chain.from_iterable(dts), dtype=float)
+    t = np.cumsum(np.where(dt > 0, dt, step))
+    # Uniform grid per event, linear interpolation of all signals at once
+    m = np.floor((t[last] - t[first]) / step + 0.5).astype(np.int64) + 1
+    grid_first = np.cumsum(m) - m
+    owner = np.repeat(np.arange(len(m)), m)
+    grid = t[first][owner] + step * (np.arange(m.sum()) - grid_first[owner])
+    i = np.clip(np.searchsorted(t, grid, side='right'), first[owner] + 1, last[owner])
+    y = x[i - 1] + (x[i] - x[i - 1]) * np.clip((grid - t[i - 1]) / (t[i] - t[i - 1]), 0.0, 1.0)[:, None]
+    # Windows with 50 % overlap; an event shorter than a window holds its last value
+    n_frames = 1 + np.maximum(m - width, 0) // hop
+    starts = np.cumsum(n_frames) - n_frames
+    owner = np.repeat(np.arange(len(m)), n_frames)
+    idx = (grid_first[owner] + hop * (np.arange(n_frames.sum()) - starts[owner]))[:, None] + np.arange(width)
+    frames = y[np.minimum(idx, (grid_first + m - 1)[owner][:, None])]  # (windows, width, signals)
+    frames -= frames.mean(axis=1, keepdims=True)
+    counts = n_frames[:, None]
+    window, freqs, bands = spectral_basis(width, step, SPECTRAL_BANDS_HZ)
+    power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+    power = np.add.reduceat(power, starts, axis=0)[:, 1:] / counts[:, :, None]  # (events, bins w/o DC, signals)
+    power = power.transpose(0, 2, 1)  # (events, signals, bins)
+    total = power.sum(axis=2)
+    shares = np.divide(power @ bands, total[:, :, None], out=np.zeros(total.shape + (bands.shape[1],)),
+                       where=total[:, :, None] > 0)
+    rms = np.sqrt(np.add.reduceat((frames ** 2).mean(axis=1), starts, axis=0) / counts)
+    # Dominant frequency, refined between bins by a parabola through the peak and its neighbours
+    k = power.argmax(axis=2)
+    e, j = np.ogrid[:len(power), :power.shape[1]]
+    a, b, c = power[e, j, np.maximum(k - 1, 0)], power[e, j, k], power[e, j, np.minimum(k + 1, len(freqs) - 1)]
+    curve = a - 2 * b + c
+    shift = np.clip(np.divide(0.5 * (a - c), curve, out=np.zeros_like(curve), where=curve < 0), -0.5, 0.5)
+    peak_hz = np.where(total > 0, freqs[k] + shift * (freqs[1] - freqs[0]), 0.0)
+    return rms, peak_hz, shares
+
+def spectral_kpis(dt_list, samples):
+    """Spectral fields of one event (see SPECTRAL_BANDS_HZ); {} when the stage is off."""
+    if not SPECTRAL_BANDS_HZ or not samples:
+        return {}
+    rms, peak_hz, shares = spectral_features([(dt_list, samples)])
+    return {'spectral': spectral_dict(rms[0], peak_hz[0], shares[0])}
+
+def spectral_dict(rms, peak_hz, shares):
+    """One event's feature arrays -> {'<signal>_rms' / '<signal>_peak_hz' / '<signal>_b<band>': value}."""
+    features = {}
+    for j, signal in enumerate(SPECTRAL_SIGNALS):
+        features[f"{signal}_rms"] = round(float(rms[j]), 2)
+        features[f"{signal}_peak_hz"] = round(float(peak_hz[j]), 3)
+        for k in range(len(SPECTRAL_BANDS_HZ)):
+            features[f"{signal}_b{k}"] = round(float(shares[j, k]), 4)
+    return features
+
+def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_list=None, pretrigger=0):
     """
     V2.6 Physical Model — Pure measurement-driven damage, no position weighting.
     Cable Reel Drive Data (Torque, Speed, Current) only.
     If db170_list is unavailable (DB not mapped), event is skipped.
     Rail hotspots are diagnosed at the Grafana layer (Rail Heatmap) using the
-    `peak_shock` × `peak_shock_pos` fields, not via in-formula penalties.
+    per-sample position bins in `rail_bins` (bin start m -> [damage, shock sum,
+    shock max, samples], summed by RailCube), not via in-formula penalties.
+    The first `pretrigger` samples count toward damage but not toward `duration`.
     """
     if not orders or len(orders) < 2:
         return None
@@ -307,6 +732,7 @@ def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_
     peak_shock_pos = positions[0] if positions else 0.0
     peak_order = max(map(abs, orders))
     peak_fb = max(map(abs, feedbacks))
+    rail_bins = {}
 
     for i in range(1, len(orders)):
         dt = dt_list[i] if dt_list[i] > 0 else 0.1
@@ -367,9 +793,19 @@ def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_
         if raw_shock > peak_shock:
             peak_shock = raw_shock
             peak_shock_pos = positions[i]
+        # Rail cube: this sample's share at its own position (not just the event peak)
+        rail_bin = int(positions[i] // RAIL_BIN_M) * RAIL_BIN_M
+        cell = rail_bins.get(rail_bin)
+        if cell is None:
+            cell = rail_bins[rail_bin] = [0.0, 0.0, 0.0, 0]
+        cell[0] += instant_damage
+        cell[1] += raw_shock
+        if raw_shock > cell[2]:
+            cell[2] = raw_shock
+        cell[3] += 1
 
     rms_error = math.sqrt(sum_sq_err / len(orders))
-    event_duration = sum(dt_list)
+    event_duration = sum(dt_list[pretrigger:])  # from the trigger (PRETRIGGER_S)
     # V2.6.1: per-sample 평균 (B 가중 집계 미적용, A 만 유지)
     if shock_list:
         avg_shock = sum(shock_list) / len(shock_list)
@@ -381,6 +817,7 @@ def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_
     return {
         'algo_version': '3.0.0',
         'duration': round(event_duration, 2),
+        'pretrigger': pretrigger,  # leading samples before the trigger (raw archive 'pre')
         'peak_order': peak_order,
         'peak_fb': peak_fb,
         'max_error': max_err,
@@ -395,19 +832,23 @@ def calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_
         'track_penalty': round(avg_track, 3),
         'start_pos': positions[0],
         'end_pos': positions[-1],
-        'avg_pos': round(avg_pos, 1)
+        'avg_pos': round(avg_pos, 1),
+        'rail_bins': rail_bins,
+        **rainflow_kpis([v[2] for v in db170_list]),
+        **spectral_kpis(dt_list, db170_list)
     }
 
-def calculate_kpis_qc(orders, feedbacks, loads, weights, positions, dt_list, db180_list):
+def calculate_kpis_qc(orders, feedbacks, loads, weights, positions, dt_list, db180_list, pretrigger=0):
     """
     QC SCR V3.0 Dedicated KPI calculation function.
     Tailored for Hoist (Vertical Lifting) mechanism & Manual Driver Operation.
     Replaces track_penalty with load_factor, and tunes current/shock penalties for Hoist drive.
+    Duration (and the duration term of reducer_damage) excludes the first `pretrigger` samples.
     """
     if not orders or not dt_list or not db180_list:
         return None
         
-    event_duration = sum(dt_list)
+    event_duration = sum(dt_list[pretrigger:])  # from the trigger (PRETRIGGER_S)
     if event_duration <= 0:
         return None
 
@@ -457,6 +898,7 @@ def calculate_kpis_qc(orders, feedbacks, loads, weights, positions, dt_list, db1
     return {
         'algo_version': '3.0.0',
         'duration': round(event_duration, 2),
+        'pretrigger': pretrigger,  # leading samples before the trigger (raw archive 'pre')
         'peak_order': peak_speed,
         'peak_fb': peak_speed,
         'max_error': 0.0,
@@ -472,11 +914,18 @@ def calculate_kpis_qc(orders, feedbacks, loads, weights, positions, dt_list, db1
         'load_factor': round(load_factor, 3),
         'start_pos': 0.0,
         'end_pos': 0.0,
-        'avg_pos': 0.0
+        'avg_pos': 0.0,
+        **rainflow_kpis(torques),
+        **spectral_kpis(dt_list[:len(valid_db180)], valid_db180)
     }
 
-def log_event(crane_id, kpis):
-    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+def stress_index(kpis):
+    """Dashboard Stress Index: shock x current x track (ARMGC) / load factor (QC) penalty."""
+    load_val = float(kpis.get('load_factor', kpis.get('track_penalty', 1.0)))
+    return float(kpis['shock_penalty']) * float(kpis['curr_penalty']) * load_val
+
+def log_event(crane_id, kpis, ts=None):
+    ts = (ts or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
     with open(CSV_FILE, 'a', newline='') as f:
         writer = csv.writer(f)
         writer.writerow([
@@ -503,7 +952,7 @@ def log_event(crane_id, kpis):
         
     try:
         crane_type = "QC" if crane_id.startswith("1") else "ARMGC"
-        component = "SpreaderCable" if crane_type == "QC" else "CableReel"
+        component = component_of(crane_id)
         source_tag = "live_qc_v30" if crane_type == "QC" else "live_v26"
         load_val = float(kpis.get('load_factor', kpis.get('track_penalty', 1.0)))
         
@@ -527,20 +976,31 @@ def log_event(crane_id, kpis):
             .field("curr_penalty", float(kpis['curr_penalty']))
             .field("track_penalty", float(kpis['track_penalty']))
             .field("load_factor", load_val)
+            .field("stress_index", stress_index(kpis))
             .field("start_pos", float(kpis['start_pos']))
             .field("end_pos", float(kpis['end_pos']))
             .field("avg_pos", float(kpis['avg_pos']))
             .field("peak_shock_pos", float(kpis['peak_shock_pos']))
         )
+        if 'rainflow' in kpis:
+            point.field("rainflow_cycles", float(kpis['rainflow_cycles']))
+            point.field("rainflow_damage", float(kpis['rainflow_damage']))
+        for name, value in kpis.get('spectral', {}).items():
+            point.field(f"sp_{name}", float(value))
+        if 'anomaly_score' in kpis:
+            point.field("anomaly_score", float(kpis['anomaly_score']))
+            for metric, z in kpis['anomaly_z'].items():
+                point.field(f"z_{metric}", float(z))
         write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=point)
-        influx_status = "InfluxDB OK"
+        influx_status = "InfluxDB queued"
     except Exception as e:
         influx_status = f"InfluxDB Error: {e}"
 
-    sync_print(f"[{ts}] [{crane_id}] Logged [v{kpis['algo_version']}] | Dur: {kpis['duration']}s | Pos: {kpis['start_pos']}->{kpis['end_pos']} | Dmg: {kpis['reducer_damage']} | {influx_status}")
+    score = f" | Z: {kpis['anomaly_score']:+.2f}" if 'anomaly_score' in kpis else ""
+    sync_print(f"[{ts}] [{crane_id}] Logged [v{kpis['algo_version']}] | Dur: {kpis['duration']}s | Pos: {kpis['start_pos']}->{kpis['end_pos']} | Dmg: {kpis['reducer_damage']}{score} | {influx_status}")
 
-def log_fault_event(crane_id, fault_name, position):
-    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+def log_fault_event(crane_id, fault_name, position, ts=None, snapshot=None):
+    ts = (ts or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
     try:
         point = (
             Point("crane_faults")
@@ -549,275 +1009,3660 @@ def log_fault_event(crane_id, fault_name, position):
             .field("occurred", 1)
             .field("position", float(position))
         )
+        if snapshot:
+            # Flight-recorder file (pre + post fault window), relative to the logger dir
+            point = point.field("snapshot", snapshot.replace(os.sep, '/'))
         write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=point)
         sync_print(f"[FAULT] [{ts}] [{crane_id}] {fault_name} Triggered! Logged at Pos: {position}")
     except Exception as e:
         sync_print(f"[!] [{crane_id}] Fault InfluxDB Error: {e}")
 
-def monitor_qc_spreader(crane_config):
-    crane_id = crane_config['id']
-    ip = crane_config['ip']
-    rack = crane_config['rack']
-    slot = crane_config['slot']
-    
-    QC_SPEED_THRESHOLD = 3  # Sensitive trigger for slower QC spreader reel (tuned from 10 to 3)
-    client = snap7.client.Client()
-    import struct
-    prev_slack = False # Not used but declared for parity
-    
-    while not stop_event.is_set():
+def log_fault_clear(crane_id, fault_name, position, active_s, ts=None):
+    # Separate measurement: existing crane_faults panels count every point as a trigger
+    ts = (ts or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        point = (
+            Point("crane_fault_clear")
+            .tag("crane_id", crane_id)
+            .tag("fault_name", fault_name)
+            .field("active_s", float(active_s))
+            .field("position", float(position))
+        )
+        write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=point)
+        sync_print(f"[FAULT] [{ts}] [{crane_id}] {fault_name} Cleared after {active_s:.1f}s at Pos: {position}")
+    except Exception as e:
+        sync_print(f"[!] [{crane_id}] Fault clear InfluxDB Error: {e}")
+
+# --- Acquisition I/O (clock / PLC source / output sink) ---
+# The monitor state machines below only talk to these three objects, so the same
+# code path runs live (wall clock + snap7) or offline under a virtual clock with
+# recorded or simulated PLC data (scripts/analysis/replay_pipeline.py).
+
+class RealClock:
+    """Wall clock used by the live logger."""
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def now(self):
+        return datetime.now()
+
+class PLCSource:
+    """snap7 session for one ARMGC. Every DB57/58/59/170 read used by monitor_crane lives here."""
+    def __init__(self, ip, rack, slot):
+        self.ip, self.rack, self.slot = ip, rack, slot
+        self.client = snap7.client.Client()
+
+    def connected(self):
+        return self.client.get_connected()
+
+    def connect(self):
+        self.client.connect(self.ip, self.rack, self.slot)
+
+    def disconnect(self):
         try:
-            if not client.get_connected():
-                sync_print(f"[{datetime.now().strftime('%H:%M:%S')}] [{crane_id}] Connecting to QC PLC {ip}...")
-                client.connect(ip, rack, slot)
-                time.sleep(1)
-                continue
-            
-            # Check IDLE state (Poll slowly from DB180)
+            self.client.disconnect()
+        except:
+            pass
+
+    def read_order(self):
+        return get_int(self.client.db_read(57, 8, 2), 0)
+
+    def read_position(self):
+        return get_int(self.client.db_read(57, 200, 2), 0)
+
+    def read_faults(self, start, size):
+        """Raw DB59 bytes [start, start+size) for FaultScanner."""
+        return bytes(self.client.db_read(FAULT_DB, start, size))
+
+    def read_raw(self, area, db, start, size):
+        """On-demand read for the PLC broker: DB<db> or M (marker) bytes."""
+        if area == 'M':
+            return bytes(self.client.mb_read(start, size))
+        return bytes(self.client.db_read(db, start, size))
+
+    def read_sample(self):
+        """Active-mode sample: (order, feedback, locked, weight, position, db170_vals)."""
+        current_order = get_int(self.client.db_read(57, 8, 2), 0)
+        current_fb = get_int(self.client.db_read(57, 10, 2), 0)
+        is_locked = get_bool(self.client.db_read(58, 185, 1), 0, 1)
+        current_wt = get_int(self.client.db_read(57, 48, 2), 0)
+        current_pos = get_int(self.client.db_read(57, 200, 2), 0)
+
+        # Try DB170 (Cable Reel Drive data) on ALL cranes.
+        # If the PLC has not been mapped yet, the read will fail
+        # and db170_vals stays None → 이벤트가 폐기됩니다.
+        db170_vals = None
+        try:
+            db170_data = self.client.db_read(170, 0, 6)
+            db170_vals = (get_int(db170_data, 0), get_int(db170_data, 2), get_int(db170_data, 4))
+        except Exception:
+            db170_vals = None
+        return current_order, current_fb, is_locked, current_wt, current_pos, db170_vals
+
+class QCPLCSource(PLCSource):
+    """snap7 session for one QC. Spreader reel speed/current/torque from DB180."""
+    def read_qc_speed(self):
+        return struct.unpack('>h', self.client.db_read(180, 6, 2))[0]
+
+    def read_qc(self):
+        data = self.client.db_read(180, 0, 12)
+        return (struct.unpack('>h', data[6:8])[0],
+                struct.unpack('>h', data[8:10])[0],
+                struct.unpack('>h', data[10:12])[0])
+
+class SimulatedPLCSource:
+    """
+    Synthetic PLC for dev/test without plant access. Values are a function of clock.time():
+    trapezoidal gantry/spreader moves separated by random idle gaps, noisy reel
+    torque/current, occasional Cable_Reel_Slack pulses. Seeded for reproducible shifts.
+    If `until` is given, `stop` is set once the crane is idle past that time.
+    """
+    MEAN_IDLE_S = 90.0
+    SLACK_PROBABILITY = 0.02
+
+    def __init__(self, crane_id, clock, seed=None, qc=False, until=None, stop=None):
+        self.crane_id = crane_id
+        self.clock = clock
+        self.qc = qc
+        self.until = until
+        self.stop = stop
+        self.rng = random.Random(seed if seed is not None else crane_id)
+        self.is_connected = False
+        self.position = self.rng.uniform(200, 3000)
+        self.move = None
+        self._schedule(clock.time())
+
+    def _schedule(self, after):
+        duration = self.rng.uniform(1.0, 40.0)
+        start = after + self.rng.expovariate(1.0 / self.MEAN_IDLE_S)
+        slack_at = start + self.rng.uniform(0, duration) if self.rng.random() < self.SLACK_PROBABILITY else None
+        self.move = {
+            'start': start,
+            'end': start + duration,
+            'ramp': min(2.0, duration / 3),
+            'peak': self.rng.uniform(8, 60) if self.qc else self.rng.uniform(600, 3000),
+            'sign': self.rng.choice((-1, 1)),
+            'loaded': self.rng.random() < 0.5,
+            'start_pos': self.position,
+            'slack_at': slack_at,
+        }
+
+    def _profile(self, t):
+        """Speed reference at time t (0 when idle). Rolls the move schedule forward."""
+        m = self.move
+        while t >= m['end']:
+            travel = m['peak'] * (m['end'] - m['start'] - m['ramp']) / 600.0
+            self.position = max(0.0, m['start_pos'] + m['sign'] * travel)
+            self._schedule(m['end'])
+            m = self.move
+        if t < m['start']:
+            if self.until is not None and t >= self.until and self.stop is not None:
+                self.stop.set()
+            return 0.0, 0.0
+        # Jerk-limited (smoothstep) ramps like a drive ramp generator
+        ramp = m['ramp']
+        rising = t - m['start'] < m['end'] - t
+        x = min(1.0, min(t - m['start'], m['end'] - t) / ramp)
+        level = x * x * (3 - 2 * x)
+        accel = m['peak'] * 6 * x * (1 - x) / ramp * (1 if rising else -1)
+        return m['sign'] * m['peak'] * level, accel
+
+    def connected(self):
+        return self.is_connected
+
+    def connect(self):
+        self.is_connected = True
+
+    def disconnect(self):
+        self.is_connected = False
+
+    def read_order(self):
+        return int(self._profile(self.clock.time())[0])
+
+    def read_position(self):
+        t = self.clock.time()
+        self._profile(t)
+        m = self.move
+        if t < m['start']:
+            return int(self.position)
+        travel = m['peak'] * (t - m['start']) / 600.0
+        return int(max(0.0, m['start_pos'] + m['sign'] * travel))
+
+    def read_faults(self, start, size):
+        t = self.clock.time()
+        self._profile(t)
+        data = bytearray(size)
+        slack_at = self.move['slack_at']
+        if slack_at is not None and slack_at <= t < slack_at + 2.0:
+            data[126 - start] |= 1  # DB59.DBX126.0 Cable_Reel_Slack
+        return bytes(data)
+
+    def read_raw(self, area, db, start, size):
+        # DB57 order (DBW8) and position (DBW200) as big-endian INTs; everything else reads as 0
+        data = bytearray(size)
+        if area == 'DB' and db == 57:
+            for offset, value in ((8, self.read_order()), (200, self.read_position())):
+                if start <= offset and offset + 2 <= start + size:
+                    struct.pack_into('>h', data, offset - start, max(-32768, min(32767, value)))
+        return bytes(data)
+
+    def _reel(self, speed, accel, scale):
+        torque = (25.0 + 0.01 * abs(accel) * scale) * (1 if speed >= 0 else -1) + self.rng.gauss(0, 2.0)
+        if self.rng.random() < 0.01:
+            torque += self.rng.gauss(0, 40.0)
+        current = 5.0 + 0.3 * abs(torque) + abs(self.rng.gauss(0, 1.0))
+        return int(speed * scale), int(current), int(torque)
+
+    def read_sample(self):
+        t = self.clock.time()
+        order, accel = self._profile(t)
+        feedback, _ = self._profile(t - 0.3) if t - 0.3 >= self.move['start'] else (0.0, 0.0)
+        loaded = self.move['loaded'] and order != 0
+        db170_vals = self._reel(feedback, accel, 3)
+        return int(order), int(feedback), loaded, 25 if loaded else 0, self.read_position(), db170_vals
+
+    def read_qc_speed(self):
+        return int(self._profile(self.clock.time())[0])
+
+    def read_qc(self):
+        speed, accel = self._profile(self.clock.time())
+        return self._reel(speed, accel, 1)
+
+class FaultScanner:
+    """
+    Edge detector for every FAULT_MAP bit. scan() takes the raw DB59 range and XORs it
+    against the previous one, so rising/falling edges for all mapped faults come out of
+    one vectorised pass (and an unchanged bitmap costs a single compare).
+    """
+    def __init__(self, fault_map=None):
+        fault_map = fault_map or FAULT_MAP
+        self.names = [f['name'] for f in fault_map]
+        self.start = min(f['byte'] for f in fault_map)
+        self.size = max(f['byte'] for f in fault_map) - self.start + 1
+        self.byte_idx = np.array([f['byte'] - self.start for f in fault_map], dtype=np.intp)
+        self.masks = np.array([1 << f['bit'] for f in fault_map], dtype=np.uint8)
+        self.prev = np.zeros(self.size, dtype=np.uint8)
+        self.active = np.zeros(len(fault_map), dtype=bool)
+        self.since = np.zeros(len(fault_map))
+
+    def scan(self, data, t):
+        """Returns (rising names, [(falling name, seconds it was active)])."""
+        cur = np.frombuffer(data, dtype=np.uint8, count=self.size)
+        diff = cur ^ self.prev
+        if not diff.any():
+            return [], []
+        self.prev = cur.copy()
+        changed = (diff[self.byte_idx] & self.masks) != 0
+        self.active = (cur[self.byte_idx] & self.masks) != 0
+        rising = np.flatnonzero(changed & self.active)
+        falling = np.flatnonzero(changed & ~self.active)
+        self.since[rising] = t
+        return ([self.names[i] for i in rising],
+                [(self.names[i], t - self.since[i]) for i in falling])
+
+    def any_active(self):
+        return bool(self.active.any())
+
+class FlightRecorder:
+    """
+    Fixed-size ring of recent samples for one crane, rate-limited to RECORDER_RATE.
+    trigger() freezes the last RECORDER_PRE_S seconds; the following RECORDER_POST_S
+    seconds of push() complete the snapshot, which push() then returns once.
+    Edges arriving while a snapshot is still open link to that same snapshot, so
+    memory stays at ring + one frozen copy + post buffer per crane.
+    """
+    DTYPE = np.dtype([('t', 'f8'), ('order', 'i2'), ('feedback', 'i2'), ('weight', 'i2'),
+                      ('position', 'i2'), ('reel_speed', 'i2'), ('reel_current', 'i2'),
+                      ('reel_torque', 'i2'), ('flags', 'u1')])
+    FLAG_LOADED, FLAG_DB170, FLAG_FAULT = 1, 2, 4
+
+    def __init__(self, crane_id, rate=RECORDER_RATE, pre_s=RECORDER_PRE_S, post_s=RECORDER_POST_S):
+        self.crane_id = crane_id
+        self.rate = rate
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.ring = np.zeros(int(math.ceil(pre_s / rate)) + 1, dtype=self.DTYPE)
+        self.post = np.zeros(int(math.ceil(post_s / rate)) + 1, dtype=self.DTYPE)
+        self.count = 0
+        self.last_t = float('-inf')
+        self.pending = None
+
+    @property
+    def nbytes(self):
+        # ring + worst-case frozen pre-window copy + post buffer
+        return 2 * self.ring.nbytes + self.post.nbytes
+
+    def due(self, t):
+        # 1 ms slack so a 0.5 s idle poll is not skipped by scheduling jitter
+        return t - self.last_t >= self.rate - 1e-3
+
+    def push(self, t, sample, fault=False):
+        """Record one (order, fb, locked, weight, pos, db170) sample. Returns a finished snapshot or None."""
+        if not self.due(t):
+            return None
+        order, fb, locked, wt, pos, db170_vals = sample
+        flags = (self.FLAG_LOADED if locked else 0) | (self.FLAG_DB170 if db170_vals else 0) | (self.FLAG_FAULT if fault else 0)
+        rec = (t, order, fb, wt, pos, *(db170_vals or (0, 0, 0)), flags)
+        self.ring[self.count % len(self.ring)] = rec
+        self.count += 1
+        self.last_t = t
+
+        p = self.pending
+        if p is None:
+            return None
+        if p['n_post'] < len(self.post):
+            self.post[p['n_post']] = rec
+            p['n_post'] += 1
+        if t >= p['t'] + self.post_s or p['n_post'] == len(self.post):
+            return self.flush()
+        return None
+
+    def window(self):
+        """Chronological copy of the ring."""
+        n = min(self.count, len(self.ring))
+        return self.ring[np.arange(self.count - n, self.count) % len(self.ring)]
+
+    def trigger(self, t, fault_name, ts):
+        """Freeze the pre-fault window. Returns the snapshot path to link from the fault point."""
+        if self.pending is not None:
+            return self.pending['path']
+        pre = self.window()
+        self.pending = {
+            't': t,
+            'path': fault_snapshot_path(self.crane_id, fault_name, ts),
+            'pre': pre[pre['t'] >= t - self.pre_s],
+            'n_post': 0,
+        }
+        return self.pending['path']
+
+    def flush(self):
+        """Close the open snapshot (post window complete or shutting down): (path, t_fault, records)."""
+        p = self.pending
+        if p is None:
+            return None
+        self.pending = None
+        return p['path'], p['t'], np.concatenate([p['pre'], self.post[:p['n_post']]])
+
+def attach_shared_memory(name):
+    """Open an existing segment without letting this process's resource tracker unlink it at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # multiprocessing children share the creator's tracker; only a standalone process has its own
+        if os.name == 'posix' and multiprocessing.parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class SampleBus:
+    """
+    Shared-memory live sample bus: one ring of FlightRecorder.DTYPE records per crane
+    (segment BUS_PREFIX + crane_id), appended on every idle probe and active sample.
+    Local processes read it in place with SampleBusReader, without touching the PLCs.
+    One writer per crane (its monitor's thread): the record is stored first, then the
+    64-bit `seq` in the header is bumped, so readers only see completed slots.
+    """
+    HEADER = np.dtype([('seq', 'u8'), ('capacity', 'u4'), ('record_size', 'u4'), ('writer_pid', 'u4')])
+    HEADER_BYTES = 64
+    FLAG_PARTIAL = 8  # idle probe: only order (QC: speed) is valid
+
+    def __init__(self, prefix=BUS_PREFIX, capacity=BUS_CAPACITY):
+        self.prefix = prefix
+        self.capacity = capacity
+        self.rings = {}  # crane_id -> [shm, header, ring, seq, created]
+        self.active = False
+
+    def open(self, crane_ids):
+        """Create (or re-attach after a restart, keeping seq) the ring of every crane."""
+        size = self.HEADER_BYTES + self.capacity * FlightRecorder.DTYPE.itemsize
+        for cid in crane_ids:
             try:
-                data = client.db_read(180, 0, 12)
-                current_speed = struct.unpack('>h', data[6:8])[0]
-            except Exception as read_err:
-                sync_print(f"[!] [{crane_id}] QC Idle read error: {read_err}")
-                time.sleep(IDLE_POLL_RATE)
-                continue
-                
-            if abs(current_speed) < QC_SPEED_THRESHOLD:
-                # Spreader is idle
-                time.sleep(IDLE_POLL_RATE)
-                continue
-                
-            # Movement Detected -> Switch to Active Logging
-            sync_print(f"\n[MOVE] [{crane_id}] QC Spreader Movement! Speed: {current_speed}. Recording...")
-            orders, feedbacks, loads, weights, positions, dt_list, db180_list = [], [], [], [], [], [], []
-            last_time = time.time()
-            
-            while not stop_event.is_set():
-                cycle_start = time.time()
-                try:
-                    data = client.db_read(180, 0, 12)
-                    speed = struct.unpack('>h', data[6:8])[0]
-                    current = struct.unpack('>h', data[8:10])[0]
-                    torque = struct.unpack('>h', data[10:12])[0]
-                    
-                    # Record data point
-                    now = time.time()
-                    dt_list.append(now - last_time)
-                    last_time = now
-                    
-                    # QC Spreader has no order/feedback distinction, map both to speed
-                    orders.append(speed)
-                    feedbacks.append(speed)
-                    loads.append(False)
-                    weights.append(1.0)
-                    positions.append(0.0)
-                    db180_list.append((speed, current, torque))
-                    
-                    # Stop Condition: Speed returns near 0
-                    if abs(speed) < QC_SPEED_THRESHOLD:
-                        sync_print(f"[STOP] [{crane_id}] QC Spreader Stopped. Analyzing {len(orders)} points...")
-                        break
-                        
-                except Exception as ex_read:
-                    sync_print(f"[!] [{crane_id}] QC Active read error: {ex_read}")
-                    break
-                
-                # Maintain active poll rate
-                elapsed = time.time() - cycle_start
-                sleep_time = max(0, ACTIVE_POLL_RATE - elapsed)
-                time.sleep(sleep_time)
-                
-            # Event finished, calculate and log KPIs
-            if orders:
-                kpis = calculate_kpis_qc(orders, feedbacks, loads, weights, positions, dt_list, db180_list)
-                if kpis is None:
-                    sync_print(f"[{crane_id}] DB180 데이터 없음 — 이벤트 폐기.")
-                elif kpis['duration'] <= 1.5:
-                    sync_print(f"[{crane_id}] QC Event too short ({kpis['duration']}s), ignored.")
-                else:
-                    log_event(crane_id, kpis)
-                    save_raw_event(crane_id, orders, feedbacks, loads, weights, positions, dt_list, db180_list)
-                    
-        except Exception as e:
-            sync_print(f"[!] [{crane_id}] QC Connection error: {e}. Retrying in 5 seconds...")
+                shm, created = shared_memory.SharedMemory(name=self.prefix + cid, create=True, size=size), True
+            except FileExistsError:
+                shm, created = attach_shared_memory(self.prefix + cid), False
+            header = np.ndarray(1, self.HEADER, buffer=shm.buf)
+            if created or header['capacity'][0] != self.capacity or shm.size < size:
+                if shm.size < size:
+                    raise RuntimeError(f"sample bus segment {self.prefix + cid} is too small; close its readers")
+                header['seq'] = 0
+            header['capacity'] = self.capacity
+            header['record_size'] = FlightRecorder.DTYPE.itemsize
+            header['writer_pid'] = os.getpid()
+            ring = np.ndarray(self.capacity, FlightRecorder.DTYPE, buffer=shm.buf, offset=self.HEADER_BYTES)
+            self.rings[cid] = [shm, header, ring, int(header['seq'][0]), created]
+        self.active = True
+
+    def publish(self, crane_id, t, kind, values):
+        if not self.active:
+            return
+        entry = self.rings.get(crane_id)
+        if entry is None:
+            return
+        seq = entry[3]
+        entry[2][seq % self.capacity] = self.record(t, kind, values)
+        entry[1]['seq'] = entry[3] = seq + 1
+
+    @staticmethod
+    def record(t, kind, values):
+        if kind == 'sample':
+            order, fb, locked, wt, pos, db170_vals = values
+            flags = (FlightRecorder.FLAG_LOADED if locked else 0) | (FlightRecorder.FLAG_DB170 if db170_vals else 0)
+            return (t, order, fb, wt, pos, *(db170_vals or (0, 0, 0)), flags)
+        if kind == 'qc':
+            speed, current, torque = values
+            return (t, speed, speed, 0, 0, speed, current, torque, FlightRecorder.FLAG_DB170)
+        return (t, values, 0, 0, 0, 0, 0, 0, SampleBus.FLAG_PARTIAL)  # 'order' / 'speed' probe
+
+    def close(self):
+        self.active = False
+        rings, self.rings = self.rings, {}
+        for entry in rings.values():
+            shm, created = entry[0], entry[4]
+            entry.clear()  # numpy views must go before the mapping closes
+            shm.close()
+            if created and not handoff_event.is_set():
+                shm.unlink()  # POSIX only; Windows frees the segment with its last handle
+
+class SampleBusReader:
+    """
+    Read-only view of one crane's bus ring for local consumers:
+
+        reader = SampleBusReader('235')
+        while True:
+            for chunk in reader.poll():   # numpy views into shared memory, no copy
+                ...                       # chunk['t'], chunk['reel_torque'], ...
+
+    A consumer that is more than BUS_CAPACITY records behind loses the oldest (poll()
+    counts them in `lost`); lapped() tells whether the last chunks were overwritten
+    while being processed.
+    """
+    def __init__(self, crane_id, prefix=BUS_PREFIX, from_start=False):
+        self.shm = attach_shared_memory(prefix + crane_id)
+        self.header = np.ndarray(1, SampleBus.HEADER, buffer=self.shm.buf)
+        self.capacity = int(self.header['capacity'][0])
+        self.ring = np.ndarray(self.capacity, FlightRecorder.DTYPE, buffer=self.shm.buf, offset=SampleBus.HEADER_BYTES)
+        self.ring.flags.writeable = False
+        seq = int(self.header['seq'][0])
+        self.cursor = max(0, seq - self.capacity) if from_start else seq
+        self.last_start = self.cursor
+        self.lost = 0
+
+    def poll(self):
+        """New records since the last poll, oldest first, as up to two contiguous views."""
+        seq = int(self.header['seq'][0])
+        start = max(self.cursor, seq - self.capacity)
+        self.lost += start - self.cursor
+        self.cursor = self.last_start = start
+        if start == seq:
+            return ()
+        i0, i1 = start % self.capacity, seq % self.capacity
+        self.cursor = seq
+        if i0 < i1:
+            return (self.ring[i0:i1],)
+        return (self.ring[i0:], self.ring[:i1]) if i1 else (self.ring[i0:],)
+
+    def lapped(self):
+        return int(self.header['seq'][0]) - self.capacity > self.last_start
+
+    def close(self):
+        del self.header, self.ring
+        self.shm.close()
+
+LIVE_BUS = SampleBus()
+
+class LiveSink:
+    """Production output for finished events and fault edges: CSV + InfluxDB + raw archive."""
+    def event(self, crane_id, kpis, raw, ts):
+        if ANOMALY_STATE_FILE:
+            z = SCORER.score(crane_id, kpis)
+            if z:
+                kpis = dict(kpis, anomaly_z=z, anomaly_score=max(z.values()))
+        log_event(crane_id, kpis, ts)
+        FLEET.event(crane_id, kpis, ts or datetime.now())
+        if ALERT_RULES:
+            try:  # alerting must never cost the ledger / cube / raw archive their event
+                ALERTS.event(crane_id, kpis, ts or datetime.now())
+            except Exception as e:
+                sync_print(f"[!] [ALERT] [{crane_id}] Rule evaluation failed: {type(e).__name__}: {e}")
+        if LEDGER_DB:
+            LEDGER.event(crane_id, kpis, ts or datetime.now())
+        if RAIL_CUBE_DB:
+            RAIL_CUBE.add(crane_id, kpis, ts or datetime.now())
+        if RAINFLOW_DB:
+            RAINFLOW.add(crane_id, kpis, ts or datetime.now())
+        if raw is not None:  # None: already archived by a worker process (ShardSink)
+            save_raw_event(crane_id, *raw, ts=ts, pretrigger=kpis.get('pretrigger', 0))
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        log_fault_event(crane_id, fault_name, position, ts, snapshot)
+        FLEET.fault(crane_id, fault_name, position, ts or datetime.now())
+        if ALERT_RULES:
             try:
-                client.disconnect()
-            except:
-                pass
-            time.sleep(5)
+                ALERTS.fault(crane_id, fault_name, ts or datetime.now())
+            except Exception as e:
+                sync_print(f"[!] [ALERT] [{crane_id}] Rule evaluation failed: {type(e).__name__}: {e}")
 
-def monitor_crane(crane_config):
-    crane_id = crane_config['id']
-    ip = crane_config['ip']
-    rack = crane_config['rack']
-    slot = crane_config['slot']
-    
-    if crane_config.get('type') == 'QC':
-        monitor_qc_spreader(crane_config)
-        return
-        
-    client = snap7.client.Client()
-    prev_slack = False
-    
-    while not stop_event.is_set():
-        try:
-            if not client.get_connected():
-                sync_print(f"[{datetime.now().strftime('%H:%M:%S')}] [{crane_id}] Connecting to PLC {ip}...")
-                client.connect(ip, rack, slot)
-                time.sleep(1)
-                continue
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        log_fault_clear(crane_id, fault_name, position, active_s, ts)
 
-            # Check Faults (Idle Polling)
-            fault_data = client.db_read(59, 126, 1)
-            current_slack = get_bool(fault_data, 0, 0)
-            if current_slack and not prev_slack:
-                pos_data = client.db_read(57, 200, 2)
-                log_fault_event(crane_id, "Cable_Reel_Slack", get_int(pos_data, 0))
-            prev_slack = current_slack
-
-            # Check IDLE state (Poll slowly)
-            order_data = client.db_read(57, 8, 2)
-            current_order = get_int(order_data, 0)
-            
-            if abs(current_order) < SPEED_THRESHOLD:
-                # Crane is idle
-                time.sleep(IDLE_POLL_RATE)
-                continue
-            # Movement Detected -> Switch to Active Logging
-            sync_print(f"\n[MOVE] [{crane_id}] Movement! Order: {current_order}. Recording...")
-            orders, feedbacks, loads, weights, positions, dt_list, db170_list = [], [], [], [], [], [], []
-            last_time = time.time()
-            
-            while not stop_event.is_set():
-                cycle_start = time.time()
-                try:
-                    order_data = client.db_read(57, 8, 2)
-                    current_order = get_int(order_data, 0)
-                    
-                    fb_data = client.db_read(57, 10, 2)
-                    current_fb = get_int(fb_data, 0)
-                    
-                    tl_data = client.db_read(58, 185, 1)
-                    is_locked = get_bool(tl_data, 0, 1)
-                    
-                    wt_data = client.db_read(57, 48, 2)
-                    current_wt = get_int(wt_data, 0)
-                    
-                    pos_data = client.db_read(57, 200, 2)
-                    current_pos = get_int(pos_data, 0)
-                    
-                    # Try DB170 (Cable Reel Drive data) on ALL cranes.
-                    # If the PLC has not been mapped yet, the read will fail
-                    # and db170_vals stays None → 이벤트가 폐기됩니다.
-                    db170_vals = None
-                    try:
-                        db170_data = client.db_read(170, 0, 6)
-                        db170_vals = (get_int(db170_data, 0), get_int(db170_data, 2), get_int(db170_data, 4))
-                    except Exception:
-                        db170_vals = None
-                            
-                    # Check Faults (Active Polling)
-                    fault_data = client.db_read(59, 126, 1)
-                    current_slack = get_bool(fault_data, 0, 0)
-                    if current_slack and not prev_slack:
-                        log_fault_event(crane_id, "Cable_Reel_Slack", current_pos)
-                    prev_slack = current_slack
-                    
-                    # Record data point
-                    now = time.time()
-                    dt_list.append(now - last_time)
-                    last_time = now
-                    
-                    orders.append(current_order)
-                    feedbacks.append(current_fb)
-                    loads.append(is_locked)
-                    weights.append(current_wt)
-                    positions.append(current_pos)
-                    db170_list.append(db170_vals)
-                    
-                    # Stop Condition: Order speed returns near 0
-                    if abs(current_order) < SPEED_THRESHOLD:
-                        sync_print(f"[STOP] [{crane_id}] Stopped. Analyzing {len(orders)} points...")
-                        break
-                        
-                except Exception as ex_read:
-                    sync_print(f"[!] [{crane_id}] Read error: {ex_read}")
-                    break
-                
-                # Maintain active poll rate
-                elapsed = time.time() - cycle_start
-                sleep_time = max(0, ACTIVE_POLL_RATE - elapsed)
-                time.sleep(sleep_time)
-
-            # Event finished, calculate and log KPIs
-            if orders:
-                kpis = calculate_kpis(orders, feedbacks, loads, weights, positions, dt_list, db170_list)
-                if kpis is None:
-                    sync_print(f"[{crane_id}] DB170 데이터 없음 — 이벤트 폐기.")
-                elif kpis['duration'] <= 3.0:
-                    sync_print(f"[{crane_id}] Event too short ({kpis['duration']}s), ignored.")
-                else:
-                    log_event(crane_id, kpis)
-                    # Save raw PLC data for every valid event (gzip compressed)
-                    save_raw_event(crane_id, orders, feedbacks, loads, weights, positions, dt_list, db170_list)
-                    
+    def snapshot(self, crane_id, path, t_fault, records):
+        save_fault_snapshot(crane_id, path, t_fault, records)
+
+class PLCLink:
+    """
+    Reconnect policy + stats for one PLC. Delays use "equal jitter"
+    (half fixed, half random) so a block-wide network blip does not turn into a
+    synchronized reconnect storm. After BREAKER_FAILURES consecutive failures the
+    breaker opens: the PLC is only probed every BREAKER_PROBE_S and stays quiet in the log.
+    """
+    def __init__(self, crane_id, start_delay=0.0, now=0.0):
+        self.crane_id = crane_id
+        self.rng = random.Random(crane_id)
+        self.failures = 0
+        self.parked = False
+        self.next_attempt = now + start_delay
+        self.up_since = None
+        self.down_since = now
+        self.connects = 0
+        self.failed_attempts = 0
+        self.last_connect_s = None
+        self.total_connect_s = 0.0
+        self.downtime_s = 0.0
+
+    def wait_s(self, now):
+        return max(0.0, self.next_attempt - now)
+
+    def on_connected(self, now, connect_s):
+        recovered = self.parked
+        self.parked = False
+        self.connects += 1
+        self.last_connect_s = connect_s
+        self.total_connect_s += connect_s
+        if self.down_since is not None:
+            self.downtime_s += now - self.down_since
+            self.down_since = None
+        self.up_since = now
+        return recovered
+
+    def on_failure(self, now):
+        """Schedule the next attempt. Returns (delay_s, breaker_just_opened)."""
+        if self.up_since is not None:
+            if now - self.up_since >= LINK_STABLE_S:
+                self.failures = 0
+            self.up_since = None
+        else:
+            self.failed_attempts += 1
+        if self.down_since is None:
+            self.down_since = now
+        self.failures += 1
+        opened = False
+        if self.failures >= BREAKER_FAILURES:
+            opened = not self.parked
+            self.parked = True
+            delay = BREAKER_PROBE_S * self.rng.uniform(0.9, 1.1)
+        else:
+            cap = min(RECONNECT_MAX_S, RECONNECT_BASE_S * 2 ** (self.failures - 1))
+            delay = cap / 2 + self.rng.uniform(0, cap / 2)
+        self.next_attempt = now + delay
+        return delay, opened
+
+    def stats(self, now):
+        down = self.downtime_s + (now - self.down_since if self.down_since is not None else 0.0)
+        return {
+            'connected': self.up_since is not None,
+            'parked': self.parked,
+            'reconnects': max(0, self.connects - 1),
+            'failed_attempts': self.failed_attempts,
+            'last_connect_s': self.last_connect_s,
+            'mean_connect_s': self.total_connect_s / self.connects if self.connects else None,
+            'downtime_s': down,
+        }
+
+PLC_LINKS = {}  # crane_id -> PLCLink, for report_plc_links()
+MONITORS = {}   # crane_id -> CraneMonitor in this process, for the PLC broker
+SHARD_LINK_STATS = {}  # crane_id -> PLCLink.stats() forwarded by worker processes
+
+def startup_delay(crane_id):
+    ids = [c['id'] for c in CRANES]
+    return CONNECT_STAGGER_S * ids.index(crane_id) if crane_id in ids else 0.0
+
+def connect_step(crane_id, label, source, link, clock):
+    """Connect when the link policy allows it. Returns seconds until the next step."""
+    wait = link.wait_s(clock.time())
+    if wait > 0:
+        return wait
+    if not link.parked:
+        sync_print(f"[{clock.now().strftime('%H:%M:%S')}] [{crane_id}] Connecting to {label}...")
+    t0 = clock.time()
+    source.connect()
+    if link.on_connected(clock.time(), clock.time() - t0):
+        sync_print(f"[{clock.now().strftime('%H:%M:%S')}] [{crane_id}] {label} reachable again, breaker closed.")
+    return CONNECT_SETTLE_S  # let the fresh session settle before the first read
+
+def handle_link_failure(crane_id, label, error, source, link, clock):
+    source.disconnect()
+    delay, opened = link.on_failure(clock.time())
+    if opened:
+        sync_print(f"[!] [{crane_id}] {label} failed {link.failures}x ({error}). "
+                   f"Parked; health probe every {BREAKER_PROBE_S:.0f}s.")
+    elif not link.parked:
+        sync_print(f"[!] [{crane_id}] {label} error: {error}. Retrying in {delay:.1f}s (attempt {link.failures})...")
+
+def report_plc_links():
+    """Periodic connection summary on the console + plc_link points for Grafana."""
+    while not stop_event.wait(LINK_REPORT_S):
+        now = time.time()
+        stats = {cid: link.stats(now) for cid, link in list(PLC_LINKS.items())}
+        stats.update(SHARD_LINK_STATS)
+        if not stats:
+            continue
+        connected = sum(1 for st in stats.values() if st['connected'])
+        parked = sorted(cid for cid, st in stats.items() if st['parked'])
+        reconnects = sum(st['reconnects'] for st in stats.values())
+        times = [st['mean_connect_s'] for st in stats.values() if st['mean_connect_s'] is not None]
+        mean_connect = sum(times) / len(times) if times else 0.0
+        sync_print(f"[LINK] connected {connected}/{len(stats)} | reconnects {reconnects} | "
+                   f"mean connect {mean_connect:.2f}s | parked: {', '.join(parked) or '-'}")
+        try:
+            points = []
+            for cid, st in stats.items():
+                points.append(
+                    Point("plc_link")
+                    .tag("crane_id", cid)
+                    .field("connected", 1 if st['connected'] else 0)
+                    .field("parked", 1 if st['parked'] else 0)
+                    .field("reconnects", st['reconnects'])
+                    .field("failed_attempts", st['failed_attempts'])
+                    .field("last_connect_s", float(st['last_connect_s'] or 0.0))
+                    .field("downtime_s", float(st['downtime_s']))
+                )
+            write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=points)
         except Exception as e:
-            sync_print(f"[!] [{crane_id}] Connection error: {e}. Retrying in 5 seconds...")
-            try:
-                client.disconnect()
-            except:
-                pass
-            time.sleep(5)
+            sync_print(f"[!] PLC link stats InfluxDB Error: {e}")
+
+REAL_CLOCK = RealClock()
+LIVE_SINK = LiveSink()
 
-def initialize_influx_kpis():
+def report_fault_edges(crane_id, rising, falling, position, now, ts, recorder, sink):
+    for name in rising:
+        snapshot = recorder.trigger(now, name, ts)
+        sink.fault(crane_id, name, position, ts, snapshot)
+    for name, active_s in falling:
+        sink.fault_clear(crane_id, name, position, ts, active_s)
+    LIVE_PUSH.fault(crane_id, now, rising, falling)
+
+class CraneMonitor:
     """
-    Ensure all cranes (especially newly added QC cranes 101~112) have at least one 
-    heartbeat initialization record in InfluxDB, so that Grafana panels and variables 
-    can render all crane tiles statically without waiting for their first physical movement.
+    Acquisition state machine for one crane, split so it can be driven two ways:
+    idle_step() is one cheap idle poll (connect / probe / faults), capture() records a
+    whole movement at ACTIVE_POLL_RATE and hands the KPIs to the sink. run() is the
+    classic dedicated-thread loop; AcquisitionScheduler shares idle_step() across a
+    small worker pool and only gives a crane its own thread while it is moving.
+    clock/source/sink/stop default to the live wall clock, snap7 session, CSV+InfluxDB
+    output and the global stop_event; scripts/analysis/replay_pipeline.py injects a
+    virtual clock and recorded/simulated sources to run this exact code offline.
     """
-    sync_print("Initializing InfluxDB heartbeat records for all configured cranes...")
-    init_kpis = {
-        'algo_version': '3.0.0',
-        'duration': 0.0,
-        'peak_order': 0.0,
-        'peak_fb': 0.0,
-        'max_error': 0.0,
-        'rms_error': 0.0,
-        'reducer_damage': 0.0,
-        'avg_weight': 1.0,
-        'shock_penalty': 1.0,
-        'peak_shock': 0.0,
-        'curr_penalty': 1.0,
-        'track_penalty': 1.0,
-        'load_factor': 1.0,
-        'start_pos': 0.0,
-        'end_pos': 0.0,
-        'avg_pos': 0.0,
-        'peak_shock_pos': 0.0,
-        'is_loaded': False
-    }
-    for crane in CRANES:
-        cid = crane['id']
+    def __init__(self, crane_config, clock=None, source=None, sink=None, stop=None):
+        self.crane_id = crane_config['id']
+        self.ip = crane_config['ip']
+        self.clock = clock or REAL_CLOCK
+        self.source = source or self.make_source(crane_config)
+        self.sink = sink or LIVE_SINK
+        self.stop = stop or stop_event
+        self.link = PLC_LINKS[self.crane_id] = PLCLink(self.crane_id, startup_delay(self.crane_id), self.clock.time())
+        self.pretrigger = deque(maxlen=int(round(PRETRIGGER_S / ACTIVE_POLL_RATE)))
+        self.pre = 0  # pre-trigger samples at the head of the event being recorded
+        self.detected = None
+        self.carry = None  # unfinished event (buf, last_time, header, pre) across a hot restart
+        self.broker_reads = deque()  # BrokerRead requests, run on this crane's sampling thread
+        self.live_at = 0.0  # last running-damage update for Grafana Live
+        MONITORS[self.crane_id] = self
+
+    def idle_step(self):
+        """One idle poll. Returns (seconds until the next poll, movement detected)."""
         try:
-            log_event(cid, init_kpis)
+            if not self.source.connected():
+                return connect_step(self.crane_id, self.label, self.source, self.link, self.clock), False
+            if self.carry is not None:
+                return 0.0, True  # event handed over by the predecessor: resume it
+            self.serve_broker()
+            return self.probe()
         except Exception as e:
-            sync_print(f"[!] Initialization failed for crane {cid}: {e}")
+            handle_link_failure(self.crane_id, self.label, e, self.source, self.link, self.clock)
+            return self.link.wait_s(self.clock.time()), False
 
-def main():
-    init_csv()
-    initialize_influx_kpis()
-    sync_print(f"Edge Logger Started. Monitoring {len(CRANES)} cranes...")
-    
-    # Start cleanup thread
-    threading.Thread(target=cleanup_old_raw_data, daemon=True).start()
-    
-    # Start crane monitoring threads
-    for crane in CRANES:
-        threading.Thread(target=monitor_crane, args=(crane,), daemon=True).start()
-        
-    # Start Tray Icon (This is BLOCKING)
-    icon = setup_tray()
-    icon.run()
+    def capture(self):
+        """Record the movement found by idle_step() and log it."""
+        try:
+            self.record_event()
+        except Exception as e:
+            handle_link_failure(self.crane_id, self.label, e, self.source, self.link, self.clock)
+
+    def run(self):
+        while not self.stop.is_set():
+            delay, moving = self.idle_step()
+            if moving:
+                self.capture()
+            elif delay > 0:
+                self.clock.sleep(min(delay, 1.0))  # short chunks so stop stays responsive
+        self.close()
+
+    def close(self):
+        pass
+
+    def publish(self, kind, t, values):
+        LIVE_BUS.publish(self.crane_id, t, kind, values)
+        LIVE_BROKER.publish(self.crane_id, t, kind, values)
+        LIVE_PUSH.publish(self.crane_id, t, kind, values)
+
+    def live_progress(self, buf, now, moving=True):
+        """Running damage of the event in progress for Grafana Live, at most every LIVE_PUSH_S."""
+        if self.crane_id not in LIVE_PUSH.states or (moving and now - self.live_at < LIVE_PUSH_S):
+            return
+        self.live_at = now
+        kpis = self.calculate_kpis(*buf, pretrigger=self.pre)
+        LIVE_PUSH.update(self.crane_id, now, moving=moving, damage=kpis['reducer_damage'] if kpis else 0.0)
+
+    def serve_broker(self):
+        """Run one queued broker read through this session, between the logger's own reads."""
+        if self.broker_reads:
+            self.broker_reads.popleft().run(self.source)
+
+    def carry_state(self):
+        """Hot restart: what the successor needs to continue this crane."""
+        return {'event': self.carry}
+
+    def adopt(self, state):
+        if state:
+            self.carry = state['event']
+
+    def carry_over(self, buf, last_time):
+        """Hot restart in progress: keep the unfinished event for the successor instead of logging it."""
+        if not handoff_event.is_set():
+            return False
+        self.carry = (buf, last_time, self.detected, self.pre)
+        return True
+
+    def start_event(self, header):
+        """Event buffers, seeded with (and clearing) the pre-trigger samples."""
+        if self.carry is not None:
+            buf, last_time, self.detected, self.pre = self.carry
+            self.carry = None
+            self.pretrigger.clear()
+            sync_print(f"\n[MOVE] [{self.crane_id}] {self.detected} Resumed after hot restart "
+                       f"({len(buf[0])} samples carried over)...")
+            return buf, last_time
+        sync_print(f"\n[MOVE] [{self.crane_id}] {header} Recording (+{len(self.pretrigger)} pre-trigger)...")
+        buf = ([], [], [], [], [], [], [])
+        self.pre = len(self.pretrigger)
+        last_time = self.pretrigger[0][0] if self.pretrigger else self.clock.time()
+        for t_pre, values in self.pretrigger:
+            last_time = self.append_sample(buf, t_pre, last_time, values)
+        self.pretrigger.clear()
+        return buf, last_time
+
+class ARMGCMonitor(CraneMonitor):
+    calculate_kpis = staticmethod(calculate_kpis)
+
+    def __init__(self, crane_config, clock=None, source=None, sink=None, stop=None):
+        super().__init__(crane_config, clock, source, sink, stop)
+        self.label = f"PLC {self.ip}"
+        self.scanner = FaultScanner()
+        self.recorder = FlightRecorder(self.crane_id)
+        self.next_fault_poll = 0.0
+
+    @staticmethod
+    def make_source(crane_config):
+        return PLCSource(crane_config['ip'], crane_config['rack'], crane_config['slot'])
+
+    def record(self, now, sample):
+        finished = self.recorder.push(now, sample, self.scanner.any_active())
+        if finished:
+            self.sink.snapshot(self.crane_id, *finished)
+
+    def probe(self):
+        source = self.source
+        now = self.clock.time()
+        sample = None
+        if now >= self.next_fault_poll:
+            # Check Faults (Idle Polling). Flight recorder takes a full sample when due.
+            self.next_fault_poll = now + IDLE_POLL_RATE
+            rising, falling = self.scanner.scan(source.read_faults(self.scanner.start, self.scanner.size), now)
+            sample = source.read_sample() if self.recorder.due(now) else None
+            if rising or falling:
+                position = sample[4] if sample else source.read_position()
+                report_fault_edges(self.crane_id, rising, falling, position, now, self.clock.now(), self.recorder, self.sink)
+
+        # Check IDLE state (order word probe)
+        current_order = sample[0] if sample else source.read_order()
+        if sample is None and PRETRIGGER_ARM < abs(current_order) < SPEED_THRESHOLD:
+            # Ramp starting below trigger: arm pre-trigger with a full sample
+            sample = source.read_sample()
+            current_order = sample[0]
+        if sample:
+            self.record(now, sample)
+            self.publish('sample', now, sample)
+        else:
+            self.publish('order', now, current_order)
+
+        if abs(current_order) < SPEED_THRESHOLD:
+            # Crane is idle
+            if abs(current_order) > PRETRIGGER_ARM:
+                self.pretrigger.append((now, sample))
+            else:
+                self.pretrigger.clear()
+            return IDLE_PROBE_RATE, False
+        # Movement Detected -> Switch to Active Logging
+        self.detected = f"Movement! Order: {current_order}."
+        return 0.0, True
+
+    @staticmethod
+    def append_sample(buf, t, last_time, values):
+        orders, feedbacks, loads, weights, positions, dt_list, db170_list = buf
+        current_order, current_fb, is_locked, current_wt, current_pos, db170_vals = values
+        dt_list.append(t - last_time)
+        orders.append(current_order)
+        feedbacks.append(current_fb)
+        loads.append(is_locked)
+        weights.append(current_wt)
+        positions.append(current_pos)
+        db170_list.append(db170_vals)
+        return t
+
+    def record_event(self):
+        crane_id, clock, source = self.crane_id, self.clock, self.source
+        buf, last_time = self.start_event(self.detected)
+        orders = buf[0]
+
+        while not self.stop.is_set():
+            cycle_start = clock.time()
+            try:
+                sample = source.read_sample()
+                current_order, current_pos = sample[0], sample[4]
+
+                # Check Faults (Active Polling)
+                rising, falling = self.scanner.scan(source.read_faults(self.scanner.start, self.scanner.size), clock.time())
+                if rising or falling:
+                    report_fault_edges(crane_id, rising, falling, current_pos, clock.time(), clock.now(), self.recorder, self.sink)
+
+                # Record data point
+                now = clock.time()
+                self.record(now, sample)
+                last_time = self.append_sample(buf, now, last_time, sample)
+                self.publish('sample', now, sample)
+                self.live_progress(buf, now)
+                self.serve_broker()
+
+                # Stop Condition: Order speed returns near 0
+                if abs(current_order) < SPEED_THRESHOLD:
+                    sync_print(f"[STOP] [{crane_id}] Stopped. Analyzing {len(orders)} points...")
+                    break
+
+            except Exception as ex_read:
+                sync_print(f"[!] [{crane_id}] Read error: {ex_read}")
+                break
+
+            # Maintain active poll rate
+            elapsed = clock.time() - cycle_start
+            sleep_time = max(0, ACTIVE_POLL_RATE - elapsed)
+            clock.sleep(sleep_time)
+
+        self.live_progress(buf, clock.time(), moving=False)
+        if self.carry_over(buf, last_time):
+            return
+
+        # Event finished, calculate and log KPIs
+        if orders:
+            kpis = calculate_kpis(*buf, pretrigger=self.pre)
+            if kpis is None:
+                sync_print(f"[{crane_id}] DB170 데이터 없음 — 이벤트 폐기.")
+            elif kpis['duration'] <= 3.0:
+                sync_print(f"[{crane_id}] Event too short ({kpis['duration']}s), ignored.")
+            else:
+                # log_event + raw PLC archive for every valid event (gzip compressed)
+                self.sink.event(crane_id, kpis, buf, clock.now())
+
+    def carry_state(self):
+        # Fault bits too, so faults active across the restart are not reported again
+        state = super().carry_state()
+        state['faults'] = (self.scanner.prev, self.scanner.active, self.scanner.since)
+        return state
+
+    def adopt(self, state):
+        super().adopt(state)
+        if state:
+            self.scanner.prev, self.scanner.active, self.scanner.since = state['faults']
+            active = [name for name, on in zip(self.scanner.names, self.scanner.active) if on]
+            LIVE_PUSH.fault(self.crane_id, self.clock.time(), active, [])
+
+    def close(self):
+        # Shutdown with a snapshot still open: keep whatever post-fault window we have
+        finished = self.recorder.flush()
+        if finished:
+            self.sink.snapshot(self.crane_id, *finished)
+
+class QCMonitor(CraneMonitor):
+    SPEED_THRESHOLD = 3  # Sensitive trigger for slower QC spreader reel (tuned from 10 to 3)
+    # Arms on |speed| above this and below SPEED_THRESHOLD, i.e. 1-2 only: the DB180 speed word
+    # usually passes 3 within one probe, so QC pre-trigger is effectively inert (0-1 samples).
+    PRETRIGGER_ARM = 0
+    calculate_kpis = staticmethod(calculate_kpis_qc)
+
+    def __init__(self, crane_config, clock=None, source=None, sink=None, stop=None):
+        super().__init__(crane_config, clock, source, sink, stop)
+        self.label = f"QC PLC {self.ip}"
+
+    @staticmethod
+    def make_source(crane_config):
+        return QCPLCSource(crane_config['ip'], crane_config['rack'], crane_config['slot'])
+
+    def probe(self):
+        # Check IDLE state (speed word probe from DB180.DBW6)
+        try:
+            current_speed = self.source.read_qc_speed()
+            self.publish('speed', self.clock.time(), current_speed)
+            if self.PRETRIGGER_ARM < abs(current_speed) < self.SPEED_THRESHOLD:
+                # Creeping below trigger: arm pre-trigger with a full DB180 read
+                self.pretrigger.append((self.clock.time(), self.source.read_qc()))
+        except Exception as read_err:
+            sync_print(f"[!] [{self.crane_id}] QC Idle read error: {read_err}")
+            self.pretrigger.clear()
+            return IDLE_POLL_RATE, False
+
+        if abs(current_speed) < self.SPEED_THRESHOLD:
+            # Spreader is idle
+            if abs(current_speed) <= self.PRETRIGGER_ARM:
+                self.pretrigger.clear()
+            return IDLE_PROBE_RATE, False
+
+        # Movement Detected -> Switch to Active Logging
+        self.detected = f"QC Spreader Movement! Speed: {current_speed}."
+        return 0.0, True
+
+    @staticmethod
+    def append_sample(buf, t, last_time, values):
+        orders, feedbacks, loads, weights, positions, dt_list, db180_list = buf
+        speed, current, torque = values
+        dt_list.append(t - last_time)
+        # QC Spreader has no order/feedback distinction, map both to speed
+        orders.append(speed)
+        feedbacks.append(speed)
+        loads.append(False)
+        weights.append(1.0)
+        positions.append(0.0)
+        db180_list.append((speed, current, torque))
+        return t
+
+    def record_event(self):
+        crane_id, clock, source = self.crane_id, self.clock, self.source
+        buf, last_time = self.start_event(self.detected)
+        orders = buf[0]
+
+        while not self.stop.is_set():
+            cycle_start = clock.time()
+            try:
+                values = source.read_qc()
+
+                # Record data point
+                last_time = self.append_sample(buf, clock.time(), last_time, values)
+                self.publish('qc', last_time, values)
+                self.live_progress(buf, last_time)
+                self.serve_broker()
+
+                # Stop Condition: Speed returns near 0
+                if abs(values[0]) < self.SPEED_THRESHOLD:
+                    sync_print(f"[STOP] [{crane_id}] QC Spreader Stopped. Analyzing {len(orders)} points...")
+                    break
+
+            except Exception as ex_read:
+                sync_print(f"[!] [{crane_id}] QC Active read error: {ex_read}")
+                break
+
+            # Maintain active poll rate
+            elapsed = clock.time() - cycle_start
+            sleep_time = max(0, ACTIVE_POLL_RATE - elapsed)
+            clock.sleep(sleep_time)
+
+        self.live_progress(buf, clock.time(), moving=False)
+        if self.carry_over(buf, last_time):
+            return
+
+        # Event finished, calculate and log KPIs
+        if orders:
+            kpis = calculate_kpis_qc(*buf, pretrigger=self.pre)
+            if kpis is None:
+                sync_print(f"[{crane_id}] DB180 데이터 없음 — 이벤트 폐기.")
+            elif kpis['duration'] <= 1.5:
+                sync_print(f"[{crane_id}] QC Event too short ({kpis['duration']}s), ignored.")
+            else:
+                self.sink.event(crane_id, kpis, buf, clock.now())
+
+def make_monitor(crane_config, clock=None, source=None, sink=None, stop=None):
+    cls = QCMonitor if crane_config.get('type') == 'QC' else ARMGCMonitor
+    return cls(crane_config, clock, source, sink, stop)
+
+def monitor_crane(crane_config, clock=None, source=None, sink=None, stop=None):
+    """Dedicated-thread acquisition loop for one crane (ACQUISITION_MODE = "threads")."""
+    make_monitor(crane_config, clock, source, sink, stop).run()
+
+class AcquisitionScheduler:
+    """
+    Two-tier acquisition (ACQUISITION_MODE = "pool"). IDLE_WORKERS threads share one
+    deadline heap of idle cranes and run each crane's idle_step() when it falls due,
+    earliest deadline first. A crane that detects motion is promoted to its own capture
+    thread (at most ACTIVE_SLOTS at once) and demoted back onto the heap once the event
+    is logged, so thread count tracks concurrent moves rather than fleet size.
+    Probe lateness, per-crane fairness and promotion latency are reported periodically.
+    With `holding` set (hot-restart successor warming up) cranes are probed but not promoted.
+    """
+    def __init__(self, monitors, workers=IDLE_WORKERS, slots=ACTIVE_SLOTS, tag="SCHED", hold=False):
+        self.monitors = monitors
+        self.tag = tag
+        self.holding = hold
+        self.threads = []
+        self.capture_threads = set()
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(slots)
+        self.cond = threading.Condition()
+        self.heap = []
+        self.seq = 0
+        self.retiring = {}  # monitor -> callback, dropped once its current step/capture ends
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        now = time.time()
+        for mon in monitors:
+            self.schedule(mon, now)
+
+    def reset_stats(self):
+        self.lateness = []
+        self.probes = {}
+        self.worst_late = {}
+        self.promotion_latency = []
+        self.active = getattr(self, 'active', 0)
+        self.peak_active = self.active
+
+    def schedule(self, mon, due):
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.heap, (due, self.seq, mon))
+            self.cond.notify()
+
+    def retire(self, mon, callback=None):
+        """
+        Take `mon` off the scheduler (lease handed over or lost). A queued crane is dropped
+        now; one in idle_step() or capture() finishes that first. Then mon.close() and
+        callback(mon) run once.
+        """
+        with self.cond:
+            queued = any(entry[2] is mon for entry in self.heap)
+            if queued:
+                self.heap = [entry for entry in self.heap if entry[2] is not mon]
+                heapq.heapify(self.heap)
+            else:
+                self.retiring[mon] = callback
+        if queued:
+            self.finish_retire(mon, callback)
+
+    def finish_retire(self, mon, callback):
+        mon.close()
+        if callback:
+            callback(mon)
+
+    def reschedule(self, mon, due):
+        """Back onto the heap, unless retire() was called while the crane was out."""
+        with self.cond:
+            if mon not in self.retiring:
+                self.seq += 1
+                heapq.heappush(self.heap, (due, self.seq, mon))
+                self.cond.notify()
+                return
+            callback = self.retiring.pop(mon)
+        self.finish_retire(mon, callback)
+
+    def next_due(self):
+        with self.cond:
+            while not stop_event.is_set():
+                now = time.time()
+                if self.heap and self.heap[0][0] <= now:
+                    due, _, mon = heapq.heappop(self.heap)
+                    return due, mon
+                self.cond.wait(min(self.heap[0][0] - now, 1.0) if self.heap else 1.0)
+        return None, None
+
+    def idle_worker(self):
+        while not stop_event.is_set():
+            due, mon = self.next_due()
+            if mon is None:
+                break
+            late = time.time() - due
+            with self.stats_lock:
+                self.lateness.append(late)
+                self.probes[mon.crane_id] = self.probes.get(mon.crane_id, 0) + 1
+                self.worst_late[mon.crane_id] = max(late, self.worst_late.get(mon.crane_id, 0.0))
+            delay, moving = mon.idle_step()
+            if moving and not self.holding:
+                thread = threading.Thread(target=self.capture_slot, args=(mon, time.time()),
+                                          name=f"capture-{mon.crane_id}", daemon=True)
+                with self.stats_lock:
+                    self.capture_threads.add(thread)
+                thread.start()
+            else:
+                self.reschedule(mon, time.time() + (IDLE_PROBE_RATE if moving else delay))
+
+    def capture_slot(self, mon, detected_at):
+        with self.slots:
+            with self.stats_lock:
+                self.promotion_latency.append(time.time() - detected_at)
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+            try:
+                mon.capture()
+            finally:
+                with self.stats_lock:
+                    self.active -= 1
+                    self.capture_threads.discard(threading.current_thread())
+                self.reschedule(mon, time.time())
+
+    def report(self):
+        while not stop_event.wait(SCHEDULER_REPORT_S):
+            with self.stats_lock:
+                lateness = np.array(self.lateness) if self.lateness else np.zeros(1)
+                probes = np.array(list(self.probes.values()), dtype=float)
+                worst = max(self.worst_late.items(), key=lambda kv: kv[1], default=('-', 0.0))
+                promo = np.array(self.promotion_latency) if self.promotion_latency else np.zeros(1)
+                n_promo = len(self.promotion_latency)
+                active, peak = self.active, self.peak_active
+                self.reset_stats()
+            # Jain's index over per-crane probe counts: 1.0 = every crane served equally
+            fairness = probes.sum() ** 2 / (len(probes) * (probes ** 2).sum()) if probes.size and probes.any() else 1.0
+            sync_print(f"[{self.tag}] probes {int(probes.sum())} ({probes.sum() / SCHEDULER_REPORT_S:.0f}/s) | "
+                       f"late p50 {np.percentile(lateness, 50) * 1000:.0f}ms p95 {np.percentile(lateness, 95) * 1000:.0f}ms "
+                       f"max {lateness.max() * 1000:.0f}ms (worst {worst[0]}) | fairness {fairness:.3f} | "
+                       f"promotions {n_promo} latency p50 {np.percentile(promo, 50) * 1000:.1f}ms "
+                       f"max {promo.max() * 1000:.1f}ms | capturing {active} (peak {peak}) | "
+                       f"threads {threading.active_count()}")
+
+    def quiesce(self, timeout):
+        """After stop_event: wait until idle probes and captures have returned (hot restart)."""
+        deadline = time.time() + timeout
+        with self.cond:
+            self.cond.notify_all()
+        with self.stats_lock:
+            threads = self.threads + list(self.capture_threads)
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.time()))
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.idle_worker, name=f"idle-scan-{i}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        threading.Thread(target=self.report, daemon=True).start()
+
+class ShardSink:
+    """
+    Worker-process output. Raw event files and fault snapshots are written (gzip) right
+    here, off the parent's GIL; KPI rows and fault edges are forwarded over `conn` to
+    the parent's sink, so crane_kpi_log.csv and the InfluxDB batch writer keep a single owner.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()  # capture threads share one pipe
+
+    def put(self, kind, args):
+        try:
+            with self.lock:
+                self.conn.send((kind, args))
+        except OSError:
+            stop_event.set()  # parent is gone: shut this worker down
+
+    def event(self, crane_id, kpis, raw, ts):
+        save_raw_event(crane_id, *raw, ts=ts, pretrigger=kpis.get('pretrigger', 0))
+        self.put('event', (crane_id, kpis, None, ts))
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        self.put('fault', (crane_id, fault_name, position, ts, snapshot))
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        self.put('fault_clear', (crane_id, fault_name, position, ts, active_s))
+
+    def snapshot(self, crane_id, path, t_fault, records):
+        save_fault_snapshot(crane_id, path, t_fault, records)
+
+def acquisition_worker(shard, conn, stop, source_factory=None):
+    """Worker process body: pool-schedule one shard of CRANES until the parent sets `stop`."""
+    name = multiprocessing.current_process().name
+    sink = ShardSink(conn)
+    if SAMPLE_BUS:
+        LIVE_BUS.open([c['id'] for c in shard])  # rings created by the parent
+    if GRAFANA_LIVE_TOKEN:
+        LIVE_PUSH.start(shard)
+    monitors = [make_monitor(c, source=source_factory(c) if source_factory else None, sink=sink)
+                for c in shard]
+    AcquisitionScheduler(monitors, tag=f"SCHED {name}").start()
+
+    def forward_link_stats():
+        while not stop_event.wait(SHARD_STATS_S):
+            now = time.time()
+            sink.put('links', {cid: link.stats(now) for cid, link in list(PLC_LINKS.items())})
+    threading.Thread(target=forward_link_stats, daemon=True).start()
+
+    while not stop.wait(1.0) and not stop_event.is_set():
+        pass
+    stop_event.set()
+    for mon in monitors:
+        mon.close()
+    LIVE_BUS.close()
+
+class ShardSupervisor:
+    """
+    Parent side of "processes" mode. CRANES are dealt round-robin over the workers so a
+    busy block is spread across cores; dead workers are restarted after WORKER_RESTART_S
+    (their PLCs reconnect with the usual staggered backoff). Each worker gets its own pipe
+    and stop event, so a crashed worker cannot leave a shared lock held. One drain thread
+    hands worker output to `sink` (default LIVE_SINK: CSV + InfluxDB) in arrival order.
+    source_factory(crane_config) -> source must be picklable (module-level); it is used
+    by scripts/analysis/bench_acquisition.py to run the shards on simulated PLCs.
+    """
+    def __init__(self, cranes, processes=ACQUISITION_PROCESSES, source_factory=None, sink=None):
+        self.ctx = multiprocessing.get_context('spawn')  # same start method as Windows everywhere
+        self.shards = [cranes[i::processes] for i in range(processes)]
+        self.source_factory = source_factory
+        self.sink = sink or LIVE_SINK
+        self.procs = [None] * processes
+        self.conns = [None] * processes
+        self.stops = [None] * processes
+        self.restarts = [0] * processes
+        self.next_start = [0.0] * processes
+        self.closing = False
+
+    def spawn(self, i):
+        reader, writer = self.ctx.Pipe(duplex=False)
+        stop = self.ctx.Event()
+        proc = self.ctx.Process(target=acquisition_worker, name=f"shard-{i}", daemon=True,
+                                args=(self.shards[i], writer, stop, self.source_factory))
+        proc.start()
+        writer.close()  # worker holds the only write end: EOF on reader == worker gone
+        self.procs[i], self.conns[i], self.stops[i] = proc, reader, stop
+
+    def supervise(self):
+        while not stop_event.wait(1.0):
+            for i, proc in enumerate(self.procs):
+                if proc.is_alive():
+                    continue
+                now = time.time()
+                if self.next_start[i] == 0.0:
+                    self.restarts[i] += 1
+                    self.next_start[i] = now + WORKER_RESTART_S
+                    sync_print(f"[!] [shard-{i}] Worker exited (code {proc.exitcode}); "
+                               f"restart #{self.restarts[i]} in {WORKER_RESTART_S:.0f}s "
+                               f"({', '.join(c['id'] for c in self.shards[i])})")
+                elif now >= self.next_start[i]:
+                    self.next_start[i] = 0.0
+                    self.spawn(i)
+
+    def dispatch(self, kind, args):
+        if kind == 'links':
+            SHARD_LINK_STATS.update(args)
+        else:
+            getattr(self.sink, kind)(*args)  # event / fault / fault_clear
+
+    def drain(self):
+        while True:
+            conns = [c for c in self.conns if c is not None]
+            if not conns:
+                if self.closing:
+                    return
+                time.sleep(0.1)
+                continue
+            for conn in multiprocessing.connection.wait(conns, timeout=1.0):
+                try:
+                    kind, args = conn.recv()
+                except (EOFError, OSError):
+                    self.conns = [None if c is conn else c for c in self.conns]
+                    conn.close()
+                    continue
+                try:
+                    self.dispatch(kind, args)
+                except Exception as e:
+                    sync_print(f"[!] Shard output error ({kind}): {e}")
+
+    def start(self):
+        sync_print(f"Acquisition: {len(self.shards)} worker processes "
+                   f"({' / '.join(str(len(s)) for s in self.shards)} cranes)")
+        for i in range(len(self.shards)):
+            self.spawn(i)
+        threading.Thread(target=self.supervise, daemon=True).start()
+        self.drainer = threading.Thread(target=self.drain, daemon=True)
+        self.drainer.start()
+
+    def close(self):
+        """Stop workers (they close open snapshots) and apply their last queued output."""
+        self.closing = True
+        for stop in self.stops:
+            stop.set()
+        for proc in self.procs:
+            proc.join(timeout=10)
+        self.drainer.join(timeout=10)
+
+class LeaseStore:
+    """
+    Crane leases in one SQLite file shared by every logger instance. Each call is one short
+    BEGIN IMMEDIATE transaction, so two nodes can never both take a free or expired lease.
+    `nodes` holds the instance heartbeats that define the live set for rebalancing.
+    Times are each writer's wall clock (see LEASE_GUARD_S).
+    """
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=LEASE_RENEW_S, isolation_level=None, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS leases (crane_id TEXT PRIMARY KEY, owner TEXT, expires REAL, epoch INTEGER);
+            CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, last_seen REAL);
+        """)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def heartbeat(self, node_id, now):
+        """Record `node_id` as alive. Returns the sorted live node ids (including it)."""
+        with self.transaction():
+            self.db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (node_id, now))
+            rows = self.db.execute("SELECT node_id FROM nodes WHERE last_seen > ?", (now - LEASE_TTL_S,))
+            return sorted(r[0] for r in rows)
+
+    def sync(self, node_id, renew, take, release, now):
+        """
+        Release, renew, then take (only if free or expired) in one transaction.
+        Returns {crane_id: expires} for every lease `node_id` holds afterwards.
+        """
+        expires = now + LEASE_TTL_S
+        with self.transaction():
+            self.db.executemany("UPDATE leases SET owner = NULL, expires = 0 WHERE crane_id = ? AND owner = ?",
+                                [(cid, node_id) for cid in release])
+            # A lapsed lease is not revived: its monitor already stopped at the guard
+            self.db.executemany("UPDATE leases SET expires = ? WHERE crane_id = ? AND owner = ? AND expires > ?",
+                                [(expires, cid, node_id, now) for cid in renew])
+            for cid in take:
+                row = self.db.execute("SELECT expires FROM leases WHERE crane_id = ?", (cid,)).fetchone()
+                if row is None:
+                    self.db.execute("INSERT INTO leases VALUES (?, ?, ?, 1)", (cid, node_id, expires))
+                elif row[0] <= now:
+                    self.db.execute("UPDATE leases SET owner = ?, expires = ?, epoch = epoch + 1 WHERE crane_id = ?",
+                                    (node_id, expires, cid))
+            rows = self.db.execute("SELECT crane_id, expires FROM leases WHERE owner = ? AND expires > ?",
+                                   (node_id, now))
+            return dict(rows.fetchall())
+
+    def leave(self, node_id):
+        """Clean shutdown: free every lease at once and drop out of the live set."""
+        with self.transaction():
+            self.db.execute("UPDATE leases SET owner = NULL, expires = 0 WHERE owner = ?", (node_id,))
+            self.db.execute("DELETE FROM nodes WHERE node_id = ?", (node_id,))
+
+    def close(self):
+        self.db.close()
+
+class FencedSink:
+    """
+    Output gate: anything for a crane this instance does not hold is dropped. `leases` is
+    a LeaseManager, or a HandoffSuccessor that holds nothing until it has taken over.
+    """
+    def __init__(self, sink, leases):
+        self.sink = sink
+        self.leases = leases
+
+    def allowed(self, crane_id, what):
+        if self.leases.holds(crane_id):
+            return True
+        sync_print(f"[FENCE] [{crane_id}] Not held by this instance, {what} not written.")
+        return False
+
+    def event(self, crane_id, kpis, raw, ts):
+        if self.allowed(crane_id, "event"):
+            self.sink.event(crane_id, kpis, raw, ts)
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        if self.allowed(crane_id, f"{fault_name} fault"):
+            self.sink.fault(crane_id, fault_name, position, ts, snapshot)
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        if self.allowed(crane_id, f"{fault_name} clear"):
+            self.sink.fault_clear(crane_id, fault_name, position, ts, active_s)
+
+    def snapshot(self, crane_id, path, t_fault, records):
+        if self.allowed(crane_id, "fault snapshot"):
+            self.sink.snapshot(crane_id, path, t_fault, records)
+
+class LeaseManager:
+    """
+    Lease-driven crane ownership for one logger instance (LEASE_DB set). Every LEASE_RENEW_S
+    it heartbeats, picks the cranes it should own (rendezvous hash over live nodes), syncs
+    leases and adds or retires monitors on its AcquisitionScheduler:
+    - taken: a new monitor, first connects staggered by CONNECT_STAGGER_S;
+    - handed to a joining node: retired once idle, lease released on the next cycle;
+    - lost, or not renewed LEASE_GUARD_S before expiry: output fenced, capture aborted.
+    Output goes through FencedSink, so each event is written by exactly one instance.
+    source_factory(crane_config) -> source is for scripts/analysis/lease_cluster.py.
+    """
+    def __init__(self, store, cranes, node_id=NODE_ID, source_factory=None, sink=None):
+        self.store = store
+        self.cranes = {c['id']: c for c in cranes}
+        self.node_id = node_id
+        self.source_factory = source_factory
+        self.sink = FencedSink(sink or LIVE_SINK, self)
+        self.scheduler = AcquisitionScheduler([], tag=f"SCHED {node_id}")
+        self.lock = threading.RLock()  # a queued crane is retired (handed_over) from inside cycle()
+        self.valid_until = {}   # crane_id -> local deadline for acquisition and output
+        self.monitors = {}      # crane_id -> monitor on the scheduler
+        self.handing_over = set()
+        self.to_release = set()
+        self.closed = False
+
+    def holds(self, crane_id):
+        return time.time() < self.valid_until.get(crane_id, 0.0)
+
+    def owned(self):
+        return [self.cranes[cid] for cid in sorted(self.monitors)]
+
+    def desired(self, live):
+        """Highest-random-weight owner per crane: a node joining or leaving only moves its share."""
+        def weight(node, cid):
+            return hashlib.sha1(f"{node}/{cid}".encode()).digest()
+        return {cid for cid in self.cranes if max(live, key=lambda n: weight(n, cid)) == self.node_id}
+
+    def cycle(self):
+        with self.lock:
+            if self.closed:
+                return
+            now = time.time()
+            want = self.desired(self.store.heartbeat(self.node_id, now))
+            owned = set(self.monitors)
+            held = self.store.sync(self.node_id, owned, want - owned, self.to_release - owned, now)
+            self.to_release.clear()
+            for cid, expires in held.items():
+                if cid in owned:
+                    self.valid_until[cid] = expires - LEASE_GUARD_S
+            for cid in sorted(owned - set(held)):
+                self.drop(cid, "lost (taken by another node)")
+            new = sorted(set(held) - owned)
+            for i, cid in enumerate(new):
+                self.valid_until[cid] = held[cid] - LEASE_GUARD_S
+                self.add(cid, now + i * CONNECT_STAGGER_S)
+            handover = sorted((owned & set(held)) - want - self.handing_over)
+            for cid in handover:
+                self.handing_over.add(cid)
+                self.scheduler.retire(self.monitors[cid], self.handed_over)
+            if new or handover:
+                sync_print(f"[LEASE] [{self.node_id}] owns {len(self.monitors)}/{len(self.cranes)} | "
+                           f"took: {', '.join(new) or '-'} | handing over: {', '.join(handover) or '-'}")
+
+    def expire(self):
+        """Local guard: stop cranes whose lease could not be renewed in time."""
+        with self.lock:
+            now = time.time()
+            for cid in sorted(cid for cid in self.monitors if self.valid_until.get(cid, 0.0) <= now):
+                self.drop(cid, "not renewed (lease store unreachable?)")
+
+    def add(self, cid, connect_at):
+        config = self.cranes[cid]
+        source = self.source_factory(config) if self.source_factory else None
+        mon = make_monitor(config, source=source, sink=self.sink, stop=threading.Event())
+        mon.link.next_attempt = connect_at
+        self.monitors[cid] = mon
+        self.scheduler.schedule(mon, time.time())
+
+    def drop(self, cid, reason):
+        """Forced stop: fence output first, then abort any capture in progress."""
+        sync_print(f"[!] [LEASE] [{cid}] Lease {reason}; monitoring stopped on {self.node_id}.")
+        self.valid_until.pop(cid, None)
+        self.handing_over.discard(cid)
+        mon = self.monitors.pop(cid)
+        mon.stop.set()
+        self.scheduler.retire(mon, self.detach)
+
+    def handed_over(self, mon):
+        with self.lock:
+            self.detach(mon)
+            if self.monitors.get(mon.crane_id) is mon:
+                del self.monitors[mon.crane_id]
+                self.valid_until.pop(mon.crane_id, None)
+                self.handing_over.discard(mon.crane_id)
+                self.to_release.add(mon.crane_id)
+
+    def detach(self, mon):
+        """Free the PLC session for the new owner."""
+        mon.source.disconnect()
+        if PLC_LINKS.get(mon.crane_id) is mon.link:
+            del PLC_LINKS[mon.crane_id]
+        if MONITORS.get(mon.crane_id) is mon:
+            del MONITORS[mon.crane_id]
+
+    def run(self):
+        while not stop_event.wait(LEASE_RENEW_S):
+            try:
+                self.cycle()
+            except Exception as e:
+                sync_print(f"[!] [LEASE] Lease store error: {e}")
+            self.expire()
+
+    def start(self):
+        """First lease cycle runs inline, so owned() is known when this returns."""
+        try:
+            self.cycle()
+        except Exception as e:
+            sync_print(f"[!] [LEASE] Lease store error: {e}")
+        sync_print(f"Acquisition: lease mode as node '{self.node_id}', "
+                   f"{len(self.monitors)}/{len(self.cranes)} cranes owned")
+        self.scheduler.start()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def close(self):
+        """Stop every monitor (closing open snapshots), then free the leases for the survivors."""
+        with self.lock:
+            self.closed = True
+            monitors = list(self.monitors.values())
+            for mon in monitors:
+                mon.close()
+            self.valid_until.clear()  # events cut short by the shutdown are not written
+            for mon in monitors:
+                mon.stop.set()
+            try:
+                self.store.leave(self.node_id)
+            except Exception as e:
+                sync_print(f"[!] [LEASE] Could not release leases ({e}); they lapse in {LEASE_TTL_S:.0f}s.")
+            self.store.close()
+
+@functools.lru_cache(maxsize=None)
+def ipc_authkey():
+    """Authkey of the local listeners (see IPC_KEY_FILE). The first process to create the file wins."""
+    if os.environ.get("CRANEPDM_IPC_KEY"):
+        return bytes.fromhex(os.environ["CRANEPDM_IPC_KEY"])
+    if not os.path.exists(IPC_KEY_FILE):
+        os.makedirs(os.path.dirname(IPC_KEY_FILE), exist_ok=True)
+        tmp = f"{IPC_KEY_FILE}.{os.getpid()}.tmp"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            os.link(tmp, IPC_KEY_FILE)  # never replaces a key another instance already uses
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(IPC_KEY_FILE, 'rb') as f:
+        return f.read()
+
+def port_in_use(port):
+    """Whether something listens on 127.0.0.1:port (checked by binding it, so the listener sees no connection)."""
+    with socket.socket() as s:
+        if os.name == 'posix':  # as multiprocessing's Listener: pass TIME_WAIT (on Windows this would steal the port)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(('127.0.0.1', port))
+        except OSError:
+            return True
+    return False
+
+def bind_when_free(make):
+    """
+    make() -> a server / listener bound to its port. Retried every second while a hot-restart
+    predecessor still holds the port; None if we are stopping first.
+    """
+    while not stop_event.is_set():
+        try:
+            return make()
+        except OSError:
+            stop_event.wait(1.0)
+    return None
+
+class HandoffServer:
+    """
+    Predecessor side of a hot restart. Listens on HANDOFF_PORT; once the successor is
+    warmed up and asks, stops sampling, turns captures in progress into carry-over state,
+    closes open snapshots, flushes InfluxDB, sends the state and calls on_exit().
+    A successor that dies while warming up is ignored and sampling simply continues.
+    """
+    def __init__(self, monitors, scheduler, on_exit):
+        self.monitors = monitors
+        self.scheduler = scheduler
+        self.on_exit = on_exit
+
+    def serve(self):
+        listener = bind_when_free(lambda: multiprocessing.connection.Listener(('127.0.0.1', HANDOFF_PORT),
+                                                                             authkey=ipc_authkey()))
+        while not stop_event.is_set():
+            try:
+                with listener.accept() as conn:
+                    if self.hand_over(conn):
+                        break
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                sync_print(f"[!] [HANDOFF] Successor dropped before taking over ({e!r}); continuing.")
+        if listener is not None:
+            listener.close()
+
+    def hand_over(self, conn):
+        _, pid = conn.recv()
+        sync_print(f"[HANDOFF] Successor (pid {pid}) is connecting to the PLCs; sampling continues here.")
+        conn.recv()  # 'take over': successor is warmed up
+        t_stop = time.time()
+        handoff_event.set()
+        stop_event.set()
+        self.scheduler.quiesce(HANDOFF_QUIESCE_S)
+        state = {mon.crane_id: mon.carry_state() for mon in self.monitors}
+        for mon in self.monitors:
+            mon.close()
+        RAIL_CUBE.flush()
+        RAINFLOW.flush()
+        SCORER.save()  # the successor reloads it once we answer
+        ALERTS.drain()
+        LEDGER.flush()
+        write_api.close()  # pending InfluxDB batch goes out before the successor writes
+        conn.send((t_stop, state))
+        n_events = sum(1 for st in state.values() if st['event'] is not None)
+        sync_print(f"[HANDOFF] Handed over {len(state)} cranes ({n_events} events in flight). Exiting.")
+        self.on_exit()
+        return True
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+
+class HandoffSuccessor:
+    """
+    Successor side of a hot restart. connect() finds a running instance on HANDOFF_PORT.
+    Until take_over() the pool scheduler runs held (connect + idle probing, no captures)
+    and FencedSink drops output. When every PLC session is past CONNECT_SETTLE_S or has
+    failed once (at most HANDOFF_WARMUP_S), the predecessor is asked to exit, its in-flight events and fault
+    bits are adopted and captures/output start here.
+    """
+    @staticmethod
+    def warmed_up(mon, now):
+        up = mon.link.up_since
+        return mon.link.failures > 0 or (mon.source.connected() and up is not None and now - up > CONNECT_SETTLE_S)
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.live = False
+
+    @classmethod
+    def connect(cls):
+        try:
+            conn = multiprocessing.connection.Client(('127.0.0.1', HANDOFF_PORT), authkey=ipc_authkey())
+            conn.send(('hello', os.getpid()))
+        except multiprocessing.AuthenticationError:
+            # A build from before the per-install key (or another account): it cannot hand over,
+            # so start cold once it is gone (update_exe.ps1 stops it) rather than log beside it.
+            sync_print("[!] [HANDOFF] Running instance has a different handoff key; starting once it has exited.")
+            while port_in_use(HANDOFF_PORT) and not stop_event.wait(1.0):
+                pass
+            return None
+        except (OSError, EOFError):
+            return None  # nothing running: cold start
+        return cls(conn)
+
+    def holds(self, crane_id):
+        return self.live
+
+    def take_over(self, monitors, scheduler):
+        deadline = time.time() + HANDOFF_WARMUP_S
+        while time.time() < deadline and not all(self.warmed_up(m, time.time()) for m in monitors):
+            time.sleep(0.1)
+        connected = sum(1 for m in monitors if m.source.connected())
+        t_stop, state = None, {}
+        try:
+            self.conn.send('take over')
+            if self.conn.poll(HANDOFF_TIMEOUT_S):
+                t_stop, state = self.conn.recv()
+        except (OSError, EOFError) as e:
+            sync_print(f"[!] [HANDOFF] Predecessor lost during handoff ({e!r}); continuing without its state.")
+        self.conn.close()
+        if ANOMALY_STATE_FILE:
+            SCORER.load()  # baselines as the predecessor saved them right before answering
+        for mon in monitors:
+            mon.adopt(state.get(mon.crane_id))
+        LIVE_BUS.active = bool(LIVE_BUS.rings)
+        LIVE_PUSH.active = bool(LIVE_PUSH.states)
+        self.live = True
+        scheduler.holding = False
+        resumed = sum(1 for m in monitors if m.carry is not None)
+        gap = f"{(time.time() - t_stop) * 1000:.0f}ms" if t_stop else "n/a"
+        sync_print(f"[HANDOFF] Took over: {connected}/{len(monitors)} PLCs connected, "
+                   f"{resumed} events resumed, sampling gap {gap}")
+
+def start_pool_acquisition(cranes, on_exit, source_factory=None, sink=None):
+    """
+    Pool-mode acquisition with hot restart. A running instance is taken over if one answers
+    on HANDOFF_PORT, otherwise sampling starts cold; either way this instance then serves
+    the next one. Returns (monitors, took_over).
+    """
+    successor = HandoffSuccessor.connect()
+    sink = sink or LIVE_SINK
+    if successor:
+        sink = FencedSink(sink, successor)
+        LIVE_BUS.active = False  # predecessor keeps writing the rings until take_over()
+        LIVE_PUSH.active = False  # ... and pushing live state
+    monitors = [make_monitor(c, source=source_factory(c) if source_factory else None, sink=sink)
+                for c in cranes]
+    scheduler = AcquisitionScheduler(monitors, hold=successor is not None)
+    scheduler.start()
+    server = HandoffServer(monitors, scheduler, on_exit)
+    if successor:
+        def take_over():
+            successor.take_over(monitors, scheduler)
+            server.start()
+        threading.Thread(target=take_over, daemon=True).start()
+    else:
+        server.start()
+    return monitors, successor is not None
+
+class BrokerRead:
+    """One on-demand broker read. It runs on the owning monitor's thread: snap7 clients are not thread-safe."""
+    def __init__(self, area, db, start, size):
+        self.area, self.db, self.start, self.size = area, db, start, size
+        self.done = threading.Event()
+        self.cancelled = False
+        self.data = None
+        self.error = None
+
+    def run(self, source):
+        if self.cancelled:
+            return
+        try:
+            self.data = source.read_raw(self.area, self.db, self.start, self.size)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        self.done.set()
+
+class BrokerSubscriber:
+    """Bounded sample queue for one subscribed tool; publish() never blocks on it."""
+    def __init__(self, cranes):
+        self.cranes = set(cranes) if cranes else None
+        self.queue = deque(maxlen=BROKER_QUEUE)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, sample):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(sample)
+            self.cond.notify()
+
+    def drain(self, timeout):
+        with self.cond:
+            if not self.queue:
+                self.cond.wait(timeout)
+            batch, self.queue = list(self.queue), deque(maxlen=BROKER_QUEUE)
+            dropped, self.dropped = self.dropped, 0
+        return batch, dropped
+
+class PLCBroker:
+    """
+    Local PLC broker on BROKER_PORT. Tools talk to the logger's existing S7 sessions, so
+    each PLC keeps exactly one connection. Requests (multiprocessing.connection, authkey):
+    - ('read', crane_id, area, db, start, size), area 'DB' or 'M': queued on the crane's
+      monitor and run between its own reads, at most BROKER_READ_RATE per crane.
+      Reply ('ok', bytes) or ('error', message).
+    - ('cranes',): ('ok', {crane_id: session connected}).
+    - ('subscribe', crane_ids or None): the connection then streams
+      ('samples', [(crane_id, t, kind, values), ...], dropped) of every idle probe
+      ('order' / 'speed') and full sample ('sample' / 'qc') the logger takes.
+    """
+    def __init__(self):
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.buckets = {}  # crane_id -> [tokens, last refill]
+
+    def publish(self, crane_id, t, kind, values):
+        for sub in self.subscribers:
+            if sub.cranes is None or crane_id in sub.cranes:
+                sub.put((crane_id, t, kind, values))
+
+    def take_token(self, crane_id):
+        """Token bucket per crane. Returns 0 if the read may go ahead, else seconds to wait."""
+        now = time.time()
+        with self.lock:
+            bucket = self.buckets.setdefault(crane_id, [BROKER_READ_BURST, now])
+            bucket[0] = min(BROKER_READ_BURST, bucket[0] + (now - bucket[1]) * BROKER_READ_RATE)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                return (1.0 - bucket[0]) / BROKER_READ_RATE
+            bucket[0] -= 1.0
+            return 0.0
+
+    def read(self, crane_id, area, db, start, size):
+        mon = MONITORS.get(crane_id)
+        if mon is None:
+            return 'error', f"crane {crane_id} is not monitored by this logger"
+        if area not in ('DB', 'M') or not 0 < size <= BROKER_MAX_BYTES or start < 0:
+            return 'error', f"bad request: area DB/M, 1..{BROKER_MAX_BYTES} bytes"
+        if not mon.source.connected():
+            return 'error', f"PLC session for {crane_id} is down"
+        wait = self.take_token(crane_id)
+        if wait:
+            return 'error', f"rate limited ({BROKER_READ_RATE:g}/s per crane), retry in {wait:.1f}s"
+        req = BrokerRead(area, db, start, size)
+        mon.broker_reads.append(req)
+        if not req.done.wait(BROKER_READ_TIMEOUT_S):
+            req.cancelled = True
+            return 'error', "timed out (crane reconnecting?)"
+        return ('error', req.error) if req.error else ('ok', req.data)
+
+    def stream(self, conn, cranes):
+        sub = BrokerSubscriber(cranes)
+        with self.lock:
+            self.subscribers = self.subscribers + [sub]  # copy-on-write: publish() iterates lock-free
+        try:
+            while not stop_event.is_set():
+                batch, dropped = sub.drain(1.0)
+                if batch or dropped:
+                    conn.send(('samples', batch, dropped))
+        finally:
+            with self.lock:
+                self.subscribers = [s for s in self.subscribers if s is not sub]
+
+    @staticmethod
+    def malformed(request):
+        """Why `request` does not have one of the shapes above, or None."""
+        if not isinstance(request, tuple):
+            return f"request must be a tuple, not {type(request).__name__}"
+        if not request:
+            return "empty request"
+        kind, args = request[0], request[1:]
+        if kind == 'read':
+            if len(args) != 5 or not all(isinstance(v, str) for v in args[:2]) \
+                    or not all(isinstance(v, int) and not isinstance(v, bool) for v in args[2:]):
+                return "read takes (crane_id, area, db, start, size): str, str, int, int, int"
+        elif kind == 'cranes':
+            if args:
+                return "cranes takes no arguments"
+        elif kind == 'subscribe':
+            if len(args) != 1 or not (args[0] is None or isinstance(args[0], (list, tuple, set))):
+                return "subscribe takes (crane_ids or None)"
+        return None
+
+    def handle(self, conn):
+        try:
+            with conn:
+                while not stop_event.is_set():
+                    request = conn.recv()
+                    error = self.malformed(request)
+                    if error:
+                        conn.send(('error', f"bad request: {error}"))
+                        continue
+                    kind = request[0]
+                    if kind == 'read':
+                        conn.send(self.read(*request[1:]))
+                    elif kind == 'cranes':
+                        conn.send(('ok', {cid: mon.source.connected() for cid, mon in list(MONITORS.items())}))
+                    elif kind == 'subscribe':
+                        self.stream(conn, request[1])
+                        return
+                    else:
+                        conn.send(('error', f"unknown request {kind!r}"))
+        except (EOFError, OSError):
+            pass  # tool disconnected
+
+    def serve(self):
+        listener = bind_when_free(lambda: multiprocessing.connection.Listener(('127.0.0.1', BROKER_PORT),
+                                                                             authkey=ipc_authkey()))
+        while not stop_event.is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                sync_print(f"[!] [BROKER] Rejected connection: {e!r}")
+                continue
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+
+LIVE_BROKER = PLCBroker()
+
+class GrafanaLive:
+    """
+    Per-crane live state pushed to Grafana Live (POST /api/live/push/GRAFANA_LIVE_STREAM,
+    Influx line protocol, one measurement crane_<id> per crane). Monitors update the state
+    from their own threads; one pusher thread sends the cranes that changed every
+    LIVE_PUSH_S and the ones still being sampled every LIVE_KEEPALIVE_S, so a crane whose
+    lease moved to another node or whose PLC is down goes quiet instead of repeating.
+    """
+    def __init__(self):
+        self.states = {}  # crane_id -> state dict, only for cranes started here
+        self.changed = set()
+        self.lock = threading.Lock()
+        self.active = False
+        self.conn = None
+        self.path = None
+        self.failing = False
+
+    def start(self, cranes):
+        for c in cranes:
+            self.states[c['id']] = {'type': c.get('type', 'ARMGC'), 't': 0.0, 'moving': False, 'speed': 0,
+                                    'position': 0, 'damage': 0.0, 'fault': '', 'faults': frozenset()}
+        self.active = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def update(self, crane_id, t, **fields):
+        state = self.states.get(crane_id)
+        if state is None:
+            return
+        with self.lock:
+            state['t'] = t
+            for key, value in fields.items():
+                if state[key] != value:
+                    state[key] = value
+                    self.changed.add(crane_id)
+
+    def publish(self, crane_id, t, kind, values):
+        if kind == 'sample':
+            self.update(crane_id, t, speed=values[1], position=values[4])  # feedback: actual speed
+        elif kind == 'qc':
+            self.update(crane_id, t, speed=values[0])
+        else:
+            self.update(crane_id, t, speed=values)  # idle probe: order / speed word only
+
+    def fault(self, crane_id, t, rising, falling):
+        state = self.states.get(crane_id)
+        if state is None:
+            return
+        faults = (state['faults'] | set(rising)) - {name for name, _ in falling}
+        self.update(crane_id, t, faults=frozenset(faults), **({'fault': rising[-1]} if rising else {}))
+
+    @staticmethod
+    def line(crane_id, s):
+        fault = s['fault'].replace('\\', '\\\\').replace('"', '\\"')
+        return (f"crane_{crane_id},type={s['type']} moving={str(s['moving']).lower()},speed={int(s['speed'])}i,"
+                f"position={int(s['position'])}i,damage={float(s['damage'])},fault=\"{fault}\","
+                f"faults_active={len(s['faults'])}i {int(s['t'] * 1e9)}")
+
+    def push(self, body):
+        try:
+            if self.conn is None:
+                url = urllib.parse.urlsplit(GRAFANA_URL)
+                cls = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+                self.conn = cls(url.netloc, timeout=LIVE_PUSH_TIMEOUT_S)
+                self.path = f"{url.path.rstrip('/')}/api/live/push/{GRAFANA_LIVE_STREAM}"
+            self.conn.request('POST', self.path, body.encode(), {
+                'Authorization': f"Bearer {GRAFANA_LIVE_TOKEN}", 'Content-Type': 'text/plain'})
+            resp = self.conn.getresponse()
+            reply = resp.read()
+            if resp.status >= 300:
+                raise RuntimeError(f"HTTP {resp.status} {reply[:200]!r}")
+        except Exception as e:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            if not self.failing:
+                sync_print(f"[!] [LIVE] Grafana Live push failed: {e}. Live updates are dropped until it recovers.")
+                self.failing = True
+            return
+        if self.failing:
+            sync_print("[LIVE] Grafana Live push recovered.")
+            self.failing = False
+
+    def run(self):
+        next_keepalive = 0.0
+        while not stop_event.wait(LIVE_PUSH_S):
+            if not self.active:
+                continue  # hot restart: predecessor pushes until take_over()
+            now = time.time()
+            with self.lock:
+                cranes, self.changed = self.changed, set()
+                if now >= next_keepalive:
+                    next_keepalive = now + LIVE_KEEPALIVE_S
+                    cranes.update(cid for cid, s in self.states.items() if now - s['t'] < LIVE_KEEPALIVE_S)
+                lines = [self.line(cid, self.states[cid]) for cid in sorted(cranes)]
+            if lines:
+                self.push("\n".join(lines))
+
+LIVE_PUSH = GrafanaLive()
+
+class FleetState:
+    """
+    In-memory fleet aggregates, updated by LiveSink on every logged event and fault edge:
+    per crane the daily totals of the last FLEET_DAYS days, rolling FLEET_ROLLING_H damage
+    windows (running sums, expired on access), all-time totals, last event and last fault.
+    rebuild() replays CSV_FILE at startup; the last fault comes from the flight-recorder
+    snapshot names (faults are not in the CSV). Every query is answered from memory.
+    """
+    def __init__(self):
+        self.cranes = {}
+        self.lock = threading.Lock()
+        self.version = 0
+        self.rebuilding = False
+        self.cache = (None, None)  # ((version, second), /fleet JSON)
+
+    def crane(self, crane_id):
+        c = self.cranes.get(crane_id)
+        if c is None:
+            c = self.cranes[crane_id] = {
+                'type': "QC" if crane_id.startswith("1") else "ARMGC",
+                'days': {}, 'windows': {h: [deque(), 0.0] for h in FLEET_ROLLING_H},
+                'events': 0, 'damage': 0.0, 'last_event': None, 'last_fault': None,
+            }
+        return c
+
+    def event(self, crane_id, kpis, ts):
+        t = ts.timestamp()
+        damage = float(kpis['reducer_damage'])
+        peak_shock = float(kpis['peak_shock'])
+        with self.lock:
+            c = self.crane(crane_id)
+            day = c['days'].get(ts.date().isoformat())
+            if day is None:
+                day = c['days'][ts.date().isoformat()] = {'events': 0, 'damage': 0.0, 'peak_shock': 0.0,
+                                                           'shock_sum': 0.0, 'loaded': 0, 'duration': 0.0}
+                while len(c['days']) > FLEET_DAYS:
+                    del c['days'][min(c['days'])]
+            day['events'] += 1
+            day['damage'] += damage
+            day['peak_shock'] = max(day['peak_shock'], peak_shock)
+            day['shock_sum'] += float(kpis['shock_penalty'])
+            day['loaded'] += bool(kpis['is_loaded'])
+            day['duration'] += float(kpis['duration'])
+            for h, window in c['windows'].items():
+                if t > time.time() - h * 3600:
+                    dq = window[0]
+                    if not dq or t >= dq[-1][0]:
+                        dq.append((t, damage))
+                    else:  # CSV rows replayed by rebuild() after live events: keep expire() in time order
+                        bisect.insort(dq, (t, damage))
+                    window[1] += damage
+            c['events'] += 1
+            c['damage'] += damage
+            if c['last_event'] is None or t >= c['last_event']['t']:
+                c['last_event'] = {'t': t, 'time': ts.isoformat(timespec='seconds'), 'damage': damage,
+                                   'duration': float(kpis['duration']), 'peak_shock': peak_shock,
+                                   'peak_shock_pos': float(kpis.get('peak_shock_pos', 0.0)),
+                                   'is_loaded': bool(kpis['is_loaded']), 'avg_pos': float(kpis['avg_pos']),
+                                   'anomaly_score': kpis.get('anomaly_score')}
+            self.version += 1
+
+    def fault(self, crane_id, fault_name, position, ts):
+        t = ts.timestamp()
+        with self.lock:
+            c = self.crane(crane_id)
+            if c['last_fault'] is None or t >= c['last_fault']['t']:
+                c['last_fault'] = {'t': t, 'time': ts.isoformat(timespec='seconds'),
+                                   'name': fault_name, 'position': None if position is None else float(position)}
+                self.version += 1
+
+    def rebuild(self):
+        """Replay CSV_FILE (up to its size now: later rows arrive through event()) and the fault snapshots."""
+        self.rebuilding = True
+        t0 = time.time()
+        rows = 0
+        try:
+            size = os.path.getsize(CSV_FILE) if os.path.exists(CSV_FILE) else 0
+            with open(CSV_FILE, 'rb') as f:
+                f.readline()  # header
+                while f.tell() < size:
+                    r = f.readline().decode('utf-8', 'replace').rstrip('\r\n').split(',')
+                    try:
+                        if float(r[3] or 0) <= 0:
+                            continue  # initialize_influx_kpis() heartbeat row written at each cold start
+                        kpis = {'duration': r[3], 'reducer_damage': r[8], 'is_loaded': r[10] == '1',
+                                'shock_penalty': r[11], 'peak_shock': r[12], 'avg_pos': r[17],
+                                'peak_shock_pos': r[18] if len(r) > 18 else 0.0}
+                        self.event(r[1], kpis, datetime.fromisoformat(r[0]))
+                        rows += 1
+                    except (IndexError, ValueError):
+                        pass  # partial last line / pre-V2 row layout
+        except OSError as e:
+            sync_print(f"[!] [FLEET] Could not replay {CSV_FILE}: {e}")
+        for path in glob.glob(os.path.join(RAW_DATA_DIR, '*', 'faults', '*.csv.gz')):
+            day = os.path.basename(os.path.dirname(os.path.dirname(path)))
+            try:
+                crane_id, hms, fault_name = os.path.basename(path)[:-len('.csv.gz')].split('_', 2)
+                self.fault(crane_id, fault_name, None, datetime.strptime(day + hms, '%Y-%m-%d%H%M%S'))
+            except ValueError:
+                pass
+        self.rebuilding = False
+        sync_print(f"[FLEET] Rebuilt {len(self.cranes)} cranes from {rows} logged events in {time.time() - t0:.1f}s")
+
+    @staticmethod
+    def expire(c, now):
+        for h, window in c['windows'].items():
+            dq, horizon = window[0], now - h * 3600
+            while dq and dq[0][0] <= horizon:
+                window[1] -= dq.popleft()[1]
+            if not dq:
+                window[1] = 0.0  # no float drift once the window is empty
+
+    def metric(self, c, by, now, today):
+        if by == 'damage_total':
+            return c['damage']
+        if by.startswith('damage_') and by.endswith('h') and by[7:-1].isdigit():
+            window = c['windows'].get(int(by[7:-1]))
+            if window is None:
+                raise ValueError(f"no rolling window {by}")
+            self.expire(c, now)
+            return window[1]
+        if by.endswith('_today') and by[:-6] in ('damage', 'events', 'peak_shock'):
+            return c['days'].get(today, {}).get(by[:-6], 0)
+        raise ValueError(f"unknown ranking {by!r}")
+
+    def summary(self, c, now, today, history=False):
+        self.expire(c, now)
+        day = c['days'].get(today)
+        out = {
+            'type': c['type'],
+            'today': self.day_json(day) if day else None,
+            'rolling': {f"{h}h": {'events': len(w[0]), 'damage': round(w[1], 2)} for h, w in c['windows'].items()},
+            'total': {'events': c['events'], 'damage': round(c['damage'], 2)},
+            'last_event': c['last_event'],
+            'last_fault': c['last_fault'],
+        }
+        if history:
+            out['days'] = {d: self.day_json(v) for d, v in sorted(c['days'].items())}
+        return out
+
+    @staticmethod
+    def day_json(day):
+        return {'events': day['events'], 'damage': round(day['damage'], 2), 'peak_shock': day['peak_shock'],
+                'avg_shock_penalty': round(day['shock_sum'] / day['events'], 3),
+                'loaded': day['loaded'], 'duration_s': round(day['duration'], 1)}
+
+    def fleet_json(self):
+        """/fleet body, re-encoded at most once per second and per change."""
+        now = time.time()
+        key = (self.version, int(now))
+        cached_key, body = self.cache
+        if cached_key != key:
+            today = datetime.now().date().isoformat()
+            with self.lock:
+                cranes = {cid: self.summary(c, now, today) for cid, c in sorted(self.cranes.items())}
+            body = json.dumps({'rebuilding': self.rebuilding, 'cranes': cranes}).encode()
+            self.cache = (key, body)
+        return body
+
+    def crane_json(self, crane_id):
+        now, today = time.time(), datetime.now().date().isoformat()
+        with self.lock:
+            c = self.cranes.get(crane_id)
+            if c is None:
+                return None
+            body = dict(crane_id=crane_id, rebuilding=self.rebuilding, **self.summary(c, now, today, history=True))
+        return json.dumps(body).encode()
+
+    def top_json(self, n, by):
+        now, today = time.time(), datetime.now().date().isoformat()
+        with self.lock:
+            ranked = heapq.nlargest(n, ((self.metric(c, by, now, today), cid) for cid, c in self.cranes.items()))
+            rows = [{'crane_id': cid, by: round(value, 3), 'last_event': self.cranes[cid]['last_event']}
+                    for value, cid in ranked]
+        return json.dumps({'by': by, 'rebuilding': self.rebuilding, 'top': rows}).encode()
+
+    def serve(self):
+        server = bind_when_free(lambda: ThreadingHTTPServer((FLEET_HOST, FLEET_PORT), FleetHandler))
+        if server:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            stop_event.wait()
+            server.shutdown()
+
+    def start(self):
+        self.rebuilding = True
+        threading.Thread(target=self.rebuild, daemon=True).start()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+class FleetHandler(BaseHTTPRequestHandler):
+    """GET-only JSON API over FLEET (see FLEET_PORT)."""
+    protocol_version = "HTTP/1.1"  # keep-alive: a dashboard poller reuses its connection
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if parts == ['fleet']:
+                body = FLEET.fleet_json()
+            elif len(parts) == 2 and parts[0] == 'fleet':
+                body = FLEET.crane_json(parts[1])
+                if body is None:
+                    return self.reply(404, {'error': f"no data for crane {parts[1]}"})
+            elif parts == ['top']:
+                body = FLEET.top_json(max(1, int(query.get('n', 5))), query.get('by', 'damage_today'))
+            elif parts == ['health']:
+                body = json.dumps({'rebuilding': FLEET.rebuilding, 'cranes': len(FLEET.cranes)}).encode()
+            elif parts[:1] == ['ledger'] and LEDGER_DB and len(parts) <= 2:
+                body = LEDGER.ledger_json() if len(parts) == 1 else LEDGER.crane_json(parts[1])
+                if body is None:
+                    return self.reply(404, {'error': f"no ledger for crane {parts[1]}"})
+            else:
+                return self.reply(404, {'error': "endpoints: /fleet, /fleet/<crane_id>, /top?n=&by=, /health, "
+                                                 "/ledger, /ledger/<crane_id>"})
+        except ValueError as e:
+            return self.reply(400, {'error': str(e)})
+        self.reply(200, body)
+
+    def reply(self, status, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+FLEET = FleetState()
+
+class DeltaStore:
+    """
+    Additive per-key deltas kept in memory and upserted into one SQLite table by a flush
+    thread, so restarts and a hot-restart successor keep adding to the same rows (RailCube,
+    RainflowStore, DamageLedger). Subclasses give the table (SCHEMA, UPSERT over
+    (*key, *delta)), combine() for deltas re-queued after a failed upsert, merged() run inside
+    the upsert transaction and flushed() run once it committed. Only a failed upsert re-queues.
+    """
+    TAG = None      # sync_print tag of store errors
+    SCHEMA = None   # CREATE TABLE IF NOT EXISTS ...
+    UPSERT = None   # INSERT ... ON CONFLICT ... DO UPDATE
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.db = None
+
+    def connect(self, path):
+        self.db = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self.db.executescript("PRAGMA journal_mode = WAL;\n" + self.SCHEMA)
+
+    def combine(self, old, new):
+        return [a + b for a, b in zip(old, new)]
+
+    def merged(self, cells):
+        return None
+
+    def flushed(self, result):
+        pass
+
+    def merge(self, cells):
+        """Upsert deltas {key: [values]}. Returns merged(cells), read in the same transaction."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany(self.UPSERT, [(*key, *cell) for key, cell in cells.items()])
+            result = self.merged(cells)
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        return result
+
+    def flush(self):
+        """Persist the pending deltas, then flushed(). Returns the number of keys written."""
+        with self.flush_lock:
+            with self.lock:
+                cells, self.pending = self.pending, {}
+            if self.db is None:
+                return 0
+            result = None
+            if cells:
+                try:
+                    result = self.merge(cells)
+                except sqlite3.Error as e:
+                    with self.lock:  # keep the deltas for the next flush
+                        for key, cell in self.pending.items():
+                            old = cells.get(key)
+                            cells[key] = cell if old is None else self.combine(old, cell)
+                        self.pending = cells
+                    sync_print(f"[!] [{self.TAG}] Store error: {e}")
+                    return 0
+            self.flushed(result)
+            return len(cells)
+
+    def run(self, every):
+        while not stop_event.wait(every):
+            self.flush()
+
+    def start(self, every):
+        self.open()
+        threading.Thread(target=self.run, args=(every,), daemon=True).start()
+
+class RailCube(DeltaStore):
+    """
+    Position-binned rail damage per crane x day x RAIL_BIN_M bin x loaded/empty, fed by
+    LiveSink with each event's 'rail_bins'. add() only merges into in-memory deltas; flush()
+    upserts them into RAIL_CUBE_DB (restarts and a hot-restart successor keep adding to the
+    same day) and writes the resulting day totals of the touched cells as rail_cube points.
+    Points are tagged with NODE_ID: with LEASE_DB a crane's day may be split over nodes,
+    each writing its own share, and dashboards sum over nodes.
+    """
+    TAG = "RAIL"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cells (crane_id TEXT, day TEXT, bin INTEGER, loaded INTEGER,
+            damage REAL, shock_sum REAL, shock_max REAL, samples INTEGER,
+            PRIMARY KEY (crane_id, day, bin, loaded)) WITHOUT ROWID;
+    """
+    UPSERT = """
+        INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (crane_id, day, bin, loaded) DO UPDATE SET
+            damage = damage + excluded.damage, shock_sum = shock_sum + excluded.shock_sum,
+            shock_max = max(shock_max, excluded.shock_max), samples = samples + excluded.samples
+    """
+    # pending: (crane_id, day, bin, loaded) -> [damage, shock_sum, shock_max, samples]
+
+    def open(self, path=None):
+        self.connect(path or RAIL_CUBE_DB)
+
+    def combine(self, old, new):
+        return [old[0] + new[0], old[1] + new[1], max(old[2], new[2]), old[3] + new[3]]
+
+    def add(self, crane_id, kpis, ts):
+        bins = kpis.get('rail_bins')
+        if not bins:
+            return
+        day, loaded = ts.date().isoformat(), 1 if kpis['is_loaded'] else 0
+        with self.lock:
+            for rail_bin, (damage, shock_sum, shock_max, samples) in bins.items():
+                cell = self.pending.get((crane_id, day, rail_bin, loaded))
+                if cell is None:
+                    self.pending[(crane_id, day, rail_bin, loaded)] = [damage, shock_sum, shock_max, samples]
+                else:
+                    cell[0] += damage
+                    cell[1] += shock_sum
+                    cell[2] = max(cell[2], shock_max)
+                    cell[3] += samples
+
+    def merged(self, cells):
+        """Day totals {key: (damage, shock_sum, shock_max, samples)} of the upserted cells."""
+        return {key: self.db.execute("SELECT damage, shock_sum, shock_max, samples FROM cells "
+                                     "WHERE crane_id = ? AND day = ? AND bin = ? AND loaded = ?", key).fetchone()
+                for key in cells}
+
+    def points(self, totals):
+        midnight = {}
+        points = []
+        for (crane_id, day, rail_bin, loaded), (damage, shock_sum, shock_max, samples) in totals.items():
+            if day not in midnight:
+                midnight[day] = datetime.fromisoformat(day).astimezone()
+            points.append(
+                Point("rail_cube")
+                .tag("crane_id", crane_id)
+                .tag("node", NODE_ID)
+                .tag("bin", str(rail_bin))
+                .tag("is_loaded", "Loaded" if loaded else "Empty")
+                .field("pos_m", float(rail_bin))
+                .field("damage", float(damage))
+                .field("shock_sum", float(shock_sum))
+                .field("shock_max", float(shock_max))
+                .field("samples", int(samples))
+                .time(midnight[day])
+            )
+        return points
+
+    def flushed(self, totals):
+        if not totals:
+            return
+        try:
+            write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=self.points(totals))
+        except Exception as e:  # totals are in RAIL_CUBE_DB: the next write of these cells repairs it
+            sync_print(f"[!] [RAIL] InfluxDB Error: {e}")
+
+RAIL_CUBE = RailCube()
+
+class RainflowStore(DeltaStore):
+    """
+    Per crane x day rainflow histograms of reel torque (range bin x mean bin -> cycles), fed by
+    LiveSink with each event's 'rainflow'. Like RailCube, add() merges into in-memory deltas
+    and flush() upserts them into RAINFLOW_DB, so restarts keep adding to the same day.
+    """
+    TAG = "RAINFLOW"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hist (crane_id TEXT, day TEXT, range_bin INTEGER, mean_bin INTEGER,
+            cycles REAL, PRIMARY KEY (crane_id, day, range_bin, mean_bin)) WITHOUT ROWID;
+    """
+    UPSERT = """
+        INSERT INTO hist VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (crane_id, day, range_bin, mean_bin) DO UPDATE SET cycles = cycles + excluded.cycles
+    """
+    # pending: (crane_id, day, range_bin, mean_bin) -> [cycles]
+
+    def open(self, path=None):
+        self.connect(path or RAINFLOW_DB)
+
+    def add(self, crane_id, kpis, ts):
+        hist = kpis.get('rainflow')
+        if not hist:
+            return
+        day = ts.date().isoformat()
+        with self.lock:
+            for (range_bin, mean_bin), cycles in hist.items():
+                self.pending.setdefault((crane_id, day, range_bin, mean_bin), [0.0])[0] += cycles
+
+RAINFLOW = RainflowStore()
+
+def rail_block(crane_id):
+    """Rail block of an ARMGC crane (id 2<block><n>, see CRANES); a block's cranes share its rails."""
+    return crane_id[1]
+
+class RailAnomalyDetector:
+    """
+    Cross-crane rail anomaly detection over RAIL_CUBE_DB. Per block and day, each crane's
+    mean shock per sample in every bin over the trailing RAIL_ANOMALY_WINDOW_D days is divided
+    by that crane's median over all its bins (a harsh reel or driver does not stand out
+    everywhere). A bin is flagged when RAIL_ANOMALY_CRANES cranes, and RAIL_ANOMALY_SHARE of
+    those with data there, reach RAIL_ANOMALY_RATIO. Flags drive a per-bin site record in
+    `rail_sites`: active from the first flag, recovered after RAIL_RECOVER_D normal days with
+    data (a repair shows up here), reopened if flagged again.
+    The statistics are numpy over (crane, day, bin) arrays from one SQL read. run() advances
+    from the last processed day (daily, in the logger); scan() replays the whole history.
+    """
+    SITE_COLUMNS = ('status', 'first_day', 'last_day', 'recovered_day', 'flagged_days', 'clear_days',
+                    'peak_ratio', 'cranes')
+
+    def __init__(self):
+        self.db = None
+        self.sites = {}   # (block, bin) -> dict of SITE_COLUMNS
+        self.day = None   # last processed day (ISO)
+
+    def open(self, path=None):
+        # Own connection: RailCube's flush thread runs its transactions on the other one
+        self.db = sqlite3.connect(path or RAIL_CUBE_DB, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS rail_sites (block TEXT, bin INTEGER, status TEXT, first_day TEXT,
+                last_day TEXT, recovered_day TEXT, flagged_days INTEGER, clear_days INTEGER, peak_ratio REAL,
+                cranes INTEGER, PRIMARY KEY (block, bin)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rail_meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.sites = {(r[0], r[1]): dict(zip(self.SITE_COLUMNS, r[2:]))
+                      for r in self.db.execute("SELECT * FROM rail_sites")}
+        row = self.db.execute("SELECT value FROM rail_meta WHERE key = 'anomaly_day'").fetchone()
+        self.day = row[0] if row else None
+
+    def load(self, start, stop):
+        """
+        Cube cells with start <= day <= stop as numpy columns: (crane names, crane index, first day,
+        day index, bin, shock sum, samples). Loaded / empty rows of a cell are summed by flags().
+        """
+        rows = self.db.execute("SELECT crane_id, day, bin, shock_sum, samples FROM cells WHERE day >= ? AND day <= ?",
+                               (start, stop)).fetchall()
+        if not rows:
+            return None
+        crane, day, rail_bin, shock, samples = zip(*rows)
+        n = len(rows)
+        names, days = sorted(set(crane)), sorted(set(day))  # few distinct values: code them via dicts
+        crane_code = {c: i for i, c in enumerate(names)}
+        offsets = np.array(days, dtype='datetime64[D]')
+        day_code = dict(zip(days, (offsets - offsets[0]).astype(np.int64).tolist()))
+        return (np.array(names), np.fromiter(map(crane_code.__getitem__, crane), np.int64, n), offsets[0],
+                np.fromiter(map(day_code.__getitem__, day), np.int64, n), np.fromiter(rail_bin, np.int64, n),
+                np.fromiter(shock, np.float64, n), np.fromiter(samples, np.float64, n))
+
+    @staticmethod
+    def flags(names, ci, d0, di, rail_bin, shock, samples):
+        """
+        Per block: (bins, flagged[day, bin], normal[day, bin], ratio[day, bin], cranes[day, bin]),
+        days counted from d0. `ratio` is the mean over the elevated cranes.
+        """
+        w = RAIL_ANOMALY_WINDOW_D
+        n_days = int(di.max()) + 1
+        block_of = np.array([rail_block(c) for c in names])
+        out = {}
+        for block in np.unique(block_of):
+            members = np.nonzero(block_of == block)[0]
+            m = np.isin(ci, members)
+            bins, bi = np.unique(rail_bin[m], return_inverse=True)
+            n_c, n_b = len(members), len(bins)
+            lin = (np.searchsorted(members, ci[m]) * n_days + di[m]) * n_b + bi
+            size = n_c * n_days * n_b
+            s = np.cumsum(np.bincount(lin, weights=shock[m], minlength=size).reshape(n_c, n_days, n_b), axis=1)
+            n = np.cumsum(np.bincount(lin, weights=samples[m], minlength=size).reshape(n_c, n_days, n_b), axis=1)
+            s[:, w:] -= s[:, :-w].copy()  # trailing window sums
+            n[:, w:] -= n[:, :-w].copy()
+            valid = n >= RAIL_ANOMALY_MIN_SAMPLES
+            mean = np.where(valid, s / np.maximum(n, 1.0), np.nan)
+            # Median over each crane-day's valid bins (NaNs sort last)
+            count = valid.sum(axis=2, keepdims=True)
+            ranked = np.sort(mean, axis=2)
+            lo = np.take_along_axis(ranked, np.maximum(count - 1, 0) // 2, axis=2)
+            hi = np.take_along_axis(ranked, count // 2, axis=2)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ratio = mean / ((lo + hi) / 2.0)
+            elevated = valid & (ratio >= RAIL_ANOMALY_RATIO)
+            k, v = elevated.sum(axis=0), valid.sum(axis=0)
+            floor = min(RAIL_ANOMALY_CRANES, n_c)
+            flagged = (k >= floor) & (k >= np.ceil(RAIL_ANOMALY_SHARE * v))
+            normal = ~flagged & (v >= floor)
+            level = np.where(elevated, ratio, 0.0).sum(axis=0) / np.maximum(k, 1)
+            out[str(block)] = (bins, flagged, normal, level, k)
+        return d0, n_days, out
+
+    def advance(self, d0, n_days, blocks, first):
+        """Apply days first..n_days-1 to self.sites. Returns (changed site keys, points, messages)."""
+        changed, points, messages = set(), [], []
+        for d in range(first, n_days):
+            day = str(d0 + d)
+            midnight = datetime.fromisoformat(day).astimezone()
+            for block, (bins, flagged, normal, level, k) in blocks.items():
+                for j in np.nonzero(flagged[d])[0]:
+                    key, ratio = (block, int(bins[j])), float(level[d, j])
+                    site = self.sites.get(key)
+                    if site is None:
+                        site = self.sites[key] = {'status': 'active', 'first_day': day, 'recovered_day': None,
+                                                  'flagged_days': 0, 'peak_ratio': 0.0, 'cranes': 0}
+                        messages.append(f"Block {block} {key[1]}-{key[1] + RAIL_BIN_M} m: new anomaly "
+                                        f"({int(k[d, j])} cranes, x{ratio:.2f}) on {day}")
+                    elif site['status'] == 'recovered':
+                        site['status'] = 'active'
+                        messages.append(f"Block {block} {key[1]}-{key[1] + RAIL_BIN_M} m: reopened on {day} "
+                                        f"(recovered {site['recovered_day']})")
+                    site.update(last_day=day, clear_days=0, flagged_days=site['flagged_days'] + 1,
+                                peak_ratio=max(site['peak_ratio'], ratio), cranes=max(site['cranes'], int(k[d, j])))
+                    changed.add(key)
+                    points.append(
+                        Point("rail_anomaly")
+                        .tag("block", block)
+                        .tag("bin", str(key[1]))
+                        .field("pos_m", float(key[1]))
+                        .field("ratio", ratio)
+                        .field("cranes", int(k[d, j]))
+                        .time(midnight)
+                    )
+                for key, site in self.sites.items():
+                    if key[0] != block or site['status'] != 'active' or site['last_day'] == day:
+                        continue
+                    j = np.searchsorted(bins, key[1])
+                    if j < len(bins) and bins[j] == key[1] and normal[d, j]:
+                        site['clear_days'] += 1
+                        changed.add(key)
+                        if site['clear_days'] >= RAIL_RECOVER_D:
+                            site.update(status='recovered', recovered_day=day)
+                            messages.append(f"Block {block} {key[1]}-{key[1] + RAIL_BIN_M} m: recovered on {day} "
+                                            f"(last flagged {site['last_day']})")
+        return changed, points, messages
+
+    def run(self, through=None, write=True):
+        """Process the completed days after self.day up to `through` (ISO). Returns the messages."""
+        if through is None:  # yesterday, once its last events are flushed into the cube
+            through = (datetime.now() - timedelta(days=1, seconds=2 * RAIL_FLUSH_S)).date().isoformat()
+        if self.day is not None and self.day >= through:
+            return []
+        start = '' if self.day is None else (datetime.fromisoformat(self.day)
+                                             - timedelta(days=RAIL_ANOMALY_WINDOW_D - 1)).date().isoformat()
+        cols = self.load(start, through)
+        changed, points, messages = set(), [], []
+        if cols is not None:
+            d0, n_days, blocks = self.flags(*cols)
+            first = 0 if self.day is None else max(0, int((np.datetime64(self.day) + 1 - d0).astype(np.int64)))
+            changed, points, messages = self.advance(d0, n_days, blocks, first)
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany("INSERT OR REPLACE INTO rail_sites VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(*key, *(self.sites[key][c] for c in self.SITE_COLUMNS)) for key in changed])
+            self.db.execute("INSERT OR REPLACE INTO rail_meta VALUES ('anomaly_day', ?)", (through,))
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        self.day = through
+        if write and points:
+            try:
+                write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=points)
+            except Exception as e:
+                sync_print(f"[!] [RAIL] Anomaly InfluxDB Error: {e}")
+        return messages
+
+    def scan(self, through=None, write=True):
+        """Forget every site and replay the whole cube (after a backfill or a threshold change)."""
+        self.db.execute("DELETE FROM rail_sites")
+        self.db.execute("DELETE FROM rail_meta WHERE key = 'anomaly_day'")
+        self.sites, self.day = {}, None
+        return self.run(through, write)
+
+    def serve(self):
+        while True:
+            try:
+                for message in self.run():
+                    sync_print(f"[RAIL] {message}")
+            except sqlite3.Error as e:
+                sync_print(f"[!] [RAIL] Anomaly detection error: {e}")
+            if stop_event.wait(3600):
+                return
+
+    def start(self):
+        self.open()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+RAIL_ANOMALY = RailAnomalyDetector()
+
+class AnomalyScorer:
+    """
+    Per-crane streaming baselines for the event anomaly score (see ANOMALY_METRICS).
+    state[crane_id][load][metric] = [events, EWMA mean, EWMA variance]; the weight is
+    max(2 / (ANOMALY_SPAN + 1), 1 / events), so a young baseline is a plain mean.
+    LiveSink scores every event before it is logged; save() writes the state atomically.
+    """
+    def __init__(self):
+        self.state = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def score(self, crane_id, kpis):
+        """{metric: z} of this event against the crane's baseline (then updated); {} while warming up."""
+        alpha = 2.0 / (ANOMALY_SPAN + 1)
+        z = {}
+        with self.lock:
+            baseline = self.state.setdefault(crane_id, {}).setdefault("Loaded" if kpis['is_loaded'] else "Empty", {})
+            for metric in ANOMALY_METRICS:
+                x = float(kpis[metric])
+                if metric in ANOMALY_LOG_METRICS:
+                    x = math.log1p(max(x, 0.0))
+                st = baseline.get(metric)
+                if st is None:
+                    baseline[metric] = [1, x, 0.0]
+                    continue
+                n, mean, var = st
+                if n >= ANOMALY_WARMUP and var > 0.0:
+                    sd = math.sqrt(var)
+                    z[metric] = (x - mean) / sd
+                    x = min(max(x, mean - ANOMALY_CLIP * sd), mean + ANOMALY_CLIP * sd)
+                a = max(alpha, 1.0 / (n + 1))
+                diff = x - mean
+                st[:] = [n + 1, mean + a * diff, (1.0 - a) * (var + a * diff * diff)]
+            self.dirty = True
+        return z
+
+    def load(self):
+        try:
+            with open(ANOMALY_STATE_FILE) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            sync_print(f"[!] [ANOMALY] Baseline file unreadable, starting fresh: {e}")
+            return
+        with self.lock:
+            self.state = state
+        sync_print(f"[ANOMALY] Restored baselines of {len(state)} cranes from {ANOMALY_STATE_FILE}")
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            body = json.dumps(self.state)
+            self.dirty = False
+        tmp = ANOMALY_STATE_FILE + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(body)
+            os.replace(tmp, ANOMALY_STATE_FILE)
+        except OSError as e:
+            self.dirty = True
+            sync_print(f"[!] [ANOMALY] Baseline save error: {e}")
+
+    def run(self):
+        while not stop_event.wait(ANOMALY_SAVE_S):
+            self.save()
+
+    def start(self):
+        self.load()
+        threading.Thread(target=self.run, daemon=True).start()
+
+SCORER = AnomalyScorer()
+
+def shift_start(ts):
+    """Start of the SHIFT_STARTS shift `ts` falls in (a night shift began on the previous day)."""
+    hours = [h for h in SHIFT_STARTS if h <= ts.hour]
+    day = ts.replace(minute=0, second=0, microsecond=0)
+    if hours:
+        return day.replace(hour=hours[-1])
+    return (day - timedelta(days=1)).replace(hour=SHIFT_STARTS[-1])
+
+class FileAlertSink:
+    """One JSON line per notification: a local inbox other tools can tail."""
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+class WebhookAlertSink:
+    """POSTs each notification as JSON (a paging / chat gateway, or scripts/analysis/alert_webhook_standin.py)."""
+    def __init__(self, url):
+        self.url = urllib.parse.urlsplit(url)
+        self.conn = None
+
+    def send(self, alert):
+        try:
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+                self.conn = cls(self.url.netloc, timeout=ALERT_WEBHOOK_TIMEOUT_S)
+            self.conn.request('POST', self.url.path or '/', json.dumps(alert).encode(),
+                              {'Content-Type': 'application/json'})
+            resp = self.conn.getresponse()
+            reply = resp.read()
+            if resp.status >= 300:
+                raise RuntimeError(f"HTTP {resp.status} {reply[:200]!r}")
+        except Exception:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            raise
+
+def make_alert_sink(spec):
+    """ALERT_SINKS entry -> sink. Anything with a send(alert) method is used as is."""
+    if hasattr(spec, 'send'):
+        return spec
+    if spec['type'] == 'file':
+        return FileAlertSink(spec['path'])
+    if spec['type'] == 'webhook':
+        return WebhookAlertSink(spec['url'])
+    raise ValueError(f"unknown alert sink type {spec['type']!r}")
+
+def check_alert_rule(rule):
+    """Raise ValueError for an ALERT_RULES entry evaluate() could not run on every event."""
+    name = rule.get('name')
+    if rule.get('on') not in ('event', 'fault') or name is None:
+        raise ValueError(f"alert rule {name!r}: needs a 'name' and 'on': 'event' or 'fault'")
+    if rule['on'] == 'event' and 'metric' not in rule:
+        raise ValueError(f"alert rule {name!r}: event rules need a 'metric'")
+    if rule['on'] == 'fault' and 'fault' not in rule:
+        raise ValueError(f"alert rule {name!r}: fault rules need a 'fault' (\"*\" = any)")
+    windowed = 'sum_above' in rule or (rule.get('count', 1) > 1 and rule.get('window') != 'shift')
+    if windowed and not rule.get('window_s', 0) > 0:
+        raise ValueError(f"alert rule {name!r}: 'sum_above' and 'count' > 1 need a 'window_s' > 0")
+
+class AlertEngine:
+    """
+    ALERT_RULES evaluated per event / fault edge (see there). Per (rule, crane) state is O(1)
+    for count rules: the last `count` match times (deque maxlen=count) or the shift and its
+    count; sum rules keep the window's values. Firing goes through the repeat and rate
+    limits into a bounded queue; deliver() drains it to the sinks on its own thread.
+    """
+    def __init__(self, rules=None, sinks=None):
+        self.rules = ALERT_RULES if rules is None else rules
+        for rule in self.rules:
+            check_alert_rule(rule)
+        self.sinks = [make_alert_sink(spec) for spec in (ALERT_SINKS if sinks is None else sinks)]
+        self.state = {}     # (rule, crane_id) -> deque of match times / [shift start, count] / [deque, sum]
+        self.notified = {}  # (rule, crane_id) -> [last notification t, suppressed since]
+        self.tokens, self.token_t = float(ALERT_RATE_PER_MIN), 0.0  # budget on event time (= wall clock live)
+        self.lock = threading.Lock()
+        self.queue = deque(maxlen=ALERT_QUEUE)
+        self.cond = threading.Condition()
+        self.send_lock = threading.Lock()  # delivery thread vs. the final drain at shutdown
+        self.failing = set()
+        self.stats = dict(evaluations=0, eval_s=0.0, eval_max_s=0.0, fired=0, suppressed=0, rate_limited=0,
+                          dropped=0, sent=0, failed=0)
+
+    def event(self, crane_id, kpis, ts):
+        self.evaluate('event', crane_id, ts, kpis=kpis)
+
+    def fault(self, crane_id, fault_name, ts):
+        self.evaluate('fault', crane_id, ts, fault=fault_name)
+
+    def evaluate(self, on, crane_id, ts, kpis=None, fault=None):
+        t0 = time.perf_counter()
+        t = ts.timestamp()
+        crane_type = "QC" if crane_id.startswith("1") else "ARMGC"
+        with self.lock:
+            for rule in self.rules:
+                if rule['on'] != on or rule.get('type', crane_type) != crane_type:
+                    continue
+                key = (rule['name'], crane_id)
+                if on == 'fault':
+                    detail = self.count(rule, key, ts, t, fault) if rule['fault'] in ('*', fault) else None
+                elif kpis.get(rule['metric']) is not None:
+                    detail = self.match(rule, key, ts, t, float(kpis[rule['metric']]))
+                else:
+                    detail = None
+                if detail:
+                    self.notify(rule, crane_id, ts, t, detail)
+            dt = time.perf_counter() - t0
+            self.stats['evaluations'] += 1
+            self.stats['eval_s'] += dt
+            self.stats['eval_max_s'] = max(self.stats['eval_max_s'], dt)
+
+    def match(self, rule, key, ts, t, value):
+        metric = rule['metric']
+        if 'sum_above' in rule:
+            st = self.state.get(key)
+            if st is None:
+                st = self.state[key] = [deque(), 0.0]
+            st[0].append((t, value))
+            st[1] += value
+            while st[0] and st[0][0][0] <= t - rule['window_s']:
+                st[1] -= st[0].popleft()[1]
+            if st[1] < rule['sum_above']:
+                return None
+            return f"{metric} sum {st[1]:.1f} >= {rule['sum_above']} within {rule['window_s'] / 60:.0f} min"
+        if ('above' in rule and value < rule['above']) or ('below' in rule and value > rule['below']):
+            return None
+        return self.count(rule, key, ts, t, f"{metric} {value:.2f}")
+
+    def count(self, rule, key, ts, t, what):
+        n = rule.get('count', 1)
+        if rule.get('window') == 'shift':
+            shift = shift_start(ts)
+            st = self.state.get(key)
+            if st is None or st[0] != shift:
+                st = self.state[key] = [shift, 0]
+            st[1] += 1
+            return f"{what}: {st[1]}x this shift (since {shift:%H:%M})" if st[1] >= n else None
+        times = self.state.get(key)
+        if times is None:
+            times = self.state[key] = deque(maxlen=n)
+        times.append(t)
+        if len(times) < n or t - times[0] > rule.get('window_s', 0):
+            return None
+        return f"{what}: {n}x within {(t - times[0]) / 60:.0f} min" if n > 1 else what
+
+    def notify(self, rule, crane_id, ts, t, detail):
+        key = (rule['name'], crane_id)
+        last = self.notified.get(key)
+        if last is not None and t - last[0] < ALERT_REPEAT_S:
+            last[1] += 1
+            self.stats['suppressed'] += 1
+            return
+        refill = max(0.0, t - self.token_t) * ALERT_RATE_PER_MIN / 60.0
+        self.tokens = min(float(ALERT_RATE_PER_MIN), self.tokens + refill)
+        self.token_t = max(self.token_t, t)
+        if self.tokens < 1.0:
+            self.stats['rate_limited'] += 1  # not marked notified: the next match tries again
+            return
+        self.tokens -= 1.0
+        self.notified[key] = [t, 0]
+        self.stats['fired'] += 1
+        alert = {'time': ts.isoformat(timespec='seconds'), 'rule': rule['name'],
+                 'severity': rule.get('severity', 'warning'), 'crane_id': crane_id, 'detail': detail,
+                 'suppressed': last[1] if last else 0, 'node': NODE_ID}
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.stats['dropped'] += 1
+            self.queue.append(alert)
+            self.cond.notify()
+
+    def drain(self):
+        with self.send_lock:
+            with self.cond:
+                alerts = list(self.queue)
+                self.queue.clear()
+            self.send(alerts)
+
+    def send(self, alerts):
+        for alert in alerts:
+            sync_print(f"[ALERT] [{alert['crane_id']}] {alert['severity'].upper()} {alert['rule']}: {alert['detail']}"
+                       + (f" (+{alert['suppressed']} repeats)" if alert['suppressed'] else ""))
+            for sink in self.sinks:
+                name = type(sink).__name__
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    if name not in self.failing:
+                        sync_print(f"[!] [ALERT] {name} delivery failed: {e}")
+                        self.failing.add(name)
+                    continue
+                self.stats['sent'] += 1
+                if name in self.failing:
+                    sync_print(f"[ALERT] {name} delivery recovered.")
+                    self.failing.discard(name)
+
+    def deliver(self):
+        while not stop_event.is_set():
+            with self.cond:
+                if not self.queue:
+                    self.cond.wait(1.0)
+            self.drain()
+
+    def report(self):
+        while not stop_event.wait(ALERT_REPORT_S):
+            with self.lock:
+                st = dict(self.stats)
+            mean_us = st['eval_s'] / st['evaluations'] * 1e6 if st['evaluations'] else 0.0
+            sync_print(f"[ALERT] {len(self.rules)} rules | {st['evaluations']} evaluations, mean {mean_us:.1f}us, "
+                       f"max {st['eval_max_s'] * 1e6:.0f}us | fired {st['fired']}, repeats {st['suppressed']}, "
+                       f"rate-limited {st['rate_limited']}, dropped {st['dropped']} | "
+                       f"sent {st['sent']}, failed {st['failed']}")
+            try:
+                point = (
+                    Point("alert_engine")
+                    .tag("node", NODE_ID)
+                    .field("evaluations", st['evaluations'])
+                    .field("eval_mean_us", mean_us)
+                    .field("eval_max_us", st['eval_max_s'] * 1e6)
+                    .field("fired", st['fired'])
+                    .field("suppressed", st['suppressed'])
+                    .field("rate_limited", st['rate_limited'])
+                    .field("failed", st['failed'])
+                )
+                write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=point)
+            except Exception as e:
+                sync_print(f"[!] Alert stats InfluxDB Error: {e}")
+
+    def start(self):
+        threading.Thread(target=self.deliver, daemon=True).start()
+        threading.Thread(target=self.report, daemon=True).start()
+
+ALERTS = AlertEngine()
+
+def component_of(crane_id):
+    """Reducer the damage formula of this crane type wears (the `component` tag of crane_movement)."""
+    return "SpreaderCable" if crane_id.startswith("1") else "CableReel"
+
+class DamageLedger(DeltaStore):
+    """
+    Per-part cumulative damage (see LEDGER_DB). `parts` lists each component's installs
+    (part number, install time; part 1 = since the ledger began); event() books the damage
+    on the part installed at the event time, into in-memory totals and pending daily deltas.
+    flush() upserts the deltas and reloads totals and the LEDGER_RATE_D daily history from the
+    database, so resets and rebuilds made by damage_ledger.py are picked up within a flush.
+    projection() is numpy over all components; its JSON is cached until the next change.
+    """
+    TAG = "LEDGER"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS parts (crane_id TEXT, component TEXT, part INTEGER, installed TEXT,
+            reason TEXT, note TEXT, PRIMARY KEY (crane_id, component, part)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS daily (crane_id TEXT, component TEXT, part INTEGER, day TEXT,
+            damage REAL, events INTEGER, PRIMARY KEY (crane_id, component, part, day)) WITHOUT ROWID;
+    """
+    UPSERT = """
+        INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (crane_id, component, part, day) DO UPDATE SET
+            damage = damage + excluded.damage, events = events + excluded.events
+    """
+    # pending: (crane_id, component, part, day) -> [damage, events]
+
+    def __init__(self):
+        super().__init__()
+        self.parts = {}     # (crane_id, component) -> [(part, installed ISO or None), ...] by part
+        self.totals = {}    # (crane_id, component) -> {'part', 'installed', 'damage', 'events', 'last_day'}
+        self.history = ([], np.zeros((0, LEDGER_RATE_D)))  # component keys, daily damage of the last days
+        self.body = None
+
+    def open(self, path=None):
+        self.connect(path or LEDGER_DB)
+        self.reload()
+
+    def part_at(self, key, stamp):
+        """(part, installed) of component `key` at ISO time `stamp`."""
+        current = (1, None)
+        for part, installed in self.parts.get(key, ()):
+            if installed is None or installed <= stamp:
+                current = (part, installed)
+        return current
+
+    def event(self, crane_id, kpis, ts):
+        key = (crane_id, component_of(crane_id))
+        damage = float(kpis['reducer_damage'])
+        day = ts.date().isoformat()
+        with self.lock:
+            part, installed = self.part_at(key, ts.isoformat(sep=' ', timespec='seconds'))
+            cell = self.pending.setdefault((*key, part, day), [0.0, 0])
+            cell[0] += damage
+            cell[1] += 1
+            total = self.totals.get(key)
+            if total is None or total['part'] < part:
+                total = self.totals[key] = {'part': part, 'installed': installed, 'damage': 0.0, 'events': 0,
+                                            'last_day': None}
+            if total['part'] == part:
+                total['damage'] += damage
+                total['events'] += 1
+                total['last_day'] = max(total['last_day'] or day, day)
+            self.body = None
+
+    def reload(self):
+        """Totals of each component's current part and the rate history, from the database + pending deltas."""
+        parts = {}
+        for crane_id, component, part, installed in self.db.execute(
+                "SELECT crane_id, component, part, installed FROM parts ORDER BY part"):
+            parts.setdefault((crane_id, component), []).append((part, installed))
+        sums = {}
+        for crane_id, component, part, damage, events, last_day in self.db.execute(
+                "SELECT crane_id, component, part, sum(damage), sum(events), max(day) FROM daily "
+                "GROUP BY crane_id, component, part"):
+            sums[(crane_id, component, part)] = (damage, events, last_day)
+        today = datetime.now().date()
+        first = (today - timedelta(days=LEDGER_RATE_D)).isoformat()
+        rows = self.db.execute("SELECT crane_id, component, day, sum(damage) FROM daily WHERE day >= ? AND day < ? "
+                               "GROUP BY crane_id, component, day", (first, today.isoformat())).fetchall()
+        keys = sorted({(r[0], r[1]) for r in rows})
+        index = {k: i for i, k in enumerate(keys)}
+        daily = np.zeros((len(keys), LEDGER_RATE_D))
+        for crane_id, component, day, damage in rows:
+            daily[index[(crane_id, component)], (today - datetime.fromisoformat(day).date()).days - 1] = damage
+        with self.lock:
+            self.parts = parts
+            totals = {}
+            for key in set(parts) | {(c, comp) for c, comp, _ in sums} | {k[:2] for k in self.pending}:
+                part, installed = parts[key][-1] if key in parts else (1, None)
+                damage, events, last_day = sums.get((*key, part), (0.0, 0, None))
+                totals[key] = {'part': part, 'installed': installed, 'damage': damage, 'events': events,
+                               'last_day': last_day}
+            for (crane_id, component, part, day), (damage, events) in self.pending.items():
+                total = totals[(crane_id, component)]
+                if total['part'] == part:
+                    total['damage'] += damage
+                    total['events'] += events
+                    total['last_day'] = max(total['last_day'] or day, day)
+            self.totals = totals
+            self.history = (keys, daily[:, ::-1])  # oldest day first
+            self.body = None
+
+    def flushed(self, result):
+        try:  # the deltas are committed: a failed reload keeps the in-memory totals until the next flush
+            self.reload()
+        except sqlite3.Error as e:
+            sync_print(f"[!] [LEDGER] Reload error: {e}")
+
+    def projection(self):
+        """Rows per component: consumed life, daily rates and the projected end of life, soonest first."""
+        with self.lock:
+            keys = sorted(self.totals)
+            totals = [dict(self.totals[k]) for k in keys]
+            hist_keys, hist = self.history
+        n = len(keys)
+        daily = np.zeros((n, LEDGER_RATE_D))
+        index = {k: i for i, k in enumerate(keys)}
+        for j, k in enumerate(hist_keys):
+            if k in index:
+                daily[index[k]] = hist[j]
+        damage = np.array([t['damage'] for t in totals])
+        life = np.array([LEDGER_LIFE.get(k[1], np.nan) for k in keys])
+        # Average from the first day with data (a crane new to the ledger is not diluted by empty days)
+        active = daily > 0
+        span = np.where(active.any(axis=1), LEDGER_RATE_D - active.argmax(axis=1), 1)
+        rate = daily.sum(axis=1) / span
+        rate_7d = daily[:, -7:].sum(axis=1) / np.minimum(span, 7)
+        rate_p90 = np.percentile(daily, 90, axis=1) if n else rate
+        remaining = np.maximum(life - damage, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.where(rate > 0, remaining / rate, np.inf)
+            days_left_p90 = np.where(rate_p90 > 0, remaining / np.maximum(rate, rate_p90), np.inf)
+        today = datetime.now().date()
+        rows = []
+        for i in np.argsort(days_left, kind='stable'):
+            (crane_id, component), t = keys[i], totals[i]
+            finite = np.isfinite(days_left[i])
+            rows.append({
+                'crane_id': crane_id, 'component': component, 'part': t['part'], 'installed': t['installed'],
+                'damage': round(float(damage[i]), 1), 'events': t['events'], 'last_day': t['last_day'],
+                'consumed': round(float(damage[i] / life[i]), 4) if np.isfinite(life[i]) else None,
+                'rate_per_day': round(float(rate[i]), 1), 'rate_7d': round(float(rate_7d[i]), 1),
+                'days_left': round(float(days_left[i]), 1) if finite else None,
+                'end_of_life': (today + timedelta(days=float(days_left[i]))).isoformat() if finite else None,
+                'days_left_p90': round(float(days_left_p90[i]), 1) if np.isfinite(days_left_p90[i]) else None,
+            })
+        return rows
+
+    def ledger_json(self):
+        body = self.body
+        if body is None:
+            body = self.body = json.dumps({'life': LEDGER_LIFE, 'rate_days': LEDGER_RATE_D,
+                                           'components': self.projection()}).encode()
+        return body
+
+    def crane_json(self, crane_id):
+        rows = [r for r in json.loads(self.ledger_json())['components'] if r['crane_id'] == crane_id]
+        if not rows:
+            return None
+        for row in rows:
+            key = (crane_id, row['component'])
+            with self.lock:
+                parts = list(self.parts.get(key, [(1, None)]))
+            row['parts'] = []
+            for part, installed in parts:
+                r = self.db.execute("SELECT sum(damage), sum(events) FROM daily WHERE crane_id = ? AND component = ? "
+                                    "AND part = ?", (*key, part)).fetchone()
+                row['parts'].append({'part': part, 'installed': installed, 'damage': round(r[0] or 0.0, 1),
+                                     'events': r[1] or 0})
+        return json.dumps({'crane_id': crane_id, 'components': rows}).encode()
+
+LEDGER = DamageLedger()
+
+FLUX_TIME = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?Z')
+FLUX_DURATION = re.compile(r'-?((?:\d+(?:ns|us|µs|ms|s|m|h|d|w))+)')
+FLUX_DURATION_S = {'ns': 1e-9, 'us': 1e-6, 'µs': 1e-6, 'ms': 1e-3, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+FLUX_RANGE = re.compile(r'\brange\(((?:[^()]|\(\))*)\)')
+FLUX_SIDE_EFFECTS = re.compile(r'\bto\(|\bhttp\.post\(|\bsql\.to\(|\bmqtt\.|\bslack\.|\bpagerduty\.')
+HOP_HEADERS = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'te', 'trailer', 'upgrade', 'host'}
+
+def flux_segments(query):
+    """(is_code, text) pieces of a Flux script: string / regex literals and comments are not code."""
+    pieces, i, code, n = [], 0, 0, len(query)
+    while i < n:
+        c = query[i]
+        if c == '"' or (c == '/' and re.search(r'[=!]~\s*$', query[code:i])):
+            j = i + 1
+            while j < n and query[j] != c:
+                j += 2 if query[j] == '\\' else 1
+        elif query.startswith('//', i):
+            j = query.find('\n', i)
+            j = n if j < 0 else j - 1
+        else:
+            i += 1
+            continue
+        pieces += [(True, query[code:i]), (False, query[i:j + 1])]
+        i = code = j + 1
+    pieces.append((True, query[code:]))
+    return [(is_code, text) for is_code, text in pieces if text]
+
+def flux_epoch(text):
+    y, mo, d, h, mi, s, frac = FLUX_TIME.fullmatch(text).groups()
+    whole = (datetime(int(y), int(mo), int(d), int(h), int(mi), int(s)) - datetime(1970, 1, 1)).total_seconds()
+    return whole + (int(frac[:9].ljust(9, '0')) / 1e9 if frac else 0.0)
+
+def flux_time(t):
+    whole = math.floor(t)
+    text = (datetime(1970, 1, 1) + timedelta(seconds=whole)).strftime('%Y-%m-%dT%H:%M:%S')
+    frac = round((t - whole) * 1e6)
+    return f"{text}.{frac:06d}Z" if frac else f"{text}Z"
+
+def flux_seconds(duration):
+    return sum(int(n) * FLUX_DURATION_S[unit] for n, unit in re.findall(r'(\d+)(ns|us|µs|ms|s|m|h|d|w)', duration))
+
+def align_step(span):
+    return next(step for limit, step in QUERY_ALIGN if limit is None or span <= limit * 1.05)  # "last 1h" + jitter
+
+def cache_ttl(age):
+    return next(ttl for limit, ttl in QUERY_CACHE_TTL if limit is None or age <= limit)
+
+def normalize_flux(query, now):
+    """
+    Cache form of a Flux query: (text, start, stop), or None if it must not be cached.
+    Whitespace and comments outside literals are collapsed, relative / now() range bounds
+    become absolute and the time literals that are not on a 10 s boundary (Grafana's
+    millisecond dashboard range) are snapped outwards to the QUERY_ALIGN step of the range,
+    so the result only ever covers more than was asked for. start / stop bound the times
+    the result depends on (None = unbounded), for invalidation.
+    """
+    pieces, code, bounded = [], '', [True, True]
+    def resolve(m):
+        args = dict(part.split(':', 1) for part in m.group(1).split(',') if ':' in part)
+        args = {key.strip(): value.strip() for key, value in args.items()}
+        args.setdefault('stop', 'now()')
+        for i, key in enumerate(('start', 'stop')):
+            value = args.get(key, '')
+            if value == 'now()':
+                args[key] = flux_time(now)
+            elif FLUX_DURATION.fullmatch(value):
+                args[key] = flux_time(now + (flux_seconds(value) if value[0] != '-' else -flux_seconds(value)))
+            elif not FLUX_TIME.fullmatch(value):
+                bounded[i] = False
+        return f"range({', '.join(f'{key}: {value}' for key, value in args.items())})"
+    for is_code, text in flux_segments(query) + [(False, '')]:
+        if is_code or text.startswith('//'):
+            code += text if is_code else '\n'
+            continue
+        code = FLUX_RANGE.sub(resolve, re.sub(r'\s+', ' ', code))  # Flux has no significant newlines
+        if 'now()' in code or FLUX_SIDE_EFFECTS.search(code) or re.search(r'\d(?:mo|y)\b', code):
+            return None  # clock-dependent beyond range(), calendar durations, or writes
+        pieces += [(True, code), (False, text)]
+        code = ''
+    epochs = {m.group(0): flux_epoch(m.group(0)) for is_code, text in pieces if is_code
+              for m in FLUX_TIME.finditer(text)}
+    loose = sorted((e, t) for t, e in epochs.items() if e % 10)
+    snap = {}
+    if len(loose) >= 2:
+        lo, hi = loose[0][0], loose[-1][0]
+        step = align_step(hi - lo)
+        snap = {loose[0][1]: math.floor(lo / step) * step, loose[-1][1]: math.ceil(hi / step) * step}
+    elif loose:
+        e, t = loose[0]
+        lower = [x for x in epochs.values() if x < e]
+        # A lone loose literal is a stop (snap up over the range) or a start (snap down by its age)
+        step = align_step(e - max(lower)) if lower else align_step(max(now - e, 60))
+        snap = {t: math.ceil(e / step) * step if lower else math.floor(e / step) * step}
+    for t, e in snap.items():
+        epochs[t] = e
+    text = ''.join(text if not is_code else FLUX_TIME.sub(lambda m: flux_time(snap[m.group(0)])
+                                                           if m.group(0) in snap else m.group(0), text)
+                   for is_code, text in pieces).strip()
+    start = min(epochs.values()) if epochs and bounded[0] else None
+    stop = max(epochs.values()) if epochs and bounded[1] else None
+    return text, start, stop
+
+def line_protocol_span(data, precision='ns'):
+    """(t_lo, t_hi) of the points in a line-protocol batch; points without a timestamp are 'now'."""
+    if isinstance(data, str):
+        data = data.encode()
+    scale = {'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1.0}.get(str(getattr(precision, 'value', precision)), 1e-9)
+    lo = hi = None
+    for line in data.splitlines():
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        last = line.rsplit(b' ', 1)[-1]
+        t = int(last) * scale if last.lstrip(b'-').isdigit() and b' ' in line.rstrip(last) else time.time()
+        lo, hi = (t, t) if lo is None else (min(lo, t), max(hi, t))
+    return (lo, hi) if lo is not None else (time.time(), time.time())
+
+class QueryCache:
+    """Caching proxy for InfluxDB /api/v2/query (see QUERY_CACHE_PORT)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mem = {}            # key -> entry (dict order = LRU, oldest first)
+        self.mem_bytes = 0
+        self.disk = {}           # key -> entry without body (QUERY_CACHE_DIR/<key>.bin)
+        self.disk_bytes = 0
+        self.inflight = {}       # key -> Event: one upstream query per key at a time
+        self.writes = deque()    # (at, bucket, t_lo, t_hi): invalidates results still in flight
+        self.local = threading.local()
+        self.counts = dict.fromkeys(('requests', 'hits_mem', 'hits_disk', 'misses', 'coalesced',
+                                     'bypass', 'invalidated', 'uncacheable'), 0)
+        self.saved_s = 0.0       # Upstream time the hits would have cost
+        self.upstream_s = 0.0    # Upstream time spent on misses
+        url = urllib.parse.urlsplit(INFLUX_URL)
+        self.upstream_addr = (url.hostname, url.port or (443 if url.scheme == 'https' else 80), url.scheme == 'https')
+
+    def key(self, org, auth, text, extra):
+        return hashlib.sha1(json.dumps([org, auth, text, extra], sort_keys=True).encode()).hexdigest()
+
+    def lookup(self, key, now):
+        with self.lock:
+            entry = self.mem.pop(key, None)
+            if entry is not None:
+                if entry['expires'] > now:
+                    self.mem[key] = entry  # most recently used
+                    self.counts['hits_mem'] += 1
+                    self.saved_s += entry['cost']
+                    return entry
+                self.mem_bytes -= len(entry['body'])
+            meta = self.disk.get(key)
+            if meta is None:
+                return None
+            if meta['expires'] <= now:
+                self.drop_disk(key)
+                return None
+        try:
+            with open(os.path.join(QUERY_CACHE_DIR, key + '.bin'), 'rb') as f:
+                f.readline()
+                entry = dict(meta, body=f.read())
+        except OSError:
+            return None
+        with self.lock:
+            if key not in self.disk:
+                return None  # invalidated while reading
+            self.counts['hits_disk'] += 1
+            self.saved_s += entry['cost']
+            self.keep_mem(key, entry)
+        return entry
+
+    def keep_mem(self, key, entry):
+        self.mem[key] = entry
+        self.mem_bytes += len(entry['body'])
+        while self.mem_bytes > QUERY_CACHE_MEM_MB * 1e6 and self.mem:
+            self.mem_bytes -= len(self.mem.pop(next(iter(self.mem)))['body'])
+
+    def store(self, key, entry, started):
+        with self.lock:
+            if any(at >= started and self.covers(entry, bucket, lo, hi) for at, bucket, lo, hi in self.writes):
+                return  # new points landed while the query ran: the result may miss them
+            old = self.mem.pop(key, None)
+            if old is not None:
+                self.mem_bytes -= len(old['body'])
+            self.keep_mem(key, entry)
+        if entry['expires'] - entry['created'] < QUERY_CACHE_DISK_TTL_S:
+            return
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        try:
+            os.makedirs(QUERY_CACHE_DIR, exist_ok=True)
+            tmp = os.path.join(QUERY_CACHE_DIR, key + '.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(json.dumps(meta).encode() + b'\n')
+                f.write(entry['body'])
+            os.replace(tmp, os.path.join(QUERY_CACHE_DIR, key + '.bin'))
+        except OSError as e:
+            sync_print(f"[!] [CACHE] Disk write failed: {e}")
+            return
+        with self.lock:
+            if key not in self.mem:
+                return  # invalidated meanwhile (the file is removed at next load)
+            if key in self.disk:
+                self.disk_bytes -= self.disk[key]['size']
+            self.disk[key] = dict(meta, size=len(entry['body']))
+            self.disk_bytes += len(entry['body'])
+            while self.disk_bytes > QUERY_CACHE_DISK_MB * 1e6 and self.disk:
+                self.drop_disk(min(self.disk, key=lambda k: self.disk[k]['created']))
+
+    def drop_disk(self, key):
+        self.disk_bytes -= self.disk.pop(key)['size']
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(QUERY_CACHE_DIR, key + '.bin'))
+
+    @staticmethod
+    def covers(entry, bucket, lo, hi):
+        return ((bucket in entry['buckets'] or '*' in entry['buckets'])
+                and (entry['start'] is None or hi >= entry['start'])
+                and (entry['stop'] is None or lo <= entry['stop']))
+
+    def written(self, bucket, lo, hi):
+        """Points in [lo, hi] reached `bucket`: drop results that may not contain them."""
+        now = time.time()
+        with self.lock:
+            self.writes.append((now, bucket, lo, hi))
+            while self.writes and self.writes[0][0] < now - 600:
+                self.writes.popleft()
+            for key, entry in list(self.mem.items()):
+                if now - entry['created'] >= QUERY_CACHE_MIN_FRESH_S and self.covers(entry, bucket, lo, hi):
+                    self.mem_bytes -= len(self.mem.pop(key)['body'])
+                    self.counts['invalidated'] += 1
+                    if key in self.disk:
+                        self.drop_disk(key)
+            for key, meta in list(self.disk.items()):
+                if now - meta['created'] >= QUERY_CACHE_MIN_FRESH_S and self.covers(meta, bucket, lo, hi):
+                    self.drop_disk(key)
+                    self.counts['invalidated'] += 1
+
+    def flush(self):
+        with self.lock:
+            n = len(self.mem.keys() | self.disk.keys())
+            self.mem.clear()
+            self.mem_bytes = 0
+            for key in list(self.disk):
+                self.drop_disk(key)
+        return n
+
+    def load(self):
+        """Rebuild the disk index (entries survive a restart until their TTL)."""
+        now = time.time()
+        for path in glob.glob(os.path.join(QUERY_CACHE_DIR, '*.*')):
+            key, ext = os.path.splitext(os.path.basename(path))
+            try:
+                with open(path, 'rb') as f:
+                    meta = json.loads(f.readline())
+                if ext != '.bin' or meta['expires'] <= now:
+                    raise ValueError
+            except (OSError, ValueError, KeyError):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                continue
+            meta['size'] = os.path.getsize(path)
+            with self.lock:
+                self.disk[key] = meta
+                self.disk_bytes += meta['size']
+
+    def upstream(self, method, path, headers, body):
+        """Forward one request to INFLUX_URL on this thread's keep-alive connection."""
+        for attempt in (0, 1):
+            conn = getattr(self.local, 'conn', None)
+            if conn is None:
+                host, port, tls = self.upstream_addr
+                cls = http.client.HTTPSConnection if tls else http.client.HTTPConnection
+                conn = self.local.conn = cls(host, port, timeout=300)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                return resp.status, [(k, v) for k, v in resp.getheaders() if k.lower() not in HOP_HEADERS], resp.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise  # the first failure may just be a keep-alive connection InfluxDB closed
+        raise OSError("unreachable")
+
+    def query(self, org, headers, body):
+        """
+        /api/v2/query: (status, headers, body, verdict). Accepts the JSON body of the client
+        libraries / Grafana and application/vnd.flux (plain Flux) like InfluxDB does.
+        """
+        now = time.time()
+        ctype = headers.get('Content-Type', '')
+        try:
+            if 'json' in ctype:
+                request = json.loads(body)
+                flux = request['query']
+                if request.get('now'):
+                    now = flux_epoch(re.sub(r'[+-]00:00$', 'Z', request['now']))
+            else:
+                request, flux = None, body.decode('utf-8')
+        except (ValueError, KeyError, UnicodeDecodeError, AttributeError):
+            return None
+        with self.lock:
+            self.counts['requests'] += 1
+        form = normalize_flux(flux, now)
+        if form is None:
+            with self.lock:
+                self.counts['bypass'] += 1
+            return None
+        text, start, stop = form
+        extra = {k: v for k, v in (request or {}).items() if k not in ('query', 'now')}
+        key = self.key(org, headers.get('Authorization', ''), text,
+                       [ctype.split(';')[0], extra, headers.get('Accept', ''), headers.get('Accept-Encoding', '')])
+        entry = self.lookup(key, now)
+        if entry is not None:
+            return 200, entry['headers'], entry['body'], 'HIT'
+        with self.lock:
+            waiting = self.inflight.get(key)
+            if waiting is None:
+                self.inflight[key] = threading.Event()
+        if waiting is not None:
+            waiting.wait(300)
+            entry = self.lookup(key, time.time())
+            with self.lock:
+                self.counts['coalesced' if entry is not None else 'misses'] += 1
+            if entry is None:
+                return None  # the leading query failed or was not cacheable: forward this one as is
+            return 200, entry['headers'], entry['body'], 'HIT'
+        try:
+            with self.lock:
+                self.counts['misses'] += 1
+            body = json.dumps(dict(request, query=text)).encode() if request is not None else text.encode()
+            started = time.time()
+            status, resp_headers, resp_body = self.upstream('POST', f"/api/v2/query?{urllib.parse.urlencode({'org': org})}",
+                                                            {k: v for k, v in headers.items()
+                                                             if k.lower() not in HOP_HEADERS | {'content-length'}}, body)
+            cost = time.time() - started
+            with self.lock:
+                self.upstream_s += cost
+            if status == 200 and len(resp_body) <= QUERY_CACHE_ENTRY_MB * 1e6:
+                created = time.time()
+                buckets = re.findall(r'from\(\s*bucket:\s*"([^"]+)"', text) or ['*']
+                entry = {'created': created, 'expires': created + cache_ttl(created - stop if stop is not None else 0),
+                         'start': start, 'stop': stop, 'buckets': buckets, 'cost': cost,
+                         'headers': [(k, v) for k, v in resp_headers if k.lower() not in ('content-length', 'date')],
+                         'body': resp_body}
+                self.store(key, entry, started)
+            else:
+                with self.lock:
+                    self.counts['uncacheable'] += 1
+            return status, resp_headers, resp_body, 'MISS'
+        finally:
+            with self.lock:
+                self.inflight.pop(key).set()
+
+    def authorized(self, auth):
+        """Whether InfluxDB accepts the Authorization header `auth` (the logger's own token needs no round trip)."""
+        if not auth:
+            return False
+        if auth == f"Token {INFLUX_TOKEN}":
+            return True
+        try:
+            return self.upstream('GET', '/api/v2/buckets?limit=1', {'Authorization': auth}, None)[0] == 200
+        except (OSError, http.client.HTTPException):
+            return False
+
+    def stats_json(self):
+        with self.lock:
+            c = dict(self.counts)
+            hits = c['hits_mem'] + c['hits_disk']
+            c.update(hit_ratio=round(hits / c['requests'], 4) if c['requests'] else None,
+                     saved_query_s=round(self.saved_s, 3), upstream_query_s=round(self.upstream_s, 3),
+                     entries=len(self.mem.keys() | self.disk.keys()), mem_mb=round(self.mem_bytes / 1e6, 2),
+                     disk_entries=len(self.disk), disk_mb=round(self.disk_bytes / 1e6, 2))
+        return json.dumps(c).encode()
+
+    def serve(self):
+        server = bind_when_free(lambda: ThreadingHTTPServer((QUERY_CACHE_HOST, QUERY_CACHE_PORT), QueryCacheHandler))
+        if server:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            sync_print(f"[CACHE] InfluxDB query cache on :{QUERY_CACHE_PORT} -> {INFLUX_URL} "
+                       f"({len(self.disk)} entries on disk)")
+            stop_event.wait()
+            server.shutdown()
+
+    def start(self):
+        self.load()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+class QueryCacheHandler(BaseHTTPRequestHandler):
+    """InfluxDB HTTP API in front of INFLUX_URL: cached /api/v2/query, everything else forwarded."""
+    protocol_version = "HTTP/1.1"  # keep-alive: Grafana and the client libraries reuse connections
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith('/cache/') and not self.cache_authorized():
+            return
+        if path == '/cache/stats':
+            return self.reply(200, [('Content-Type', 'application/json')], QUERY_CACHE.stats_json())
+        self.forward()
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if url.path.startswith('/cache/') and not self.cache_authorized():
+            return
+        if url.path == '/cache/flush':
+            return self.reply(200, [('Content-Type', 'application/json')],
+                              json.dumps({'flushed': QUERY_CACHE.flush()}).encode())
+        if url.path == '/api/v2/query':
+            try:
+                result = QUERY_CACHE.query(params.get('org', params.get('orgID', '')), self.headers, body)
+            except (OSError, http.client.HTTPException) as e:
+                return self.reply(502, [('Content-Type', 'application/json')],
+                                  json.dumps({'code': 'unavailable', 'message': f"InfluxDB: {e}"}).encode())
+            if result is not None:
+                status, headers, resp, verdict = result
+                return self.reply(status, headers + [('X-Cache', verdict)], resp)
+        status = self.forward(body)
+        if status is not None and status < 300 and url.path in ('/api/v2/write', '/write'):
+            data = gzip.decompress(body) if self.headers.get('Content-Encoding') == 'gzip' else body
+            QUERY_CACHE.written(params.get('bucket', params.get('db', '*')),
+                                *line_protocol_span(data, params.get('precision', 'ns')))
+        elif status is not None and status < 300 and url.path == '/api/v2/delete':
+            try:
+                span = json.loads(body)
+                QUERY_CACHE.written(params.get('bucket', '*'), flux_epoch(span['start']), flux_epoch(span['stop']))
+            except (ValueError, KeyError, AttributeError):
+                QUERY_CACHE.flush()
+
+    do_HEAD = do_GET
+    do_PUT = do_PATCH = do_DELETE = do_POST
+
+    def cache_authorized(self):
+        """/cache/* endpoints: False (after replying 401) unless the request carries a valid InfluxDB token."""
+        if QUERY_CACHE.authorized(self.headers.get('Authorization', '')):
+            return True
+        self.reply(401, [('Content-Type', 'application/json')],
+                   json.dumps({'code': 'unauthorized', 'message': 'InfluxDB token required'}).encode())
+        return False
+
+    def forward(self, body=None):
+        if body is None:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+        try:
+            status, resp_headers, resp = QUERY_CACHE.upstream(self.command, self.path, headers, body or None)
+        except (OSError, http.client.HTTPException) as e:
+            self.reply(502, [('Content-Type', 'application/json')],
+                       json.dumps({'code': 'unavailable', 'message': f"InfluxDB: {e}"}).encode())
+            return None
+        self.reply(status, resp_headers, resp)
+        return status
+
+    def reply(self, status, headers, body):
+        self.send_response(status)
+        for k, v in headers:
+            if k.lower() not in ('content-length', 'server', 'date'):
+                self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+QUERY_CACHE = QueryCache()
+
+def initialize_influx_kpis(cranes=None):
+    """
+    Ensure all cranes (especially newly added QC cranes 101~112) have at least one 
+    heartbeat initialization record in InfluxDB, so that Grafana panels and variables 
+    can render all crane tiles statically without waiting for their first physical movement.
+    """
+    cranes = CRANES if cranes is None else cranes
+    sync_print(f"Initializing InfluxDB heartbeat records for {len(cranes)} configured cranes...")
+    init_kpis = {
+        'algo_version': '3.0.0',
+        'duration': 0.0,
+        'peak_order': 0.0,
+        'peak_fb': 0.0,
+        'max_error': 0.0,
+        'rms_error': 0.0,
+        'reducer_damage': 0.0,
+        'avg_weight': 1.0,
+        'shock_penalty': 1.0,
+        'peak_shock': 0.0,
+        'curr_penalty': 1.0,
+        'track_penalty': 1.0,
+        'load_factor': 1.0,
+        'start_pos': 0.0,
+        'end_pos': 0.0,
+        'avg_pos': 0.0,
+        'peak_shock_pos': 0.0,
+        'is_loaded': False
+    }
+    for crane in cranes:
+        cid = crane['id']
+        try:
+            log_event(cid, init_kpis)
+        except Exception as e:
+            sync_print(f"[!] Initialization failed for crane {cid}: {e}")
+
+def main():
+    init_csv()
+    hot_restart = ACQUISITION_MODE == "pool" and not LEASE_DB
+    if not LEASE_DB and not hot_restart:
+        initialize_influx_kpis()
+    sync_print(f"Edge Logger Started. Monitoring {len(CRANES)} cranes...")
+    n_armgc = sum(1 for c in CRANES if c.get('type') != 'QC')
+    sync_print(f"Flight recorder: {n_armgc} cranes x {FlightRecorder('-').nbytes} B "
+               f"= {n_armgc * FlightRecorder('-').nbytes / 1024:.1f} KB "
+               f"({RECORDER_PRE_S:.0f}s pre / {RECORDER_POST_S:.0f}s post @ {RECORDER_RATE}s)")
+    
+    # Start cleanup thread
+    threading.Thread(target=cleanup_old_raw_data, daemon=True).start()
+    threading.Thread(target=report_plc_links, daemon=True).start()
+    if BROKER_PORT and ACQUISITION_MODE != "processes":
+        LIVE_BROKER.start()  # diagnostic tools read through our sessions (plc_read.py)
+    if SAMPLE_BUS:
+        LIVE_BUS.open([c['id'] for c in CRANES])
+    if GRAFANA_LIVE_TOKEN and ACQUISITION_MODE != "processes":
+        LIVE_PUSH.start(CRANES)  # workers push their own shard in "processes" mode
+    if FLEET_PORT:
+        FLEET.start()  # events from every mode reach LIVE_SINK in this process
+    if QUERY_CACHE_PORT:
+        QUERY_CACHE.start()  # this process's batched writes invalidate it (on_influx_write_ok)
+    if RAIL_CUBE_DB:
+        RAIL_CUBE.start(RAIL_FLUSH_S)
+        RAIL_ANOMALY.start()  # daily, over the completed days in the cube
+    if RAINFLOW_DB:
+        RAINFLOW.start(RAINFLOW_FLUSH_S)
+    if ANOMALY_STATE_FILE:
+        SCORER.start()
+    if ALERT_RULES:
+        ALERTS.start()  # events and faults from every mode reach LIVE_SINK in this process
+    if LEDGER_DB:
+        LEDGER.start(LEDGER_FLUSH_S)
+    
+    icon = setup_tray()
+
+    # Start crane monitoring (first connects are staggered by CONNECT_STAGGER_S)
+    monitors, supervisor, leases = [], None, None
+    if LEASE_DB:
+        # Other instances share the fleet: only cranes leased to this node are monitored
+        leases = LeaseManager(LeaseStore(LEASE_DB), CRANES)
+        leases.start()
+        initialize_influx_kpis(leases.owned())
+    elif ACQUISITION_MODE == "processes":
+        supervisor = ShardSupervisor(CRANES)
+        supervisor.start()
+    elif hot_restart:
+        # Takes over from a running instance (update_exe.ps1) or starts cold
+        monitors, took_over = start_pool_acquisition(CRANES, on_exit=icon.stop)
+        if not took_over:
+            initialize_influx_kpis()
+    else:
+        monitors = [make_monitor(crane) for crane in CRANES]
+        for mon in monitors:
+            threading.Thread(target=mon.run, daemon=True).start()
+        
+    # Start Tray Icon (This is BLOCKING)
+    icon.run()
+
+    # Close open fault snapshots, then flush the batched InfluxDB writer
+    if supervisor:
+        supervisor.close()
+    if leases:
+        leases.close()
+    for mon in monitors:
+        mon.close()
+    LIVE_BUS.close()
+    RAIL_CUBE.flush()
+    RAINFLOW.flush()
+    SCORER.save()
+    ALERTS.drain()
+    LEDGER.flush()
+    write_api.close()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # PyInstaller exe: let spawned workers start
     main()
@@ -0,0 +1,166 @@
+"""
+alert_webhook_standin.py — 로거 알림(AlertEngine) 웹훅 수신 대역(stand-in) + 규칙 평가 비용 측정
+
+용도:
+  serve : 127.0.0.1:PORT 에서 웹훅 POST(JSON 알림 1건)를 받아 그대로 출력. 실제 로거의 ALERT_SINKS 에
+          {"type": "webhook", "url": "http://127.0.0.1:PORT/alert"} 를 추가해 확인.
+  (기본): 같은 프로세스에서 ALERT_RULES 로 AlertEngine 을 만들고 합성 이벤트 / 고장 스트림을 흘린다.
+            - 이벤트·고장당 규칙 평가 시간 mean / p99 / max (µs)
+            - 발생 / 반복 억제(ALERT_REPEAT_S) / 전체 속도 제한(ALERT_RATE_PER_MIN) 건수
+            - 파일 싱크 + 웹훅 싱크(이 대역) 수신 건수와 평가 → 수신 지연 p50 / max
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - PLC / InfluxDB / crane_kpi_log.csv 미사용. 로컬 HTTP 와 임시 파일만 사용.
+
+사용 예:
+  python scripts/analysis/alert_webhook_standin.py
+  python scripts/analysis/alert_webhook_standin.py --events 200000 --hours 48
+  python scripts/analysis/alert_webhook_standin.py serve --port 9099
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+
+class Inbox:
+    def __init__(self, echo):
+        self.echo = echo
+        self.received = []  # (receive time, alert)
+        self.lock = threading.Lock()
+
+
+def make_handler(inbox):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # the logger's webhook sink keeps its connection
+
+        def do_POST(self):
+            alert = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            with inbox.lock:
+                inbox.received.append((time.time(), alert))
+            if inbox.echo:
+                print(json.dumps(alert, ensure_ascii=False), flush=True)
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, fmt, *args):
+            pass
+    return Handler
+
+
+def serve(port, inbox):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(inbox))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TimedSink:
+    """Stamps each alert with its send time so the stand-in can measure delivery latency."""
+    def __init__(self, sink):
+        self.sink = sink
+
+    def send(self, alert):
+        self.sink.send(dict(alert, sent=time.time()))
+
+
+def synthetic_stream(n_events, hours, seed=7):
+    """(kind, crane_id, ts, payload) in time order: ARMGC / QC events and Cable_Reel_Slack edges."""
+    rng = random.Random(seed)
+    cranes = [c['id'] for c in logger.CRANES]
+    hot = set(rng.sample(cranes, 3))  # a few cranes with shock bursts and slack faults
+    t0 = datetime(2026, 10, 1, 5, 0)
+    step = hours * 3600.0 / n_events
+    for i in range(n_events):
+        ts = t0 + timedelta(seconds=i * step)
+        crane_id = rng.choice(cranes)
+        shock = rng.uniform(1.0, 20.0) + (rng.random() < 0.3) * 15.0 * (crane_id in hot)
+        yield 'event', crane_id, ts, {'peak_shock': shock, 'reducer_damage': rng.uniform(50, 500),
+                                      'anomaly_score': rng.gauss(0.0, 1.0)}
+        if crane_id in hot and rng.random() < 0.02:
+            yield 'fault', crane_id, ts, 'Cable_Reel_Slack'
+
+
+def bench(args):
+    inbox = Inbox(echo=False)
+    server = serve(args.port, inbox)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'alerts.jsonl')
+        sinks = [logger.FileAlertSink(path),
+                 TimedSink(logger.WebhookAlertSink(f"http://127.0.0.1:{args.port}/alert"))]
+        engine = logger.AlertEngine(logger.ALERT_RULES, sinks)
+        logger.sync_print = lambda *a, **k: None  # [ALERT] console lines
+        threading.Thread(target=engine.deliver, daemon=True).start()
+        costs = []
+        t_start = time.time()
+        for kind, crane_id, ts, payload in synthetic_stream(args.events, args.hours):
+            t0 = time.perf_counter()
+            if kind == 'event':
+                engine.event(crane_id, payload, ts)
+            else:
+                engine.fault(crane_id, payload, ts)
+            costs.append(time.perf_counter() - t0)
+        elapsed = time.time() - t_start
+        deadline = time.time() + 10.0
+        while time.time() < deadline and (engine.queue or len(inbox.received) < engine.stats['sent'] / 2):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        logger.stop_event.set()
+        with open(path, encoding='utf-8') as f:
+            in_file = sum(1 for _ in f)
+    server.shutdown()
+    costs.sort()
+    st = engine.stats
+    latency = sorted(recv - alert['sent'] for recv, alert in inbox.received)
+    print(f"{len(costs)} inputs ({args.events} events over {args.hours} h simulated) in {elapsed:.2f}s, "
+          f"{len(engine.rules)} rules")
+    print(f"  evaluation: mean {sum(costs) / len(costs) * 1e6:.1f}us, p99 {costs[int(len(costs) * 0.99)] * 1e6:.1f}us, "
+          f"max {costs[-1] * 1e6:.0f}us (engine's own: mean {st['eval_s'] / st['evaluations'] * 1e6:.1f}us)")
+    print(f"  fired {st['fired']}, repeats suppressed {st['suppressed']}, rate-limited {st['rate_limited']}, "
+          f"queue dropped {st['dropped']}")
+    print(f"  delivered: file {in_file}, webhook {len(inbox.received)}, failed {st['failed']}")
+    if latency:
+        print(f"  webhook latency: p50 {latency[len(latency) // 2] * 1000:.1f}ms, max {latency[-1] * 1000:.1f}ms")
+    by_rule = {}
+    for _, alert in inbox.received:
+        by_rule[alert['rule']] = by_rule.get(alert['rule'], 0) + 1
+    for rule, n in sorted(by_rule.items()):
+        print(f"    {rule}: {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Webhook stand-in for the logger's alert engine, and a rule evaluation benchmark",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--events', type=int, default=100000, help='Synthetic events to evaluate')
+    parser.add_argument('--hours', type=float, default=24.0, help='Simulated time the events span')
+    parser.add_argument('--port', type=int, default=9099)
+    sub = parser.add_subparsers(dest='cmd')
+    p = sub.add_parser('serve', help='Print every alert POSTed to 127.0.0.1:PORT')
+    p.add_argument('--port', type=int, default=9099)
+    args = parser.parse_args()
+    if args.cmd == 'serve':
+        serve(args.port, Inbox(echo=True))
+        print(f"Alert webhook stand-in on http://127.0.0.1:{args.port}/alert (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
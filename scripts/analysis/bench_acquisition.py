@@ -0,0 +1,152 @@
+"""
+bench_acquisition.py — 단일 프로세스(pool) vs 프로세스 분할(processes) 수집 모드의 샘플링 지터 비교
+
+용도:
+  50대 크레인을 SimulatedPLCSource 기반 BurstPLCSource 로 실시간 구동한다. 짝수/홀수 크레인이
+  PERIOD_S 주기로 반 주기씩 어긋나게 동시에 움직이므로, 한 그룹의 이벤트가 "동시에 끝나는"
+  순간(calculate_kpis + gzip raw 저장 폭주)에 다른 그룹은 ACTIVE_POLL_RATE 로 샘플링 중이다.
+  그 그룹의 raw dt 컬럼(실제 샘플 간격)으로 GIL 경합에 의한 샘플링 지연을 측정한다.
+
+  각 모드는 임시 폴더에서 별도 인터프리터로 실행된다 (운영 환경과 동일하게 새 프로세스).
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - InfluxDB 쓰기 없음, crane_kpi_log.csv 미사용. raw 파일은 임시 폴더에만 생성 후 삭제.
+
+사용 예:
+  python scripts/analysis/bench_acquisition.py
+  python scripts/analysis/bench_acquisition.py --seconds 120 --processes 4 --modes pool,processes
+"""
+import argparse
+import csv
+import glob
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+PERIOD_S = 20.0   # Burst period; each group moves once per period
+MOVE_S = 14.0     # > PERIOD_S / 2, so one group is mid-move when the other group stops
+WARMUP_S = 15.0   # Connect stagger (CONNECT_STAGGER_S x 50) — events starting earlier are dropped
+
+
+class BurstPLCSource(logger.SimulatedPLCSource):
+    """SimulatedPLCSource with wall-clock-aligned moves: every crane in a group starts and stops together."""
+    def __init__(self, crane_id, clock, phase, qc=False):
+        self.phase = phase
+        super().__init__(crane_id, clock, qc=qc)
+
+    def _schedule(self, after):
+        super()._schedule(after)
+        start = ((after - self.phase) // PERIOD_S + 1) * PERIOD_S + self.phase
+        self.move.update(start=start, end=start + MOVE_S, ramp=2.0, slack_at=None)
+
+
+def burst_source(crane_config):
+    """Module-level source factory (picklable for ShardSupervisor worker processes)."""
+    ids = [c['id'] for c in logger.CRANES]
+    phase = (ids.index(crane_config['id']) % 2) * PERIOD_S / 2
+    return BurstPLCSource(crane_config['id'], logger.REAL_CLOCK, phase, qc=crane_config.get('type') == 'QC')
+
+
+class BenchSink(logger.LiveSink):
+    """LiveSink without CSV / InfluxDB: raw gzip archive only (the CPU part of the output path)."""
+    def event(self, crane_id, kpis, raw, ts):
+        if raw is not None:
+            logger.save_raw_event(crane_id, *raw, ts=ts)
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        pass
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        pass
+
+
+def run_mode(mode, seconds, processes):
+    """Child-process body: run one acquisition mode in the current (temporary) directory."""
+    logger.SCHEDULER_REPORT_S = 10
+    if mode == 'processes':
+        supervisor = logger.ShardSupervisor(logger.CRANES, processes, source_factory=burst_source,
+                                            sink=BenchSink())
+        supervisor.start()
+        time.sleep(seconds)
+        logger.stop_event.set()
+        supervisor.close()
+    else:
+        sink = BenchSink()
+        monitors = [logger.make_monitor(c, source=burst_source(c), sink=sink) for c in logger.CRANES]
+        if mode == 'pool':
+            logger.AcquisitionScheduler(monitors).start()
+        else:
+            for mon in monitors:
+                threading.Thread(target=mon.run, daemon=True).start()
+        time.sleep(seconds)
+        logger.stop_event.set()
+        for mon in monitors:
+            mon.close()
+
+
+def load_intervals(workdir, t0):
+    """Active-sample intervals (s) from every raw event file written after warm-up."""
+    intervals = []
+    n_events = 0
+    for path in glob.glob(os.path.join(workdir, logger.RAW_DATA_DIR, '*', '*.csv.gz')):
+        if os.path.getmtime(path) < t0 + WARMUP_S + MOVE_S:
+            continue
+        with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        intervals.extend(float(r['dt']) for r in rows[1:])
+        n_events += 1
+    return n_events, sorted(intervals)
+
+
+def percentile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * (len(sorted_vals) - 1)))] if sorted_vals else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare active-sampling jitter of the pool and processes acquisition modes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--modes', default='pool,processes', help='Comma-separated: threads, pool, processes')
+    parser.add_argument('--seconds', type=float, default=90.0, help='Run time per mode (default 90)')
+    parser.add_argument('--processes', type=int, default=logger.ACQUISITION_PROCESSES,
+                        help=f'Worker processes for the processes mode (default {logger.ACQUISITION_PROCESSES})')
+    parser.add_argument('--run', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run, args.seconds, args.processes)
+        return
+
+    rate = logger.ACTIVE_POLL_RATE
+    print(f"{len(logger.CRANES)} cranes, bursts every {PERIOD_S / 2:.0f}s, {args.seconds:.0f}s per mode "
+          f"(target interval {rate * 1000:.0f}ms)")
+    print(f"{'mode':<10} {'events':>6} {'samples':>8} {'p50':>7} {'p99':>7} {'p99.9':>7} {'max':>7} {'>1.5x':>7}")
+    for mode in args.modes.split(','):
+        workdir = tempfile.mkdtemp(prefix=f'bench_{mode}_')
+        try:
+            t0 = time.time()
+            with open(os.path.join(workdir, 'logger.log'), 'w') as log:
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode,
+                                '--seconds', str(args.seconds), '--processes', str(args.processes)],
+                               cwd=workdir, stdout=log, stderr=subprocess.STDOUT, check=True)
+            n_events, iv = load_intervals(workdir, t0)
+            late = sum(1 for v in iv if v > 1.5 * rate)
+            print(f"{mode:<10} {n_events:>6d} {len(iv):>8d} " +
+                  " ".join(f"{percentile(iv, q) * 1000:>5.0f}ms" for q in (0.5, 0.99, 0.999)) +
+                  f" {(iv[-1] if iv else 0) * 1000:>5.0f}ms {100.0 * late / max(len(iv), 1):>6.2f}%")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+bench_handoff.py — 핫 리스타트(핸드오프) vs 콜드 리스타트의 수집 공백 측정 (PLC 시뮬레이터 사용)
+
+용도:
+  로거 인스턴스(old)를 pool 모드로 띄우고 restart_at 초에 재시작한다.
+    hot : 새 인스턴스(new)를 띄우면 HANDOFF_PORT 로 old 를 찾아 PLC 연결 후 인수 → old 종료
+    cold: update_exe.ps1 기존 방식 — old 강제 종료, 2초 후 new 시작
+  두 인스턴스 모두 lease_cluster.py 의 ClusterPLCSource(epoch 시드, 노드 무관 동일 일정)를 쓴다.
+
+  측정:
+    - 크레인별 수집 공백: old 의 마지막 샘플 ~ new 의 첫 "실제" 샘플 (new 의 대기 중 프로브 제외)
+    - 재시작 순간 진행 중이던 움직임이 기록되었는지, 그 이벤트 안의 최대 샘플 간격(dt)
+    - 시뮬레이터 일정 대비 누락/중복 이벤트
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - InfluxDB 쓰기 없음, crane_kpi_log.csv 미사용. 모든 파일은 임시 폴더에만 생성 후 삭제.
+
+사용 예:
+  python scripts/analysis/bench_handoff.py
+  python scripts/analysis/bench_handoff.py --modes hot --seconds 120 --restart-at 60
+"""
+import argparse
+import csv
+import functools
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+from lease_cluster import ClusterPLCSource, truth_moves
+
+COLD_RESTART_DELAY_S = 2.0  # update_exe.ps1: Start-Sleep between kill and start
+
+
+class TracedPLCSource(ClusterPLCSource):
+    """ClusterPLCSource that remembers its first/last read while the instance owns the crane."""
+    def __init__(self, crane_id, epoch, qc=False):
+        super().__init__(crane_id, epoch, qc=qc)
+        self.live = lambda: True
+        self.first_t = self.last_t = None
+
+    def _profile(self, t):
+        if self.live():
+            self.first_t = self.first_t or t
+            self.last_t = t
+        return super()._profile(t)
+
+
+def traced_source(crane_config, epoch):
+    return TracedPLCSource(crane_config['id'], epoch, qc=crane_config.get('type') == 'QC')
+
+
+class HandoffSink(logger.LiveSink):
+    """events.csv (crane, end time, duration, largest sample interval, instance) instead of CSV / InfluxDB."""
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.abspath('events.csv')
+
+    def event(self, crane_id, kpis, raw, ts):
+        max_dt = max(raw[5][1:], default=0.0)  # dt[0] is the pre-trigger seed
+        with open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerow([crane_id, f"{ts.timestamp():.3f}", kpis['duration'], f"{max_dt:.3f}", self.name])
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        pass
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        pass
+
+    def snapshot(self, crane_id, path, t_fault, records):
+        pass
+
+
+def run_instance(name, epoch, until):
+    """Child-process body: one pool-mode logger with hot restart until handed over or `until`."""
+    handed_over = threading.Event()
+    monitors, _ = logger.start_pool_acquisition(
+        logger.CRANES, on_exit=handed_over.set,
+        source_factory=functools.partial(traced_source, epoch=epoch), sink=HandoffSink(name))
+    for mon in monitors:
+        gate = getattr(mon.sink, 'leases', None)  # HandoffSuccessor while warming up
+        if gate is not None:
+            mon.source.live = functools.partial(lambda g: g.live, gate)
+    handed_over.wait(max(0.0, until - time.time()))
+    logger.stop_event.set()
+    for mon in monitors:
+        mon.close()
+    with open(f'samples_{name}.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        for mon in monitors:
+            writer.writerow([mon.crane_id, mon.source.first_t or '', mon.source.last_t or ''])
+
+
+def load_csv(pattern):
+    rows = []
+    for path in glob.glob(pattern):
+        with open(path, newline='') as f:
+            rows.extend(csv.reader(f))
+    return rows
+
+
+def percentile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * (len(sorted_vals) - 1)))] if sorted_vals else 0.0
+
+
+def run_mode(mode, seconds, restart_at):
+    workdir = tempfile.mkdtemp(prefix=f'bench_handoff_{mode}_')
+    epoch = time.time()
+    until = epoch + seconds
+    try:
+        def start(name):
+            log = open(os.path.join(workdir, f'{name}.log'), 'w')
+            return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--run', name,
+                                     '--epoch', str(epoch), '--until', str(until)],
+                                    cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+        old = start('old')
+        time.sleep(max(0.0, epoch + restart_at - time.time()))
+        if mode == 'cold':
+            old.kill()
+            t_switch = time.time()
+            time.sleep(COLD_RESTART_DELAY_S)
+            new = start('new')
+        else:
+            new = start('new')
+            while old.poll() is None and time.time() < until:
+                time.sleep(0.05)
+            t_switch = time.time()
+        old.wait()
+        new.wait()
+
+        # Per-crane gap: predecessor's last read -> successor's first read after taking over
+        last_old = {r[0]: float(r[2]) for r in load_csv(os.path.join(workdir, 'samples_old.csv')) if r[2]}
+        gaps = []
+        for crane_id, first_t, _ in load_csv(os.path.join(workdir, 'samples_new.csv')):
+            if first_t:
+                gaps.append(float(first_t) - last_old.get(crane_id, t_switch))
+        gaps.sort()
+
+        events = {}
+        for crane_id, ts, _duration, max_dt, name in load_csv(os.path.join(workdir, 'events.csv')):
+            events.setdefault(crane_id, []).append((float(ts), float(max_dt), name))
+        n_once = n_missed = n_dup = 0
+        spanning, spanning_logged, seam_dt = 0, 0, []
+        for crane_id, start_t, end_t in truth_moves(epoch, until):
+            hits = [e for e in events.get(crane_id, []) if start_t <= e[0] <= end_t + 1.0]
+            n_once += len(hits) == 1
+            n_missed += not hits
+            n_dup += len(hits) > 1
+            if start_t < t_switch < end_t:
+                spanning += 1
+                spanning_logged += bool(hits)
+                seam_dt.extend(e[1] for e in hits)
+        return {
+            'once': n_once, 'missed': n_missed, 'dup': n_dup,
+            'spanning': f"{spanning_logged}/{spanning}",
+            'seam': max(seam_dt, default=0.0),
+            'gap50': percentile(gaps, 0.5), 'gapmax': gaps[-1] if gaps else 0.0,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the acquisition gap of a hot (handoff) vs cold logger restart on simulated PLCs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--modes', default='hot,cold', help='Comma-separated: hot, cold')
+    parser.add_argument('--seconds', type=float, default=90.0, help='Run time per mode (default 90)')
+    parser.add_argument('--restart-at', type=float, default=45.0, help='Seconds until the restart (default 45)')
+    parser.add_argument('--run', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--epoch', type=float, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--until', type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_instance(args.run, args.epoch, args.until)
+        return
+
+    print(f"{len(logger.CRANES)} cranes, restart at {args.restart_at:.0f}s of {args.seconds:.0f}s "
+          f"(active interval {logger.ACTIVE_POLL_RATE * 1000:.0f}ms)")
+    print(f"{'mode':<5} {'once':>5} {'missed':>6} {'dup':>4} {'in-flight kept':>14} {'seam dt':>8} "
+          f"{'gap p50':>8} {'gap max':>8}")
+    for mode in args.modes.split(','):
+        r = run_mode(mode, args.seconds, args.restart_at)
+        print(f"{mode:<5} {r['once']:>5d} {r['missed']:>6d} {r['dup']:>4d} {r['spanning']:>14} "
+              f"{r['seam'] * 1000:>6.0f}ms {r['gap50'] * 1000:>6.0f}ms {r['gapmax'] * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+bench_sample_bus.py — 공유 메모리 샘플 버스(SampleBus / SampleBusReader) 처리량·지연 벤치마크
+
+용도:
+  1) writer : 크레인 50대 링에 SampleBus.publish() 를 최대 속도로 호출 → 레코드/s, µs/레코드
+  2) reader : 가득 찬 링 50개를 SampleBusReader.poll() 뷰(복사 없음)로 소비 → 레코드/s
+  3) fleet  : 실제 운영 속도(크레인 50대 x ACTIVE_POLL_RATE)로 쓰면서 별도 프로세스 리더 N개가
+              바쁜 폴링으로 읽을 때 기록 시각 → 수신 시각 지연 p50/p99/max 와 누락 수
+
+  운영 중인 로거의 버스와 겹치지 않도록 별도 세그먼트 이름(BENCH_PREFIX)을 쓴다.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - PLC / InfluxDB / crane_kpi_log.csv 미사용. 공유 메모리만 사용하고 종료 시 해제.
+
+사용 예:
+  python scripts/analysis/bench_sample_bus.py
+  python scripts/analysis/bench_sample_bus.py --seconds 30 --readers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+BENCH_PREFIX = f"cranepdm_bench_{os.getpid()}_"
+SAMPLE = (1200, 1180, True, 25, 1500, (3600, 40, 28))
+
+
+def bench_writer(bus, cranes, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        bus.publish(cranes[i % len(cranes)], time.time(), 'sample', SAMPLE)
+    return time.perf_counter() - t0
+
+
+def bench_reader(cranes, rounds):
+    readers = [logger.SampleBusReader(cid, prefix=BENCH_PREFIX, from_start=True) for cid in cranes]
+    n = 0
+    peak = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for reader in readers:
+            reader.cursor = max(0, reader.cursor - reader.capacity)  # re-read the full ring
+            for chunk in reader.poll():
+                peak = max(peak, int(np.abs(chunk['reel_torque']).max()))  # touch the data in place
+                n += len(chunk)
+    elapsed = time.perf_counter() - t0
+    for reader in readers:
+        reader.close()
+    return n, elapsed
+
+
+def reader_process(prefix, cranes, seconds, ready, results):
+    """Busy-polls every ring; latency = receive time - record timestamp."""
+    readers = [logger.SampleBusReader(cid, prefix=prefix) for cid in cranes]
+    latencies = []
+    ready.set()
+    end = time.time() + seconds
+    while time.time() < end:
+        for reader in readers:
+            for chunk in reader.poll():
+                now = time.time()
+                latencies.extend((now - chunk['t']).tolist())
+    lost = sum(r.lost for r in readers)
+    for reader in readers:
+        reader.close()
+    results.put((latencies, lost))
+
+
+def bench_fleet(bus, cranes, seconds, n_readers):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    readies = [ctx.Event() for _ in range(n_readers)]
+    procs = [ctx.Process(target=reader_process, args=(BENCH_PREFIX, cranes, seconds + 1.0, ready, results))
+             for ready in readies]
+    for proc in procs:
+        proc.start()
+    for proc, ready in zip(procs, readies):
+        while not ready.wait(0.5):
+            if not proc.is_alive():
+                raise SystemExit(f"[!] reader process exited with code {proc.exitcode}")
+
+    # Full fleet rate: every crane sampled each ACTIVE_POLL_RATE, spread across the period
+    period = logger.ACTIVE_POLL_RATE / len(cranes)
+    written = 0
+    next_t = time.time()
+    end = next_t + seconds
+    while next_t < end:
+        delay = next_t - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        bus.publish(cranes[written % len(cranes)], time.time(), 'sample', SAMPLE)
+        written += 1
+        next_t += period
+    out = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return written, out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the shared-memory sample bus at full fleet rate",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--records', type=int, default=500_000, help='Records for the raw writer test')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Duration of the fleet-rate test')
+    parser.add_argument('--readers', type=int, default=2, help='Reader processes in the fleet-rate test')
+    args = parser.parse_args()
+
+    cranes = [c['id'] for c in logger.CRANES]
+    bus = logger.SampleBus(prefix=BENCH_PREFIX)
+    bus.open(cranes)
+    try:
+        record = logger.FlightRecorder.DTYPE.itemsize
+        print(f"{len(cranes)} rings x {logger.BUS_CAPACITY} records x {record} B "
+              f"= {len(cranes) * logger.BUS_CAPACITY * record / 1024:.0f} KB")
+
+        elapsed = bench_writer(bus, cranes, args.records)
+        print(f"writer : {args.records / elapsed:,.0f} records/s ({elapsed / args.records * 1e6:.2f} us/record)")
+
+        n, elapsed = bench_reader(cranes, 20)
+        print(f"reader : {n / elapsed:,.0f} records/s (zero-copy views, {n:,} records)")
+
+        rate = len(cranes) / logger.ACTIVE_POLL_RATE
+        written, out = bench_fleet(bus, cranes, args.seconds, args.readers)
+        print(f"fleet  : {rate:.0f} records/s for {args.seconds:.0f}s, {written} written, {args.readers} reader processes")
+        for i, (lat, lost) in enumerate(out):
+            lat = np.sort(np.array(lat)) * 1e6
+            print(f"  reader {i}: {len(lat)} received, lost {lost} | latency p50 {np.percentile(lat, 50):.0f}us "
+                  f"p99 {np.percentile(lat, 99):.0f}us max {lat.max():.0f}us")
+    finally:
+        bus.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+grafana_live_standin.py — Grafana Live HTTP push 수신 대역(stand-in)으로 로거의 실시간 상태 푸시 검증
+
+용도:
+  Grafana 없이 로거의 GrafanaLive 푸시(POST /api/live/push/<stream>, Influx line protocol)를 받는다.
+    serve : 127.0.0.1:PORT 에서 수신한 라인을 그대로 출력. 실제 로거를
+            GRAFANA_URL="http://127.0.0.1:PORT", CRANEPDM_GRAFANA_TOKEN=<--token> 으로 붙여 확인.
+    (기본): 같은 프로세스에서 pool 스케줄러 + lease_cluster.py 의 ClusterPLCSource(시드 고정 일정)로
+            로거를 돌리며 푸시를 검증한다.
+              - 요청 / 라인 / 바이트 수, 크레인당 초당 라인 수
+              - 라인 타임스탬프 → 수신 시각 지연 p50/p99/max
+              - 시뮬레이터의 움직임(>= 5s)마다 moving=true 가 수신되었는지, 움직임 시작부터 걸린 시간
+              - --outage 초 동안 503 응답 (장애 중 드롭 / 복구 로그 확인)
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - PLC / InfluxDB / crane_kpi_log.csv 미사용. 로컬 HTTP 만 사용.
+
+사용 예:
+  python scripts/analysis/grafana_live_standin.py
+  python scripts/analysis/grafana_live_standin.py --seconds 120 --outage 10
+  python scripts/analysis/grafana_live_standin.py serve --port 3999 --token test
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+from lease_cluster import ClusterPLCSource, ClusterSink, truth_moves
+
+PUSH_PREFIX = '/api/live/push/'
+
+
+def parse_line(line):
+    """'crane_235,type=ARMGC moving=true,speed=0i,fault="" 17...' -> (measurement, tags, fields, t)."""
+    head, rest = line.split(' ', 1)
+    body, ts = rest.rsplit(' ', 1)
+    measurement, *tags = head.split(',')
+    fields, key, value, quoted = {}, '', '', False
+    i = 0
+    while i <= len(body):
+        ch = body[i] if i < len(body) else ','
+        if quoted:
+            if ch == '\\':
+                i += 1
+                value += body[i]
+            elif ch == '"':
+                quoted = False
+            else:
+                value += ch
+        elif ch == '"':
+            quoted = True
+            fields[key] = ''  # string field, even if empty
+        elif ch == '=' and not key:
+            key, value = value, ''
+        elif ch == ',':
+            if value.endswith('i') and value[:-1].lstrip('-').isdigit():
+                fields[key] = int(value[:-1])
+            elif value in ('true', 'false'):
+                fields[key] = value == 'true'
+            elif key in fields:
+                fields[key] = value
+            else:
+                fields[key] = float(value)
+            key, value = '', ''
+        else:
+            value += ch
+        i += 1
+    return measurement, dict(t.split('=', 1) for t in tags), fields, int(ts) / 1e9
+
+
+class StandIn(ThreadingHTTPServer):
+    """Grafana Live push endpoint: Bearer token check, 503 while `outage` is set, lines kept in `received`."""
+    def __init__(self, port, token, echo=False):
+        super().__init__(('127.0.0.1', port), PushHandler)
+        self.token = token
+        self.echo = echo
+        self.outage = threading.Event()
+        self.received = []  # (receive time, stream, measurement, tags, fields, line time)
+        self.requests = self.rejected = self.bytes = 0
+
+
+class PushHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        now = time.time()
+        if not self.path.startswith(PUSH_PREFIX):
+            return self.reply(404, 'not found')
+        if server.token and self.headers.get('Authorization') != f"Bearer {server.token}":
+            return self.reply(401, 'unauthorized')
+        if server.outage.is_set():
+            server.rejected += 1
+            return self.reply(503, 'service unavailable')
+        stream = self.path[len(PUSH_PREFIX):]
+        server.requests += 1
+        server.bytes += len(body)
+        for line in body.decode().splitlines():
+            measurement, tags, fields, t = parse_line(line)
+            server.received.append((now, stream, measurement, tags, fields, t))
+            if server.echo:
+                print(f"{time.strftime('%H:%M:%S')} stream/{stream}/{measurement} {tags} {fields}")
+        self.reply(200, '{}')
+
+    def reply(self, status, text):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text.encode())
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def percentile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * (len(sorted_vals) - 1)))] if sorted_vals else 0.0
+
+
+def simulate(seconds, outage, port):
+    token = 'standin-token'
+    server = StandIn(port, token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.GRAFANA_URL = f"http://127.0.0.1:{port}"
+    logger.GRAFANA_LIVE_TOKEN = token
+
+    epoch = time.time()
+    until = epoch + seconds
+    sink = ClusterSink('standin')
+    sink.path = os.devnull
+    logger.LIVE_PUSH.start(logger.CRANES)
+    monitors = [logger.make_monitor(c, source=ClusterPLCSource(c['id'], epoch, qc=c.get('type') == 'QC'), sink=sink)
+                for c in logger.CRANES]
+    logger.AcquisitionScheduler(monitors).start()
+
+    outage_at = epoch + seconds / 2
+    time.sleep(max(0.0, outage_at - time.time()))
+    if outage:
+        server.outage.set()
+        time.sleep(outage)
+        server.outage.clear()
+    time.sleep(max(0.0, until - time.time()))
+    logger.stop_event.set()
+    time.sleep(logger.LIVE_PUSH_S)
+    server.shutdown()
+
+    received = server.received
+    delays = sorted(now - t for now, _, _, _, _, t in received)
+    per_crane = {}
+    for now, _, measurement, _, fields, _ in received:
+        per_crane.setdefault(measurement[len('crane_'):], []).append((now, fields))
+    # Moves that start after the connect stagger and end before the outage / run end
+    warmup = epoch + len(logger.CRANES) * logger.CONNECT_STAGGER_S + logger.CONNECT_SETTLE_S
+    seen, detect = 0, []
+    moves = [m for m in truth_moves(epoch, until - 2 * logger.LIVE_PUSH_S) if m[1] > warmup
+             and not (outage and m[1] - 5 < outage_at + outage and m[2] > outage_at)]
+    for crane_id, start_t, end_t in moves:
+        hits = [now for now, f in per_crane.get(crane_id, []) if f['moving'] and start_t <= now <= end_t + 2.0]
+        seen += bool(hits)
+        if hits:
+            detect.append(hits[0] - start_t)
+    detect.sort()
+    stops = with_damage = 0  # moving -> idle transitions, which carry the finished event's damage
+    for rows in per_crane.values():
+        for (_, prev), (_, cur) in zip(rows, rows[1:]):
+            if prev['moving'] and not cur['moving']:
+                stops += 1
+                with_damage += cur['damage'] > 0
+
+    print(f"{len(logger.CRANES)} cranes, {seconds:.0f}s, push every {logger.LIVE_PUSH_S:.0f}s "
+          f"(keepalive {logger.LIVE_KEEPALIVE_S:.0f}s)")
+    print(f"received: {server.requests} requests, {len(received)} lines, {server.bytes / 1024:.0f} KB "
+          f"| {len(received) / len(logger.CRANES) / seconds:.2f} lines/crane/s | rejected during outage {server.rejected}")
+    print(f"line age at receipt: p50 {percentile(delays, 0.5) * 1000:.0f}ms "
+          f"p99 {percentile(delays, 0.99) * 1000:.0f}ms max {delays[-1] * 1000 if delays else 0:.0f}ms")
+    print(f"simulated moves >= 5s: {len(moves)} | moving=true received {seen} | from move start: "
+          f"p50 {percentile(detect, 0.5):.2f}s max {detect[-1] if detect else 0:.2f}s")
+    print(f"moves ended: {stops} | with final damage: {with_damage}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Grafana Live push endpoint; checks the logger's live state stream",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('mode', nargs='?', default='simulate', choices=['simulate', 'serve'])
+    parser.add_argument('--port', type=int, default=3999)
+    parser.add_argument('--token', default=None, help='serve: required Bearer token (default: accept any)')
+    parser.add_argument('--seconds', type=float, default=90.0, help='simulate: run time (default 90)')
+    parser.add_argument('--outage', type=float, default=5.0, help='simulate: seconds of 503 at mid-run (default 5)')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        print(f"Grafana Live stand-in on http://127.0.0.1:{args.port}{PUSH_PREFIX}<stream> (Ctrl+C to stop)")
+        try:
+            StandIn(args.port, args.token, echo=True).serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        simulate(args.seconds, args.outage, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+lease_cluster.py — 여러 로거 인스턴스의 리스 기반 크레인 분할/페일오버 검증 (PLC 시뮬레이터 사용)
+
+용도:
+  NODES 개의 로거 프로세스를 로컬에서 띄워 하나의 임시 LEASE_DB 를 공유하게 한다.
+  모든 노드는 같은 epoch 로 시드된 ClusterPLCSource 를 쓰므로 크레인 움직임 일정이
+  노드와 무관하게 동일하다 (= 두 노드가 같은 크레인을 동시에 잡으면 같은 이벤트가 두 번 기록됨).
+
+  시나리오:
+    t=0          node-0 .. node-(N-1) 시작 → 리스 분배
+    t=kill_at    node-0 강제 종료 (호스트 장애) → LEASE_TTL_S 후 생존 노드가 인수
+    t=rejoin_at  node-0 재시작 → 해시 분배에 따라 일부 크레인이 유휴 시점에 반환
+    t=seconds    모든 노드 정상 종료
+
+  결과: 시뮬레이터 일정(정답)의 각 움직임이 몇 개 노드에서 기록되었는지 집계한다.
+  중복(2회 이상)은 0 이어야 하며, 누락은 시작/장애 인수 구간에만 나와야 한다.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - InfluxDB 쓰기 없음, crane_kpi_log.csv 미사용. 모든 파일은 임시 폴더에만 생성 후 삭제.
+
+사용 예:
+  python scripts/analysis/lease_cluster.py
+  python scripts/analysis/lease_cluster.py --nodes 3 --seconds 180 --kill-at 60 --rejoin-at 120
+"""
+import argparse
+import csv
+import functools
+import glob
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+MIN_MOVE_S = 5.0  # Truth only counts moves well above the ARMGC (3 s) / QC (1.5 s) event minimum
+
+
+class ClusterPLCSource(logger.SimulatedPLCSource):
+    """
+    SimulatedPLCSource whose move schedule depends only on (crane_id, epoch), so every node
+    sees the same moves. Reel noise comes from a separate RNG and cannot shift the schedule.
+    """
+    MEAN_IDLE_S = 20.0
+
+    def __init__(self, crane_id, epoch, qc=False):
+        super().__init__(crane_id, logger.REAL_CLOCK, qc=qc)
+        self.rng = random.Random(crane_id)
+        self.position = self.rng.uniform(200, 3000)
+        self._schedule(epoch)
+        self.noise = random.Random()
+
+    def _reel(self, speed, accel, scale):
+        rng, self.rng = self.rng, self.noise
+        try:
+            return super()._reel(speed, accel, scale)
+        finally:
+            self.rng = rng
+
+
+def cluster_source(crane_config, epoch):
+    return ClusterPLCSource(crane_config['id'], epoch, qc=crane_config.get('type') == 'QC')
+
+
+class ClusterSink(logger.LiveSink):
+    """events.csv in the node's working directory instead of CSV_FILE / InfluxDB / raw archive."""
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.path = os.path.abspath('events.csv')
+
+    def event(self, crane_id, kpis, raw, ts):
+        with open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerow([crane_id, f"{ts.timestamp():.3f}", kpis['duration'], self.node_id])
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        pass
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        pass
+
+    def snapshot(self, crane_id, path, t_fault, records):
+        pass
+
+
+def run_node(node_id, lease_db, epoch, until):
+    """Child-process body: one logger instance in lease mode until `until` (epoch seconds)."""
+    manager = logger.LeaseManager(logger.LeaseStore(lease_db), logger.CRANES, node_id=node_id,
+                                  source_factory=functools.partial(cluster_source, epoch=epoch),
+                                  sink=ClusterSink(node_id))
+    manager.start()
+    logger.stop_event.wait(max(0.0, until - time.time()))
+    logger.stop_event.set()
+    manager.close()
+
+
+def truth_moves(epoch, until):
+    """(crane_id, start, end) of every simulated move that ends inside the run."""
+    moves = []
+    for crane in logger.CRANES:
+        src = cluster_source(crane, epoch)
+        while src.move['end'] < until:
+            m = src.move
+            if m['end'] - m['start'] >= MIN_MOVE_S:
+                moves.append((crane['id'], m['start'], m['end']))
+            src._schedule(m['end'])
+    return moves
+
+
+def load_events(workdir):
+    events = {}
+    for path in glob.glob(os.path.join(workdir, 'node-*', 'events.csv')):
+        with open(path, newline='') as f:
+            for crane_id, ts, _duration, node_id in csv.reader(f):
+                events.setdefault(crane_id, []).append((float(ts), node_id))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run several lease-mode logger instances on simulated PLCs and check exactly-once output",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--nodes', type=int, default=3, help='Logger instances (default 3)')
+    parser.add_argument('--seconds', type=float, default=150.0, help='Total run time (default 150)')
+    parser.add_argument('--kill-at', type=float, default=50.0, help='Seconds until node-0 is killed (default 50)')
+    parser.add_argument('--rejoin-at', type=float, default=100.0, help='Seconds until node-0 restarts (default 100)')
+    parser.add_argument('--run', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--lease-db', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--epoch', type=float, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--until', type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_node(args.run, args.lease_db, args.epoch, args.until)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='lease_cluster_')
+    lease_db = os.path.join(workdir, 'leases.sqlite')
+    epoch = time.time()
+    until = epoch + args.seconds
+    procs = {}
+
+    def start(node_id):
+        node_dir = os.path.join(workdir, node_id)
+        os.makedirs(node_dir, exist_ok=True)
+        log = open(os.path.join(node_dir, 'logger.log'), 'a')
+        procs[node_id] = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--run', node_id, '--lease-db', lease_db,
+             '--epoch', str(epoch), '--until', str(until)],
+            cwd=node_dir, stdout=log, stderr=subprocess.STDOUT)
+
+    try:
+        print(f"{args.nodes} nodes, {len(logger.CRANES)} cranes, TTL {logger.LEASE_TTL_S:.0f}s | "
+              f"kill node-0 at {args.kill_at:.0f}s, rejoin at {args.rejoin_at:.0f}s, stop at {args.seconds:.0f}s")
+        for i in range(args.nodes):
+            start(f"node-{i}")
+        time.sleep(max(0.0, epoch + args.kill_at - time.time()))
+        procs['node-0'].kill()
+        print(f"[{time.time() - epoch:5.0f}s] node-0 killed")
+        time.sleep(max(0.0, epoch + args.rejoin_at - time.time()))
+        start('node-0')
+        print(f"[{time.time() - epoch:5.0f}s] node-0 restarted")
+        for proc in procs.values():
+            proc.wait()
+
+        db = sqlite3.connect(lease_db)
+        epochs = dict(db.execute("SELECT crane_id, epoch FROM leases").fetchall())
+        db.close()
+        events = load_events(workdir)
+        moves = truth_moves(epoch, until)
+
+        counts = {0: 0, 1: 0}
+        dup = []
+        missed = {'startup': 0, 'failover': 0, 'rejoin': 0, 'other': 0}
+        for crane_id, start_t, end_t in moves:
+            hits = [e for e in events.get(crane_id, []) if start_t <= e[0] <= end_t + 1.0]
+            counts[min(len(hits), 1)] += 1
+            if len(hits) > 1:
+                dup.append((crane_id, end_t - epoch, sorted(n for _, n in hits)))
+            elif not hits:
+                t = start_t - epoch
+                if t < logger.LEASE_RENEW_S + len(logger.CRANES) * logger.CONNECT_STAGGER_S:
+                    missed['startup'] += 1
+                elif args.kill_at - 40 <= t <= args.kill_at + logger.LEASE_TTL_S + 2 * logger.LEASE_RENEW_S:
+                    missed['failover'] += 1  # includes moves in progress on node-0 when it died
+                elif args.rejoin_at <= t <= args.rejoin_at + 2 * logger.LEASE_RENEW_S:
+                    missed['rejoin'] += 1
+                else:
+                    missed['other'] += 1
+
+        per_node = {}
+        for hits in events.values():
+            for _, node_id in hits:
+                per_node[node_id] = per_node.get(node_id, 0) + 1
+        print("events per node: " + ", ".join(f"{n} {c}" for n, c in sorted(per_node.items())))
+        print(f"lease handovers: {sum(e - 1 for e in epochs.values())} over {len(epochs)} cranes")
+        print(f"simulated moves >= {MIN_MOVE_S:.0f}s: {len(moves)} | logged once {counts[1] - len(dup)} | "
+              f"duplicated {len(dup)} | missed {counts[0]} "
+              f"({', '.join(f'{k} {v}' for k, v in missed.items())})")
+        for crane_id, t, nodes in dup[:20]:
+            print(f"  DUPLICATE {crane_id} @ {t:.1f}s: {', '.join(nodes)}")
+    finally:
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
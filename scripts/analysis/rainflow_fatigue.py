@@ -0,0 +1,181 @@
+"""
+rainflow_fatigue.py — 릴 토크 레인플로우(rainflow) 단계 벤치마크 + 누적 히스토그램으로 S-N 손상도 산출
+
+crane_edge_logger.py 의 calculate_kpis / calculate_kpis_qc 는 RAINFLOW_DB 가 켜져 있으면 이벤트마다
+토크 신호의 하중 반전을 레인플로우로 세어 (범위 × 평균) 히스토그램과 rainflow_damage / rainflow_cycles 를
+함께 기록하고, RainflowStore 가 호기 × 일 히스토그램을 rainflow.sqlite 에 누적한다.
+
+  bench (기본) : 이벤트당 비용 비교 — 기존 샘플 단위 모델(calculate_kpis, 레인플로우 끔) vs 레인플로우 단계.
+                 mean / p99 (µs), 초당 이벤트 수, 그리고 두 손상도 지표의 이벤트 순위 상관(Spearman)과
+                 상위 10 % 이벤트 겹침. --raw-date 를 주면 raw_plc_data/{날짜} 원본, 없으면 합성 이벤트.
+  damage       : rainflow.sqlite 의 최근 --days 일 히스토그램으로 호기별 손상도 Σ n·(S/100)^k.
+                 S = 범위 구간 중앙값, --mean-limit 을 주면 평균 토크 보정(Goodman 형: S / (1 - |평균|/한계)).
+                 기울기 k 는 --k (기본 RAINFLOW_SN_K; ISO 6336 굽힘 ~6.2, 면압 ~6.6).
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - PLC / InfluxDB / crane_kpi_log.csv 미사용. raw 파일과 rainflow.sqlite 는 읽기만 한다.
+
+사용 예:
+  python scripts/analysis/rainflow_fatigue.py
+  python scripts/analysis/rainflow_fatigue.py bench --raw-date 2026-10-12
+  python scripts/analysis/rainflow_fatigue.py damage --days 30 --k 6.2 --mean-limit 250
+"""
+import argparse
+import csv
+import glob
+import gzip
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+
+def synthetic_events(n_events, seed=7):
+    """(crane_id, calculate_kpis args) for ARMGC gantry moves: trapezoid speed, torque with ramps, ripple and kicks."""
+    rng = random.Random(seed)
+    for _ in range(n_events):
+        n = rng.randint(100, 1200)  # 5 - 60 s at 50 ms
+        top = rng.uniform(1500, 3500) * rng.choice((1, -1))
+        ramp = max(2, int(n * rng.uniform(0.1, 0.3)))
+        rough = rng.random() < 0.1  # a few gearboxes with heavy load reversals
+        orders, torques = [], []
+        for i in range(n):
+            speed = top * min(1.0, i / ramp, (n - 1 - i) / ramp)
+            accel = 0 if ramp <= i < n - ramp else (1 if i < ramp else -1)
+            torque = 25.0 + 30.0 * accel + rng.gauss(0, 2.0) + (rough * 15.0 * math.sin(i / 3.0))
+            if rng.random() < 0.005:
+                torque += rng.gauss(0, 40.0)
+            orders.append(int(speed))
+            torques.append(int(torque * (1 if top > 0 else -1)))
+        feedbacks = [int(o * 0.98) for o in orders]
+        db170 = [(abs(o) // 3, int(20 + abs(t) * 0.5), t) for o, t in zip(orders, torques)]
+        yield '2' + str(rng.randint(11, 45)), (orders, feedbacks, [True] * n, [20.0] * n,
+                                               list(range(1000, 1000 + n)), [0.05] * n, db170)
+
+
+def raw_events(day):
+    """(crane_id, calculate_kpis args) from raw_plc_data/{day} (same columns as save_raw_event)."""
+    for path in sorted(glob.glob(os.path.join(ROOT, logger.RAW_DATA_DIR, day, '*.csv.gz'))):
+        cols = ([], [], [], [], [], [], [])
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                cols[0].append(int(float(row['order'])))
+                cols[1].append(int(float(row['feedback'])))
+                cols[2].append(row['loaded'] == '1')
+                cols[3].append(float(row['weight']))
+                cols[4].append(int(float(row['position'])))
+                cols[5].append(float(row['dt']))
+                cols[6].append((int(float(row['reel_speed'])), int(float(row['reel_current'])),
+                                int(float(row['reel_torque']))))
+        yield os.path.basename(path).split('_')[0], cols
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def summary(name, costs):
+    costs = np.sort(np.asarray(costs))
+    print(f"  {name:<34} mean {costs.mean() * 1e6:8.1f}us  p99 {costs[int(len(costs) * 0.99)] * 1e6:8.1f}us  "
+          f"{1.0 / costs.mean():9.0f} events/s")
+
+
+def ranks(values):
+    order = np.argsort(values, kind='stable')
+    r = np.empty(len(values))
+    r[order] = np.arange(len(values))
+    return r
+
+
+def bench(args):
+    events = list(raw_events(args.raw_date) if args.raw_date else synthetic_events(args.events))
+    rainflow_db = logger.RAINFLOW_DB or 'rainflow.sqlite'
+    base_costs, stage_costs, base_damage, rf_damage, samples = [], [], [], [], 0
+    for crane_id, cols in events:
+        qc = crane_id.startswith('1')
+        logger.RAINFLOW_DB = None
+        kpis, cost = timed(logger.calculate_kpis_qc if qc else logger.calculate_kpis, *cols)
+        if kpis is None:
+            continue
+        logger.RAINFLOW_DB = rainflow_db
+        rf, rf_cost = timed(logger.rainflow_kpis, [v[2] for v in cols[6] if v is not None])
+        base_costs.append(cost)
+        stage_costs.append(rf_cost)
+        base_damage.append(kpis['reducer_damage'])
+        rf_damage.append(rf['rainflow_damage'])
+        samples += len(cols[0])
+    if not base_costs:
+        sys.exit("no scorable events")
+    n = len(base_costs)
+    print(f"{n} events ({'raw ' + args.raw_date if args.raw_date else 'synthetic'}), "
+          f"{samples / n:.0f} samples/event")
+    summary("per-sample model (calculate_kpis)", base_costs)
+    summary("rainflow stage (rainflow_kpis)", stage_costs)
+    print(f"  stage overhead: {sum(stage_costs) / sum(base_costs) * 100:.1f}% of calculate_kpis")
+    base, rf = np.asarray(base_damage), np.asarray(rf_damage)
+    spearman = np.corrcoef(ranks(base), ranks(rf))[0, 1]
+    top = max(1, n // 10)
+    overlap = len(set(np.argsort(base)[-top:]) & set(np.argsort(rf)[-top:])) / top
+    print(f"  damage rank correlation (Spearman): {spearman:.3f}, top 10% overlap {overlap * 100:.0f}%")
+
+
+def damage(args):
+    db = sqlite3.connect(os.path.join(ROOT, logger.RAINFLOW_DB or 'rainflow.sqlite'))
+    first = (date.today() - timedelta(days=args.days)).isoformat()
+    rows = np.array(db.execute("SELECT CAST(crane_id AS INTEGER), range_bin, mean_bin, sum(cycles) FROM hist "
+                               "WHERE day >= ? GROUP BY crane_id, range_bin, mean_bin", (first,)).fetchall(),
+                    dtype=float).reshape(-1, 4)
+    if not rows.size:
+        sys.exit(f"no histograms since {first}")
+    crane, stress, mean, cycles = rows.T
+    stress = stress + logger.RAINFLOW_RANGE_STEP / 2.0
+    if args.mean_limit:
+        mean = np.abs(mean + logger.RAINFLOW_MEAN_STEP / 2.0)
+        stress = stress / np.maximum(1.0 - mean / args.mean_limit, 0.05)
+    contrib = cycles * (stress / 100.0) ** args.k
+    cranes, inverse = np.unique(crane, return_inverse=True)
+    total = np.bincount(inverse, weights=contrib)
+    n_cycles = np.bincount(inverse, weights=cycles)
+    big = np.bincount(inverse, weights=contrib * (stress >= args.big))
+    print(f"since {first}, k = {args.k}" + (f", mean limit {args.mean_limit}%" if args.mean_limit else ""))
+    print(f"{'crane':>5} {'cycles':>10} {'damage':>12} {'rel':>6} {f'>= {args.big:g}%':>8}")
+    for i in np.argsort(-total):
+        print(f"{int(cranes[i]):>5} {n_cycles[i]:>10.0f} {total[i]:>12.4g} {total[i] / total.max():>6.2f} "
+              f"{big[i] / total[i] * 100 if total[i] else 0:>7.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rainflow torque fatigue: stage benchmark and S-N damage from the stored histograms",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--events', type=int, default=2000, help='Synthetic events to benchmark')
+    parser.add_argument('--raw-date', default=None, help='Benchmark on raw_plc_data/YYYY-MM-DD instead')
+    sub = parser.add_subparsers(dest='cmd')
+    p = sub.add_parser('bench', help='Per-event cost and damage ranking: per-sample model vs rainflow')
+    p.add_argument('--events', type=int, default=2000)
+    p.add_argument('--raw-date', default=None)
+    p = sub.add_parser('damage', help='Per-crane S-N damage from rainflow.sqlite')
+    p.add_argument('--days', type=int, default=30)
+    p.add_argument('--k', type=float, default=logger.RAINFLOW_SN_K, help='S-N slope')
+    p.add_argument('--mean-limit', type=float, default=None, help='Torque %% a mean exhausts (Goodman correction)')
+    p.add_argument('--big', type=float, default=50.0, help='Range (torque %%) reported as large cycles')
+    args = parser.parse_args()
+    if args.cmd == 'damage':
+        damage(args)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""
+replay_pipeline.py — 라이브 수집 상태머신(ARMGCMonitor / QCMonitor)을 가상 시계로 오프라인 실행
+
+용도:
+  crane_edge_logger 의 idle poll → active capture → calculate_kpis → 3.0s / 1.5s 필터 →
+  fault edge 로직을 *그대로* 돌리되, time.sleep/time.time 대신 VirtualClock 을,
+  snap7 대신 녹화/시뮬레이션 데이터 소스를 주입한다. sleep 은 즉시 시계만 전진시키므로
+  하루치 동작을 수 초 안에 재현할 수 있다.
+
+  - raw 모드: raw_plc_data/{날짜}/{crane}_{HHMMSS}.csv.gz 이벤트를 원래 시각에 다시 재생
+    (PLC 가 그 시각에 보여줬을 값을 sample-and-hold 로 응답). 결과를 crane_kpi_log.csv
+    (운영 기록) 과 crane_id + 시각(±tolerance) 으로 매칭해 duration / damage / peak_shock 비교.
+  - simulate 모드: SimulatedPLCSource 로 N 시간짜리 가상 교대(shift) 를 생성해 실행.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - InfluxDB 쓰기 없음, crane_kpi_log.csv 읽기 전용. 결과는 --out CSV 로만 기록.
+
+사용 예:
+  python scripts/analysis/replay_pipeline.py --date 2026-04-24 --cranes 231,232
+  python scripts/analysis/replay_pipeline.py --date 2026-04-24 --compare deploy_package/crane_kpi_log.csv
+  python scripts/analysis/replay_pipeline.py --simulate-hours 8 --cranes 211,101 --seed 7
+"""
+import argparse
+import bisect
+import contextlib
+import csv
+import gzip
+import glob
+import io
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, '.')
+import crane_edge_logger as logger
+
+RAW_ROOT = "raw_plc_data"
+COMPARE_FIELDS = ['duration', 'reducer_damage', 'peak_shock']
+
+
+class VirtualClock:
+    """Drop-in for logger.RealClock. sleep() advances time instantly."""
+    def __init__(self, start):
+        self.t = float(start)
+
+    def time(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.t += max(0.0, seconds)
+
+    def now(self):
+        return datetime.fromtimestamp(self.t)
+
+
+class RawReplaySource:
+    """
+    Plays recorded raw events back as a PLC would have shown them.
+
+    Idle: order 0 until the next event's recorded start. The first idle poll at or after
+    that start anchors the event (exactly like production, whose sample 0 is the first read
+    after detection). Active: sample-and-hold on the recorded timeline relative to the anchor,
+    so the live loop's own 0.1s cadence decides which samples it sees.
+    """
+    def __init__(self, events, clock, stop, qc=False):
+        self.events = events  # [(start_epoch, samples, t_rel)] sorted
+        self.clock = clock
+        self.stop = stop
+        self.qc = qc
+        self.next_idx = 0
+        self.active = None
+        self.anchor = 0.0
+        self.last = None
+        self.is_connected = False
+
+    def connected(self):
+        return self.is_connected
+
+    def connect(self):
+        self.is_connected = True
+
+    def disconnect(self):
+        self.is_connected = False
+
+    def _current(self):
+        now = self.clock.time()
+        if self.active is not None:
+            samples, t_rel = self.active
+            # 1 ms slack: float error of epoch-sized clock sums must not push a sample one poll late
+            i = bisect.bisect_right(t_rel, now - self.anchor + 1e-3) - 1
+            if i >= len(samples) - 1:
+                self.active = None
+                self.last = samples[-1]
+            return samples[max(0, min(i, len(samples) - 1))]
+        if self.next_idx < len(self.events) and self.events[self.next_idx][0] <= now:
+            _, samples, t_rel = self.events[self.next_idx]
+            self.next_idx += 1
+            self.active = (samples, t_rel)
+            self.anchor = now
+            return samples[0]
+        if self.next_idx >= len(self.events):
+            self.stop.set()
+        return None
+
+    def _idle(self):
+        pos = self.last['position'] if self.last else 0
+        return {'order': 0, 'feedback': 0, 'loaded': False, 'weight': 0, 'position': pos,
+                'reel_speed': 0, 'reel_current': 0, 'reel_torque': 0}
+
+    def _sample(self):
+        return self._current() or self._idle()
+
+    def read_order(self):
+        return self._sample()['order']
+
+    def read_position(self):
+        return self._sample()['position']
+
+    def read_faults(self, start, size):
+        return bytes(size)  # raw events carry no DB59 data
+
+    def read_sample(self):
+        s = self._sample()
+        return (s['order'], s['feedback'], s['loaded'], s['weight'], s['position'],
+                (s['reel_speed'], s['reel_current'], s['reel_torque']))
+
+    def read_qc_speed(self):
+        return self._sample()['reel_speed']
+
+    def read_qc(self):
+        s = self._sample()
+        return s['reel_speed'], s['reel_current'], s['reel_torque']
+
+
+class HarnessSink:
+    """Collects what LiveSink would have written. Never touches CSV_FILE or InfluxDB."""
+    def __init__(self):
+        self.events = []
+        self.faults = []
+        self.snapshots = []
+
+    def event(self, crane_id, kpis, raw, ts):
+        self.events.append((ts, crane_id, kpis))
+
+    def fault(self, crane_id, fault_name, position, ts, snapshot=None):
+        self.faults.append((ts, crane_id, fault_name, position, snapshot))
+
+    def fault_clear(self, crane_id, fault_name, position, ts, active_s):
+        pass
+
+    def snapshot(self, crane_id, path, t_fault, records):
+        self.snapshots.append((crane_id, path, t_fault, len(records)))
+
+
+def load_raw_event(path):
+    """Raw event CSV → (start_epoch, samples, t_rel). Start = file time (event end) - duration."""
+    samples, t_rel = [], []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            samples.append({
+                'dt': float(row['dt']),
+                'order': int(float(row['order'])),
+                'feedback': int(float(row['feedback'])),
+                'loaded': row['loaded'] == '1',
+                'weight': float(row['weight']),
+                'position': float(row['position']),
+                'reel_speed': int(float(row['reel_speed'])),
+                'reel_current': int(float(row['reel_current'])),
+                'reel_torque': int(float(row['reel_torque'])),
+            })
+    if not samples:
+        return None
+    t = 0.0
+    for i, s in enumerate(samples):
+        if i > 0:
+            t += s['dt']
+        t_rel.append(t)
+    date_str = os.path.basename(os.path.dirname(path))
+    time_str = os.path.basename(path).replace('.csv.gz', '').split('_')[1]
+    end = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H%M%S').timestamp()
+    return end - t_rel[-1], samples, t_rel
+
+
+def find_raw_events(date, cranes=None):
+    by_crane = {}
+    for path in sorted(glob.glob(os.path.join(RAW_ROOT, date, '*.csv.gz'))):
+        crane_id = os.path.basename(path).split('_')[0]
+        if cranes and crane_id not in cranes:
+            continue
+        try:
+            ev = load_raw_event(path)
+        except Exception as e:
+            print(f"  [!] skip {path}: {type(e).__name__}: {e}")
+            continue
+        if ev:
+            by_crane.setdefault(crane_id, []).append(ev)
+    for evs in by_crane.values():
+        evs.sort(key=lambda e: e[0])
+    return by_crane
+
+
+def crane_config(crane_id):
+    for c in logger.CRANES:
+        if c['id'] == crane_id:
+            return c
+    return {"id": crane_id, "ip": "replay", "rack": 0, "slot": 2,
+            **({"type": "QC"} if crane_id.startswith("1") else {})}
+
+
+def run_crane(config, clock, source, stop, quiet):
+    sink = HarnessSink()
+    out = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(out):
+        logger.monitor_crane(config, clock=clock, source=source, sink=sink, stop=stop)
+    return sink
+
+
+def load_production(path, date, cranes):
+    """crane_kpi_log.csv rows for one day. Read-only; columns by position (header lacks peak_shock_pos)."""
+    rows = {}
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for r in reader:
+            if len(r) < 13 or not r[0].startswith(date):
+                continue
+            if cranes and r[1] not in cranes:
+                continue
+            if float(r[3] or 0) <= 0:
+                continue  # initialize_influx_kpis heartbeat rows
+            rows.setdefault(r[1], []).append({
+                'ts': datetime.strptime(r[0], '%Y-%m-%d %H:%M:%S').timestamp(),
+                'duration': float(r[3]),
+                'reducer_damage': float(r[8]),
+                'peak_shock': float(r[12]),
+            })
+    return rows
+
+
+def compare(harness, production, tolerance):
+    """Greedy nearest-time matching per crane. Returns (matched, missing, extra, diffs)."""
+    matched = missing = extra = 0
+    diffs = {k: [] for k in COMPARE_FIELDS}
+    for crane_id in sorted(set(harness) | set(production)):
+        prod = sorted(production.get(crane_id, []), key=lambda r: r['ts'])
+        used = [False] * len(prod)
+        times = [r['ts'] for r in prod]
+        for ts, _, kpis in harness.get(crane_id, []):
+            t = ts.timestamp()
+            best = None
+            lo = bisect.bisect_left(times, t - tolerance)
+            for j in range(lo, len(prod)):
+                if times[j] > t + tolerance:
+                    break
+                if not used[j] and (best is None or abs(times[j] - t) < abs(times[best] - t)):
+                    best = j
+            if best is None:
+                extra += 1
+                continue
+            used[best] = True
+            matched += 1
+            for k in COMPARE_FIELDS:
+                diffs[k].append(abs(float(kpis[k]) - prod[best][k]))
+        missing += used.count(False)
+    return matched, missing, extra, diffs
+
+
+def write_out(path, results):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'crane_id', 'algo_version', 'event_duration_s',
+                         'reducer_damage', 'is_loaded', 'shock_penalty', 'peak_shock',
+                         'curr_penalty', 'track_penalty', 'start_pos', 'end_pos'])
+        for ts, crane_id, k in sorted((e for sink in results.values() for e in sink.events),
+                                      key=lambda e: e[0]):
+            writer.writerow([ts.strftime('%Y-%m-%d %H:%M:%S'), crane_id, k['algo_version'],
+                             k['duration'], k['reducer_damage'], 1 if k['is_loaded'] else 0,
+                             k['shock_penalty'], k['peak_shock'], k['curr_penalty'],
+                             k['track_penalty'], k['start_pos'], k['end_pos']])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the live acquisition state machine offline under a virtual clock",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--date', help='YYYY-MM-DD of raw_plc_data to replay')
+    parser.add_argument('--simulate-hours', type=float, default=None,
+                        help='Instead of raw data, simulate a shift of this many hours')
+    parser.add_argument('--cranes', default=None, help='Comma-separated crane IDs (default: all with data)')
+    parser.add_argument('--seed', type=int, default=0, help='Simulation seed (default 0)')
+    parser.add_argument('--compare', default=None,
+                        help='Production KPI CSV to compare against (e.g. crane_kpi_log.csv)')
+    parser.add_argument('--tolerance', type=float, default=3.0,
+                        help='Seconds allowed between replayed and production event timestamps')
+    parser.add_argument('--out', default=None, help='Write replayed events to this CSV')
+    parser.add_argument('--verbose', action='store_true', help='Show the logger console output')
+    args = parser.parse_args()
+
+    if not args.date and args.simulate_hours is None:
+        parser.error('--date or --simulate-hours is required')
+    cranes = set(args.cranes.split(',')) if args.cranes else None
+
+    results = {}
+    virtual_s = 0.0
+    t_wall = time.perf_counter()
+
+    if args.simulate_hours is not None:
+        start = datetime.strptime(args.date, '%Y-%m-%d').timestamp() if args.date else 0.0
+        ids = sorted(cranes) if cranes else [c['id'] for c in logger.CRANES]
+        for i, crane_id in enumerate(ids):
+            config = crane_config(crane_id)
+            clock = VirtualClock(start)
+            stop = threading.Event()
+            source = logger.SimulatedPLCSource(crane_id, clock, seed=args.seed * 1000 + i,
+                                               qc=config.get('type') == 'QC',
+                                               until=start + args.simulate_hours * 3600, stop=stop)
+            results[crane_id] = run_crane(config, clock, source, stop, not args.verbose)
+            virtual_s += clock.time() - start
+    else:
+        by_crane = find_raw_events(args.date, cranes)
+        print(f"Found raw events for {len(by_crane)} crane(s) on {args.date}.")
+        for crane_id, events in sorted(by_crane.items()):
+            config = crane_config(crane_id)
+            clock = VirtualClock(events[0][0] - 1.0)
+            stop = threading.Event()
+            source = RawReplaySource(events, clock, stop, qc=config.get('type') == 'QC')
+            t0 = clock.time()
+            results[crane_id] = run_crane(config, clock, source, stop, not args.verbose)
+            virtual_s += clock.time() - t0
+
+    wall = time.perf_counter() - t_wall
+    n_events = sum(len(s.events) for s in results.values())
+    n_faults = sum(len(s.faults) for s in results.values())
+
+    print("=" * 72)
+    print(f"Replayed {len(results)} crane(s): {n_events} events, {n_faults} fault edges")
+    print(f"  virtual time : {virtual_s / 3600:.2f} crane-hours")
+    print(f"  wall time    : {wall:.2f}s  ({virtual_s / max(wall, 1e-9):,.0f}x real time)")
+    for crane_id, sink in sorted(results.items()):
+        dmg = sum(k['reducer_damage'] for _, _, k in sink.events)
+        print(f"    {crane_id}: events={len(sink.events):>4d}  faults={len(sink.faults):>3d}  "
+              f"snapshots={len(sink.snapshots):>3d}  damage={dmg:>10.2f}")
+
+    if args.compare and args.date:
+        production = load_production(args.compare, args.date, cranes)
+        harness = {}
+        for sink in results.values():
+            for e in sink.events:
+                harness.setdefault(e[1], []).append(e)
+        matched, missing, extra, diffs = compare(harness, production, args.tolerance)
+        print(f"\nvs {args.compare} (±{args.tolerance}s):")
+        print(f"  matched={matched}  missing_in_replay={missing}  extra_in_replay={extra}")
+        for k, d in diffs.items():
+            if d:
+                d.sort()
+                print(f"  |Δ{k}|: mean={sum(d) / len(d):.3f}  p95={d[int(0.95 * (len(d) - 1))]:.3f}  max={d[-1]:.3f}")
+
+    if args.out:
+        write_out(args.out, results)
+        print(f"\n(replayed events written to {args.out})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+spectral_features.py — raw_plc_data 이벤트의 릴 속도·전류·토크 스펙트럼 특징 일괄 추출 + 처리량 측정
+
+crane_edge_logger.py 는 SPECTRAL_BANDS_HZ 가 켜져 있으면 이벤트마다 spectral_features() 로 신호별
+AC rms / 주 주파수 / 대역별 파워 비율을 계산해 crane_movement 에 sp_<신호>_<특징> 필드로 기록한다
+(라이브는 이벤트 1건씩). 이 도구는 과거 이벤트를 같은 함수로 --batch 건씩 묶어 (FFT 1회) 계산한다.
+
+  extract : 날짜 범위의 raw 이벤트 → CSV (date, time, crane_id, 특징...). raw_plc_data/ + ../backups/raw_plc_data/.
+            읽기(gzip CSV 파싱) / 계산 시간을 나눠 출력한다 — 수개월 재처리 시간 추정용.
+  bench   : 합성 이벤트로 배치 크기별 (1 = 라이브와 동일) 이벤트당 비용, calculate_kpis 대비 비율.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - PLC / InfluxDB / crane_kpi_log.csv 미사용. raw 파일은 읽기만 하고 결과는 --out CSV 로만 기록.
+
+사용 예:
+  python scripts/analysis/spectral_features.py bench
+  python scripts/analysis/spectral_features.py extract --start 2026-09-01 --stop 2026-10-01 --out spectral_sep.csv
+"""
+import argparse
+import csv
+import gzip
+import math
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+RAW_DIRS = [os.path.join(ROOT, logger.RAW_DATA_DIR),
+            os.path.join(ROOT, '..', 'backups', 'raw_plc_data')]  # cleanup_old_raw_data() moves days here
+
+
+def feature_names():
+    return list(logger.spectral_dict(np.zeros(len(logger.SPECTRAL_SIGNALS)), np.zeros(len(logger.SPECTRAL_SIGNALS)),
+                                     np.zeros((len(logger.SPECTRAL_SIGNALS), len(logger.SPECTRAL_BANDS_HZ)))))
+
+
+def raw_files(start, stop):
+    """(day, crane_id, HHMMSS, path) for start <= day < stop, each event once."""
+    seen = set()
+    for base in RAW_DIRS:
+        if not os.path.isdir(base):
+            continue
+        for entry in sorted(os.listdir(base)):
+            try:
+                day = date.fromisoformat(entry)
+            except ValueError:
+                continue
+            if not start <= day < stop:
+                continue
+            for name in sorted(os.listdir(os.path.join(base, entry))):
+                if not name.endswith('.csv.gz') or (entry, name) in seen:  # faults/ is a directory
+                    continue
+                seen.add((entry, name))
+                crane_id, hms = name[:-len('.csv.gz')].split('_')[:2]
+                yield entry, crane_id, hms, os.path.join(base, entry, name)
+
+
+def load_signals(path):
+    """(dt_list, [(reel_speed, reel_current, reel_torque), ...]) of a raw event (save_raw_event columns)."""
+    dt_list, samples = [], []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            dt_list.append(float(row['dt']))
+            samples.append((float(row['reel_speed']), float(row['reel_current']), float(row['reel_torque'])))
+    return dt_list, samples
+
+
+def extract(args):
+    names = feature_names()
+    t_read = t_calc = 0.0
+    n_events = n_samples = 0
+    with open(args.out, 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(['date', 'time', 'crane_id'] + names)
+        batch, keys = [], []
+
+        def run_batch():
+            nonlocal t_calc
+            t0 = time.perf_counter()
+            rms, peak_hz, shares = logger.spectral_features(batch)
+            t_calc += time.perf_counter() - t0
+            for k, key in enumerate(keys):
+                writer.writerow(list(key) + list(logger.spectral_dict(rms[k], peak_hz[k], shares[k]).values()))
+            batch.clear()
+            keys.clear()
+
+        for day, crane_id, hms, path in raw_files(args.start, args.stop):
+            t0 = time.perf_counter()
+            try:
+                event = load_signals(path)
+            except (OSError, ValueError, KeyError, EOFError) as e:
+                print(f"  [!] skip {path}: {type(e).__name__}: {e}")
+                continue
+            t_read += time.perf_counter() - t0
+            if not event[1]:
+                continue
+            batch.append(event)
+            keys.append((day, f"{hms[:2]}:{hms[2:4]}:{hms[4:]}", crane_id))
+            n_events += 1
+            n_samples += len(event[1])
+            if len(batch) >= args.batch:
+                run_batch()
+        if batch:
+            run_batch()
+    if not n_events:
+        sys.exit(f"no raw events in [{args.start}, {args.stop})")
+    print(f"{n_events} events ({n_samples / n_events:.0f} samples/event) -> {args.out}, {len(names)} features")
+    print(f"  read {t_read:.1f}s ({t_read / n_events * 1e6:.0f}us/event), features {t_calc:.1f}s "
+          f"({t_calc / n_events * 1e6:.0f}us/event, batch {args.batch}), "
+          f"{n_events / (t_read + t_calc):.0f} events/s overall")
+
+
+def synthetic_events(n_events, seed=7):
+    """(dt_list, samples) ARMGC-like: jittered 10 Hz, torque ramps, noise, some with gear-mesh-like ripple."""
+    rng = random.Random(seed)
+    for _ in range(n_events):
+        n = rng.randint(40, 1200)
+        ripple_hz = rng.uniform(0.5, 4.5) if rng.random() < 0.2 else 0.0
+        dt_list, samples, t = [], [], 0.0
+        for i in range(n):
+            dt = logger.ACTIVE_POLL_RATE * rng.uniform(0.8, 1.3)
+            t += dt
+            ramp = min(1.0, i / 30, (n - 1 - i) / 30)
+            torque = 25.0 + 30.0 * (i < 30) - 30.0 * (i > n - 30) + rng.gauss(0, 2.0) \
+                + 8.0 * math.sin(2 * math.pi * ripple_hz * t)
+            dt_list.append(dt)
+            samples.append((3000.0 * ramp, 20.0 + 0.5 * abs(torque), torque))
+        yield dt_list, samples
+
+
+def bench(args):
+    events = list(synthetic_events(args.events))
+    print(f"{len(events)} synthetic events, {sum(len(s) for _, s in events) / len(events):.0f} samples/event")
+    for size in args.sizes:
+        t0 = time.perf_counter()
+        for i in range(0, len(events), size):
+            logger.spectral_features(events[i:i + size])
+        cost = (time.perf_counter() - t0) / len(events)
+        print(f"  batch {size:>5}: {cost * 1e6:8.1f}us/event  {1.0 / cost:9.0f} events/s")
+    logger.SPECTRAL_BANDS_HZ, bands = None, logger.SPECTRAL_BANDS_HZ
+    logger.RAINFLOW_DB = None
+    sample = events[:min(len(events), 300)]
+    args_kpis = [([int(x[0]) for x in s], [int(x[0] * 0.98) for x in s], [True] * len(s), [20.0] * len(s),
+                  list(range(len(s))), d, [tuple(int(v) for v in x) for x in s]) for d, s in sample]
+    t0 = time.perf_counter()
+    for a in args_kpis:
+        logger.calculate_kpis(*a)
+    base = (time.perf_counter() - t0) / len(sample)
+    logger.SPECTRAL_BANDS_HZ = bands
+    t0 = time.perf_counter()
+    for d, s in sample:
+        logger.spectral_kpis(d, s)
+    live = (time.perf_counter() - t0) / len(sample)
+    print(f"  live (spectral_kpis, 1 event): {live * 1e6:.0f}us = {live / base * 100:.0f}% of calculate_kpis "
+          f"({base * 1e6:.0f}us)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Batched spectral features of reel speed / current / torque: raw extraction and throughput",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('extract', help='Features of raw events in a date range to CSV')
+    p.add_argument('--start', type=date.fromisoformat, default=date.min, help='First day (YYYY-MM-DD)')
+    p.add_argument('--stop', type=date.fromisoformat, default=date.today(), help='Day after the last one')
+    p.add_argument('--batch', type=int, default=64, help='Events per spectral_features() call')
+    p.add_argument('--out', default='spectral_features.csv')
+    p = sub.add_parser('bench', help='Per-event cost by batch size (synthetic events)')
+    p.add_argument('--events', type=int, default=2000)
+    p.add_argument('--sizes', type=lambda s: [int(v) for v in s.split(',')], default=[1, 16, 128, 1024])
+    args = parser.parse_args()
+    if args.cmd == 'extract':
+        extract(args)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+backfill_rail_cube.py — raw_plc_data 원본 이벤트로 레일 구간 손상도 큐브(rail_cube) 과거분 채우기
+
+crane_edge_logger.py 의 RailCube 는 V3.x 부터 ARMGC 이벤트의 모든 샘플 손상도·충격을 RAIL_BIN_M (10 m)
+위치 구간으로 나눠 rail_cube.sqlite 에 (호기 × 일 × 구간 × 적재/공차) 로 누적하고, 일 합계를 rail_cube
+측정값으로 InfluxDB 에 쓴다. 이 도구는 그 이전 날짜를 raw 원본 CSV 로 다시 계산한다.
+
+  backfill : 날짜별 raw_plc_data/{날짜}/2xx_*.csv.gz → calculate_kpis 의 rail_bins (로거와 같은 코드) →
+             그 날짜의 이 노드 셀을 통째로 교체 → 일 합계 포인트 기록 (같은 시리즈·자정 타임스탬프라
+             덮어쓴다). 날짜 단위 교체이므로 중단 후 재실행해도 두 번 더해지지 않는다.
+  찾는 위치: raw_plc_data/ (최근 RAW_RETENTION_DAYS 일) + ../backups/raw_plc_data/ (그 이전).
+
+  순서: backfill → rail_anomalies.py scan (이상 구간 상태를 채운 이력으로 다시 계산)
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - 원본 raw 파일은 읽기만 한다. --dry-run 으로 날짜별 이벤트/셀 수를 먼저 확인한다.
+  - 기본 범위는 어제까지. 오늘은 실행 중인 로거가 누적하고 있으므로 교체하지 않는다.
+  - 로거와 같은 노드(PC)에서 실행한다 (노드 태그 = CRANEPDM_NODE 또는 호스트명).
+  - 날짜별 이벤트·교체한 셀 수와 옵션은 replay_log.txt 에 추가 기록한다 (Audit Trail).
+
+사용 예:
+  python scripts/maintenance/backfill_rail_cube.py backfill --dry-run
+  python scripts/maintenance/backfill_rail_cube.py backfill
+  python scripts/maintenance/backfill_rail_cube.py backfill --start 2026-08-01 --stop 2026-09-01
+"""
+import argparse
+import csv
+import glob
+import gzip
+import os
+import sys
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+RAW_DIRS = [os.path.join(ROOT, logger.RAW_DATA_DIR),
+            os.path.join(ROOT, '..', 'backups', 'raw_plc_data')]  # cleanup_old_raw_data() moves days here
+LOG_FILE = os.path.join(ROOT, "replay_log.txt")
+
+
+def audit(line):
+    """Append one line to LOG_FILE (AI_GUIDE.md Audit Trail)."""
+    with open(LOG_FILE, 'a', encoding='utf-8') as logf:
+        logf.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] rail_cube backfill {line}\n")
+
+
+def load_event(path):
+    """Raw event CSV → calculate_kpis arguments (same columns as save_raw_event)."""
+    cols = ([], [], [], [], [], [], [])
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            cols[0].append(int(float(row['order'])))
+            cols[1].append(int(float(row['feedback'])))
+            cols[2].append(row['loaded'] == '1')
+            cols[3].append(float(row['weight']))
+            cols[4].append(int(float(row['position'])))
+            cols[5].append(float(row['dt']))
+            cols[6].append((int(float(row['reel_speed'])), int(float(row['reel_current'])),
+                            int(float(row['reel_torque']))))
+    return cols
+
+
+def day_dirs(start, stop):
+    """{date: [dir, ...]} for start <= date < stop over RAW_DIRS."""
+    days = {}
+    for base in RAW_DIRS:
+        if not os.path.isdir(base):
+            continue
+        for entry in os.listdir(base):
+            try:
+                day = date.fromisoformat(entry)
+            except ValueError:
+                continue
+            if start <= day < stop:
+                days.setdefault(day, []).append(os.path.join(base, entry))
+    return dict(sorted(days.items()))
+
+
+def day_cells(dirs):
+    """Rail cube cells of one day, keyed like RailCube.pending. Returns (cells, events, skipped)."""
+    cells, events, skipped, seen = {}, 0, 0, set()
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, '2*.csv.gz'))):  # ARMGC only (QC has no gantry position)
+            name = os.path.basename(path)
+            if name in seen:  # same day in raw_plc_data and backups
+                continue
+            seen.add(name)
+            crane_id, hms = name[:-len('.csv.gz')].split('_')[:2]
+            try:
+                kpis = logger.calculate_kpis(*load_event(path))
+            except (OSError, ValueError, KeyError, EOFError) as e:
+                print(f"  [!] skip {path}: {type(e).__name__}: {e}")
+                kpis = None
+            if kpis is None:
+                skipped += 1
+                continue
+            events += 1
+            ts = datetime.strptime(f"{os.path.basename(d)} {hms}", '%Y-%m-%d %H%M%S')
+            cube = logger.RailCube()
+            cube.add(crane_id, kpis, ts)
+            for key, cell in cube.pending.items():
+                old = cells.get(key)
+                cells[key] = cell if old is None else [old[0] + cell[0], old[1] + cell[1],
+                                                       max(old[2], cell[2]), old[3] + cell[3]]
+    return cells, events, skipped
+
+
+def backfill(start, stop, dry_run):
+    days = day_dirs(start, stop)
+    print(f"{len(days)} days with raw data in [{start}, {stop})  (bin {logger.RAIL_BIN_M} m, node {logger.NODE_ID})")
+    cube = logger.RAIL_CUBE
+    if not dry_run:
+        cube.open(os.path.join(ROOT, logger.RAIL_CUBE_DB))
+    total = 0
+    for day, dirs in days.items():
+        cells, events, skipped = day_cells(dirs)
+        print(f"  {day}: {events} events ({skipped} without DB170), {len(cells)} cells")
+        total += len(cells)
+        replaced = 0
+        if not dry_run and cells:
+            cube.db.execute("BEGIN IMMEDIATE")
+            replaced = cube.db.execute("DELETE FROM cells WHERE day = ?", (day.isoformat(),)).rowcount
+            cube.db.execute("COMMIT")
+            totals = cube.merge(cells)
+            logger.write_api.write(bucket=logger.INFLUX_BUCKET, org=logger.INFLUX_ORG, record=cube.points(totals))
+        audit(f"{day} node={logger.NODE_ID}: events={events} skipped={skipped} cells={len(cells)} "
+              f"replaced={replaced} dry_run={int(dry_run)}")
+    logger.write_api.close()  # batched writer: flush before exit
+    audit(f"[{start}, {stop}) total: days={len(days)} cells={total} dry_run={int(dry_run)}")
+    print(f"{'would write' if dry_run else 'wrote'} {total} cells")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild rail_cube days from raw_plc_data event files",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('backfill', help='Replace rail cube days from the raw event archive')
+    p.add_argument('--start', type=date.fromisoformat, default=date.min, help='First day (YYYY-MM-DD)')
+    p.add_argument('--stop', type=date.fromisoformat, default=date.today(),
+                   help='Day after the last one (default: today, i.e. up to yesterday)')
+    p.add_argument('--dry-run', action='store_true', help='Count events and cells only')
+    args = parser.parse_args()
+    if args.cmd == 'backfill':
+        backfill(args.start, args.stop, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
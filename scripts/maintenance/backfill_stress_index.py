@@ -0,0 +1,207 @@
+"""
+backfill_stress_index.py — 과거 crane_movement 포인트에 stress_index 필드 추가 + 대시보드 단일 필드 전환
+
+crane_edge_logger.py 의 log_event 는 V3.x 부터 stress_index (= shock_penalty × curr_penalty ×
+track_penalty, QC 는 load_factor) 를 함께 기록한다. 이 도구는 그 이전 포인트에 같은 값을 채운다.
+
+  backfill   : 일 단위로 필요한 필드만 스트리밍 조회 (메모리 일정) → 같은 시리즈(전체 태그)·같은
+               나노초 타임스탬프에 stress_index 한 필드만 쓴다. 다른 필드는 건드리지 않으며,
+               이미 같은 값이 있는 포인트는 건너뛰므로 중단 후 재실행해도 안전하다.
+  dashboards : grafana/dashboards/*.json 쿼리의 pivot + map 곱셈을 stress_index 필드 필터로 교체.
+
+  계산 규칙 (대시보드와 동일):
+    ARMGC (crane_id 2xx) : shock × curr × track_penalty        (셋 중 하나라도 없으면 건너뜀)
+    QC                   : shock × curr × (load_factor → track_penalty → 1.0)
+
+  순서: backfill → dashboards → push_dashboard.py → deploy_rollups.py backfill (롤업 재계산)
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - 삭제 없음. 추가 필드 쓰기만 한다. --dry-run 으로 대상 건수를 먼저 확인한다.
+  - backfill 의 일별 건수와 옵션은 replay_log.txt 에 추가 기록한다 (Audit Trail).
+
+사용 예:
+  python scripts/maintenance/backfill_stress_index.py backfill --dry-run
+  python scripts/maintenance/backfill_stress_index.py backfill
+  python scripts/maintenance/backfill_stress_index.py backfill --start 2026-05-01 --stop 2026-05-08
+  python scripts/maintenance/backfill_stress_index.py dashboards
+"""
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+# Must match crane_edge_logger.py / docker-compose.yml
+# (CRANEPDM_INFLUX_URL=http://localhost:8087 goes through the logger's query cache, QUERY_CACHE_PORT)
+INFLUX_URL = os.environ.get("CRANEPDM_INFLUX_URL", "http://localhost:8086")
+INFLUX_TOKEN = "my-super-secret-auth-token"
+INFLUX_ORG = "myorg"
+INFLUX_BUCKET = "cranepdm_kpis"
+
+FIELDS = ['shock_penalty', 'curr_penalty', 'track_penalty', 'load_factor', 'stress_index']
+NOT_TAGS = {'result', 'table', '_start', '_stop', '_time', '_measurement', 'ns'}
+BATCH_SIZE = 5000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOG_FILE = os.path.join(ROOT, "replay_log.txt")
+DASHBOARDS = [os.path.join(ROOT, 'grafana', 'dashboards', name)
+              for name in ('crane_pdm.json', 'qc_spreader_pdm.json')]
+
+# `_field` filter for the penalty fields, the pivot, and the map() lines ending in the product
+PRODUCT = re.compile(
+    r'  \|> filter\(fn: \(r\) => r\["_field"\] == "shock_penalty"[^\n]*\n'
+    r'  \|> pivot\([^\n]*\n'
+    r'(?:  \|> (?:filter|map)\(fn: \(r\) => (?:exists |\(\{ r with load_val)[^\n]*\n)*'
+    r'  \|> map\(fn: \(r\) => \(\{ r with _value: r\.shock_penalty \* [^\n]*\n')
+SINGLE_FIELD = '  |> filter(fn: (r) => r["_field"] == "stress_index")\n'
+
+
+def stress_of(row):
+    """Stress Index for one pivoted crane_movement row, or None if the dashboards would skip it."""
+    shock, curr = row.get('shock_penalty'), row.get('curr_penalty')
+    if shock is None or curr is None:
+        return None
+    if str(row.get('crane_id', '')).startswith('2'):
+        track = row.get('track_penalty')
+        return None if track is None else shock * curr * track
+    load = row.get('load_factor')
+    if load is None:
+        load = row.get('track_penalty')
+    return shock * curr * (1.0 if load is None else load)
+
+
+def chunk_query(start, stop):
+    fields = " or ".join(f'r["_field"] == "{f}"' for f in FIELDS)
+    return f'''from(bucket: "{INFLUX_BUCKET}")
+  |> range(start: {start:%Y-%m-%dT%H:%M:%SZ}, stop: {stop:%Y-%m-%dT%H:%M:%SZ})
+  |> filter(fn: (r) => r["_measurement"] == "crane_movement")
+  |> filter(fn: (r) => {fields})
+  |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")
+  |> map(fn: (r) => ({{r with ns: int(v: r._time)}}))'''
+
+
+def audit(line):
+    """Append one line to LOG_FILE (AI_GUIDE.md Audit Trail)."""
+    with open(LOG_FILE, 'a', encoding='utf-8') as logf:
+        logf.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] stress_index backfill {line}\n")
+
+
+def first_point(query_api):
+    tables = query_api.query(f'''from(bucket: "{INFLUX_BUCKET}")
+  |> range(start: 0)
+  |> filter(fn: (r) => r["_measurement"] == "crane_movement" and r["_field"] == "shock_penalty")
+  |> first()
+  |> keep(columns: ["_time"])
+  |> group()
+  |> sort(columns: ["_time"])
+  |> limit(n: 1)''')
+    records = [rec for table in tables for rec in table.records]
+    return records[0].get_time() if records else None
+
+
+def backfill(start, stop, dry_run, force):
+    from influxdb_client import InfluxDBClient, Point, WritePrecision
+    from influxdb_client.client.write_api import SYNCHRONOUS
+
+    with InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG, timeout=600_000) as client:
+        query_api = client.query_api()
+        write_api = client.write_api(write_options=SYNCHRONOUS)
+        if start is None:
+            start = first_point(query_api)
+            if start is None:
+                print("No crane_movement points.")
+                return
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        totals = {'points': 0, 'written': 0, 'current': 0, 'skipped': 0}
+        flags = f"dry_run={int(dry_run)} force={int(force)}"
+        t_run = time.time()
+        print(f"{INFLUX_BUCKET}/crane_movement {day:%Y-%m-%d} .. {stop:%Y-%m-%d %H:%M}"
+              f"{' (dry run)' if dry_run else ''}")
+        while day < stop:
+            end = min(day + timedelta(days=1), stop)
+            counts = dict.fromkeys(totals, 0)
+            batch = []
+            t0 = time.time()
+            for rec in query_api.query_stream(chunk_query(day, end)):
+                row = rec.values
+                counts['points'] += 1
+                value = stress_of(row)
+                if value is None:
+                    counts['skipped'] += 1
+                    continue
+                if not force and row.get('stress_index') is not None and abs(row['stress_index'] - value) < 1e-9:
+                    counts['current'] += 1
+                    continue
+                counts['written'] += 1
+                if dry_run:
+                    continue
+                point = Point("crane_movement").field("stress_index", float(value)).time(row['ns'], WritePrecision.NS)
+                for key, tag in row.items():
+                    if key not in NOT_TAGS and key not in FIELDS and tag is not None:
+                        point.tag(key, tag)
+                batch.append(point)
+                if len(batch) >= BATCH_SIZE:
+                    write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=batch)
+                    batch = []
+            if batch:
+                write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=batch)
+            for key in totals:
+                totals[key] += counts[key]
+            if counts['points']:
+                print(f"  {day:%Y-%m-%d}: {counts['points']:>6} points | written {counts['written']:>6} "
+                      f"| already set {counts['current']:>6} | no penalties {counts['skipped']:>4} "
+                      f"| {time.time() - t0:.1f}s")
+                audit(f"{day:%Y-%m-%d %H:%M}..{end:%Y-%m-%d %H:%M}: points={counts['points']} "
+                      f"written={counts['written']} current={counts['current']} skipped={counts['skipped']} {flags}")
+            day = end
+        audit(f"{start:%Y-%m-%d %H:%M}..{stop:%Y-%m-%d %H:%M} total: points={totals['points']} "
+              f"written={totals['written']} current={totals['current']} skipped={totals['skipped']} {flags}")
+        print(f"Total: {totals['points']} points, {totals['written']} "
+              f"{'to write' if dry_run else 'written'}, {totals['current']} already set, "
+              f"{totals['skipped']} without penalties | {time.time() - t_run:.0f}s")
+
+
+def rewrite_dashboards():
+    """pivot + map Stress Index in every dashboard query -> filter on the stress_index field."""
+    for path in DASHBOARDS:
+        with open(path, encoding='utf-8') as f:
+            dash = json.load(f)
+        for panel in dash['panels']:
+            for target in panel.get('targets', []):
+                query, n = PRODUCT.subn(SINGLE_FIELD, target.get('query', ''))
+                if n:
+                    target['query'] = query
+                    print(f"[{os.path.basename(path)}] panel {panel['id']} {target.get('refId')}: "
+                          f"{panel.get('title')}")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dash, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+
+def parse_day(text):
+    return datetime.strptime(text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add the stress_index field to historical crane_movement points",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_back = sub.add_parser('backfill', help='Write stress_index for past points (day by day, streamed)')
+    p_back.add_argument('--start', type=parse_day, default=None, help='YYYY-MM-DD (default: first point)')
+    p_back.add_argument('--stop', type=parse_day, default=None, help='YYYY-MM-DD, exclusive (default: now)')
+    p_back.add_argument('--dry-run', action='store_true', help='Count only, write nothing')
+    p_back.add_argument('--force', action='store_true', help='Rewrite points that already have the same value')
+    sub.add_parser('dashboards', help='Switch grafana/dashboards/*.json queries to the stress_index field')
+    args = parser.parse_args()
+
+    if args.cmd == 'backfill':
+        backfill(args.start, args.stop or datetime.now(timezone.utc), args.dry_run, args.force)
+    else:
+        rewrite_dashboards()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+damage_ledger.py — 감속기 누적 손상도 대장(damage_ledger.sqlite) 조회 / 정비 리셋 / 재계산 / 수명 보정
+
+crane_edge_logger.py 의 DamageLedger 는 이벤트마다 reducer_damage 를 호기 부품(ARMGC CableReel,
+QC SpreaderCable)의 현재 장착분(part)에 일 합계로 누적한다. 로거는 LEDGER_FLUSH_S 마다 DB 를 다시 읽으므로
+이 도구로 바꾼 내용(리셋·재계산)은 실행 중인 로거에도 1 분 안에 반영된다.
+
+  status    : 부품별 현재 누적 손상도, 수명 소진율(LEDGER_LIFE 대비), 일 손상률(최근 LEDGER_RATE_D 일 / 7 일),
+              예상 잔여 일수·교체 시점 (p90 일 손상률 기준 비관치 포함). 잔여 일수가 짧은 순.
+  reset     : 교체/정비 기록. 새 part 를 --at 시각으로 등록하고, 그 다음 날부터의 일 합계를 새 part 로 옮긴다
+              (교체 당일분은 이전 part 에 남는다 — 정확히 나누려면 rebuild 로 그 날짜를 다시 계산).
+              --reason failure (고장 교체) 만 calibrate 의 수명 표본이 된다.
+  rebuild   : 알고리즘 변경 후 이력 재계산. 범위 안의 일 합계를 지우고 다시 채운다 (part 는 이벤트 시각으로 배정).
+                --source csv : crane_kpi_log.csv 의 reducer_damage 그대로 (기록 당시 알고리즘)
+                --source raw : raw_plc_data (+ ../backups) 원본을 현재 calculate_kpis / calculate_kpis_qc 로 재채점
+                               (로거와 같은 최소 시간 필터: ARMGC > 3.0 s, QC > 1.5 s)
+  calibrate : failure 로 교체된 part 들의 교체 시점 누적 손상도 중앙값 → LEDGER_LIFE 제안값.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - crane_kpi_log.csv / raw 파일은 읽기만 한다. 바뀌는 것은 damage_ledger.sqlite 뿐이다.
+  - rebuild 는 --dry-run 으로 이벤트 수와 합계를 먼저 확인한다. 기본 범위는 어제까지
+    (오늘은 실행 중인 로거가 누적하고 있으므로 교체하지 않는다).
+  - reset 은 현장 정비 기록(작업지시서)의 교체 시각으로 입력한다. 잘못 넣은 리셋은 sqlite 에서 parts 행을
+    지우고 rebuild 로 되돌린다.
+  - reset / rebuild 는 replay_log.txt 에 추가 기록한다 (Audit Trail): 리셋은 호기·부품·시각·사유,
+    재계산은 범위·소스·교체한 행 수.
+
+사용 예:
+  python scripts/maintenance/damage_ledger.py status
+  python scripts/maintenance/damage_ledger.py reset 215 --at "2026-10-12 14:30" --reason failure --note "WO-4471 릴 감속기"
+  python scripts/maintenance/damage_ledger.py rebuild --source raw --start 2026-09-01 --dry-run
+  python scripts/maintenance/damage_ledger.py rebuild --source csv
+  python scripts/maintenance/damage_ledger.py calibrate
+"""
+import argparse
+import csv
+import glob
+import gzip
+import os
+import statistics
+import sys
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+RAW_DIRS = [os.path.join(ROOT, logger.RAW_DATA_DIR),
+            os.path.join(ROOT, '..', 'backups', 'raw_plc_data')]  # cleanup_old_raw_data() moves days here
+LOG_FILE = os.path.join(ROOT, "replay_log.txt")
+
+
+def audit(line):
+    """Append one line to LOG_FILE (AI_GUIDE.md Audit Trail)."""
+    with open(LOG_FILE, 'a', encoding='utf-8') as logf:
+        logf.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] damage_ledger {line}\n")
+
+
+def status(ledger):
+    rows = ledger.projection()
+    print(f"{'crane':>5} {'component':>13} {'part':>4} {'installed':>16} {'damage':>12} {'used':>6} "
+          f"{'rate/d':>10} {'7d/d':>10} {'days left':>9} {'p90':>7} {'end of life':>11}")
+    for r in rows:
+        used = f"{r['consumed'] * 100:.1f}%" if r['consumed'] is not None else '-'
+        print(f"{r['crane_id']:>5} {r['component']:>13} {r['part']:>4} {(r['installed'] or '-')[:16]:>16} "
+              f"{r['damage']:>12.0f} {used:>6} {r['rate_per_day']:>10.0f} {r['rate_7d']:>10.0f} "
+              f"{r['days_left'] if r['days_left'] is not None else '-':>9} "
+              f"{r['days_left_p90'] if r['days_left_p90'] is not None else '-':>7} {r['end_of_life'] or '-':>11}")
+    print(f"{len(rows)} components, life {logger.LEDGER_LIFE}, rates over {logger.LEDGER_RATE_D} days")
+
+
+def reset(ledger, crane_id, at, reason, note):
+    component = logger.component_of(crane_id)
+    stamp = at.isoformat(sep=' ', timespec='seconds')
+    part, installed = ledger.parts.get((crane_id, component), [(1, None)])[-1]
+    if installed is not None and installed >= stamp:
+        sys.exit(f"part {part} of {crane_id} {component} was installed at {installed}; reset must be later")
+    db = ledger.db
+    db.execute("BEGIN IMMEDIATE")
+    new = db.execute("SELECT coalesce(max(part), 1) + 1 FROM parts WHERE crane_id = ? AND component = ?",
+                     (crane_id, component)).fetchone()[0]
+    if new == 2:  # first reset: record the part the ledger started with
+        db.execute("INSERT OR IGNORE INTO parts VALUES (?, ?, 1, NULL, NULL, NULL)", (crane_id, component))
+    db.execute("INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?)", (crane_id, component, new, stamp, reason, note))
+    moved = db.execute("UPDATE daily SET part = ? WHERE crane_id = ? AND component = ? AND part = ? AND day > ?",
+                       (new, crane_id, component, part, at.date().isoformat())).rowcount
+    removed = db.execute("SELECT sum(damage), sum(events) FROM daily WHERE crane_id = ? AND component = ? "
+                         "AND part = ?", (crane_id, component, part)).fetchone()
+    db.execute("COMMIT")
+    audit(f"reset {crane_id} {component}: part {part} -> {new} at {stamp} reason={reason} "
+          f"damage={removed[0] or 0:.0f} events={removed[1] or 0} moved_days={moved} note={note!r}")
+    print(f"{crane_id} {component}: part {part} removed at {stamp} ({reason}) with damage {removed[0] or 0:.0f} "
+          f"over {removed[1] or 0} events; part {new} installed, {moved} later days moved to it")
+
+
+def csv_events(start, stop):
+    """(crane_id, ts, reducer_damage) from crane_kpi_log.csv, as logged (without heartbeat rows)."""
+    with open(os.path.join(ROOT, logger.CSV_FILE), newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            try:
+                ts = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+                damage = float(row[8])
+                if float(row[3] or 0) <= 0:  # initialize_influx_kpis() heartbeat row written at each cold start
+                    continue
+            except (IndexError, ValueError):
+                continue
+            if start <= ts.date() < stop:
+                yield row[1], ts, damage
+
+
+def load_event(path):
+    """Raw event CSV → (calculate_kpis / calculate_kpis_qc arguments, pre-trigger rows) (save_raw_event columns)."""
+    cols, pre = ([], [], [], [], [], [], []), 0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            pre += row.get('pre') == '1'  # files from before pre-trigger have no 'pre' column
+            cols[0].append(int(float(row['order'])))
+            cols[1].append(int(float(row['feedback'])))
+            cols[2].append(row['loaded'] == '1')
+            cols[3].append(float(row['weight']))
+            cols[4].append(int(float(row['position'])))
+            cols[5].append(float(row['dt']))
+            cols[6].append((int(float(row['reel_speed'])), int(float(row['reel_current'])),
+                            int(float(row['reel_torque']))))
+    return cols, pre
+
+
+def raw_events(start, stop):
+    """(crane_id, ts, reducer_damage) re-scored from the raw event archive with the current algorithm."""
+    seen = set()
+    for base in RAW_DIRS:
+        if not os.path.isdir(base):
+            continue
+        for entry in sorted(os.listdir(base)):
+            try:
+                day = date.fromisoformat(entry)
+            except ValueError:
+                continue
+            if not start <= day < stop:
+                continue
+            for path in sorted(glob.glob(os.path.join(base, entry, '*.csv.gz'))):
+                name = os.path.basename(path)
+                if (entry, name) in seen:  # same day in raw_plc_data and backups
+                    continue
+                seen.add((entry, name))
+                crane_id, hms = name[:-len('.csv.gz')].split('_')[:2]
+                qc = crane_id.startswith('1')
+                try:
+                    cols, pre = load_event(path)
+                    kpis = (logger.calculate_kpis_qc if qc else logger.calculate_kpis)(*cols, pretrigger=pre)
+                except (OSError, ValueError, KeyError, EOFError) as e:
+                    print(f"  [!] skip {path}: {type(e).__name__}: {e}")
+                    continue
+                if kpis is None or kpis['duration'] <= (1.5 if qc else 3.0):
+                    continue
+                yield crane_id, datetime.strptime(f"{entry} {hms}", '%Y-%m-%d %H%M%S'), float(kpis['reducer_damage'])
+
+
+def rebuild(ledger, source, start, stop, dry_run):
+    events = csv_events(start, stop) if source == 'csv' else raw_events(start, stop)
+    cells, count = {}, 0
+    for crane_id, ts, damage in events:
+        key = (crane_id, logger.component_of(crane_id))
+        part, _ = ledger.part_at(key, ts.isoformat(sep=' ', timespec='seconds'))
+        cell = cells.setdefault((*key, part, ts.date().isoformat()), [0.0, 0])
+        cell[0] += damage
+        cell[1] += 1
+        count += 1
+    days = sorted({key[3] for key in cells})
+    print(f"{source}: {count} events, {len(cells)} daily rows over {len(days)} days in [{start}, {stop})")
+    if days:
+        print(f"  {days[0]} .. {days[-1]}, total damage {sum(c[0] for c in cells.values()):.0f}")
+    if dry_run:
+        audit(f"rebuild [{start}, {stop}) source={source}: events={count} rows={len(cells)} dry_run=1")
+        return
+    db = ledger.db
+    db.execute("BEGIN IMMEDIATE")
+    removed = db.execute("DELETE FROM daily WHERE day >= ? AND day < ?",
+                         (start.isoformat(), stop.isoformat())).rowcount
+    db.executemany("INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?)", [(*key, *cell) for key, cell in cells.items()])
+    db.execute("COMMIT")
+    audit(f"rebuild [{start}, {stop}) source={source}: events={count} replaced={removed} rows={len(cells)} dry_run=0")
+    print(f"replaced {removed} daily rows with {len(cells)}")
+
+
+def calibrate(ledger):
+    db = ledger.db
+    samples = {}
+    for crane_id, component, part, installed, note in db.execute(
+            "SELECT crane_id, component, part, installed, note FROM parts WHERE reason = 'failure' ORDER BY installed"):
+        damage = db.execute("SELECT sum(damage) FROM daily WHERE crane_id = ? AND component = ? AND part = ?",
+                            (crane_id, component, part - 1)).fetchone()[0] or 0.0
+        samples.setdefault(component, []).append(damage)
+        print(f"  {crane_id} {component} part {part - 1} failed by {installed}: damage {damage:.0f} "
+              f"{f'({note})' if note else ''}")
+    for component, damages in sorted(samples.items()):
+        print(f"{component}: {len(damages)} failures, median damage at removal {statistics.median(damages):.3g} "
+              f"(min {min(damages):.3g}, max {max(damages):.3g}); LEDGER_LIFE now "
+              f"{logger.LEDGER_LIFE.get(component)}")
+    if not samples:
+        print("no failure resets recorded yet")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cumulative reducer damage ledger: status, maintenance resets, history rebuilds, life calibration",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('status', help='Consumed life and projected end of life per component')
+    p = sub.add_parser('reset', help='Record a part replacement')
+    p.add_argument('crane_id')
+    p.add_argument('--at', required=True, type=lambda s: datetime.strptime(s, '%Y-%m-%d %H:%M'),
+                   help='Replacement time (YYYY-MM-DD HH:MM)')
+    p.add_argument('--reason', required=True, choices=['failure', 'preventive'])
+    p.add_argument('--note', default=None, help='Work order / remarks')
+    p = sub.add_parser('rebuild', help='Replace daily damage sums from the KPI CSV or re-scored raw events')
+    p.add_argument('--source', required=True, choices=['csv', 'raw'])
+    p.add_argument('--start', type=date.fromisoformat, default=date.min, help='First day (YYYY-MM-DD)')
+    p.add_argument('--stop', type=date.fromisoformat, default=date.today(),
+                   help='Day after the last one (default: today, i.e. up to yesterday)')
+    p.add_argument('--dry-run', action='store_true', help='Count events and totals only')
+    sub.add_parser('calibrate', help='Suggest LEDGER_LIFE from damage at failure replacements')
+    args = parser.parse_args()
+    ledger = logger.LEDGER
+    ledger.open(os.path.join(ROOT, logger.LEDGER_DB))
+    if args.cmd == 'status':
+        status(ledger)
+    elif args.cmd == 'reset':
+        reset(ledger, args.crane_id, args.at, args.reason, args.note)
+    elif args.cmd == 'rebuild':
+        rebuild(ledger, args.source, args.start, args.stop, args.dry_run)
+    elif args.cmd == 'calibrate':
+        calibrate(ledger)
+
+
+if __name__ == '__main__':
+    main()
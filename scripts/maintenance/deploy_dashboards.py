@@ -1,134 +1,430 @@
+"""
+deploy_dashboards.py — 패널 명세(SPEC)로 grafana/dashboards/*.json 생성 + Grafana 배포
+
+대시보드 JSON 은 직접 편집하지 않고 이 파일의 SPEC 에서 만든다. 패널 한 줄 = (id, 종류, 제목, 위치).
+
+  공유 쿼리: 대시보드마다 InfluxDB 조회는 기본 쿼리 하나 (호기별 일 단위 롤업 행:
+    stress_sum, stress_count, damage_sum, events, shock25_count, peak_shock_max) 가 첫 공유 패널
+    (Top 5) 에서 실행되고, 나머지 공유 패널은 `-- Dashboard --` 데이터소스로 그 결과를 받아
+    Grafana 변환(groupBy / calculateField / filterByValue / sortBy / limit / partitionByValues) 으로
+    각자의 모양을 만든다. 일 단위 합계는 가산적이므로 기간 평균(stress_sum / stress_count),
+    횟수 합, 최대값이 패널별 쿼리와 같다.
+  자체 쿼리: 패널 해상도(v.windowPeriod)를 따르는 추세(trend), 위치 산점도(position),
+    레일 구간 손상도(rail: 로거의 rail_cube 일 단위 희소 포인트, 전체 샘플 기준).
+    → 페이지 로드당 InfluxDB 쿼리: ARMGC / QC 6 → 2, 상세 2.
+  롤업 장애 시: 기본 쿼리 패널의 숨김 타깃 RAW (원본 이벤트 집계) 를 켜면 공유 패널 전체가 전환된다.
+  Crane_ID 필터: 일일 트렌드는 변환의 `${Crane_ID:regex}` 로 거른다 (Grafana 11 이상).
+
+사용 예:
+  python scripts/maintenance/deploy_dashboards.py build    # SPEC → grafana/dashboards/*.json
+  python scripts/maintenance/deploy_dashboards.py check    # JSON 이 SPEC 과 다르면 (UI 에서 수정 등) 종료 코드 1
+  python scripts/maintenance/deploy_dashboards.py push     # build + Grafana 에 반영
+"""
+import argparse
 import json
-import requests
-
-# 1. Update the Main Dashboard to add Data Links
-with open('grafana/dashboards/crane_pdm.json', 'r', encoding='utf-8') as f:
-    main_dash = json.load(f)
-
-for panel in main_dash.get('panels', []):
-    if panel.get('title') == "🔥 Top 5 Risk Cranes (Stress Index)":
-        for override in panel['fieldConfig']['overrides']:
-            if override['matcher']['options'] == 'crane_id':
-                # Add link to the detail dashboard
-                has_links = False
-                for prop in override['properties']:
-                    if prop['id'] == 'links':
-                        has_links = True
-                        prop['value'] = [{
-                            "title": "위치별 충격량 보기",
-                            "url": "/d/crane_pos_detail/crane-position-impact-detail?var-Crane_ID=${__value.text}&from=${__url.timeRange.from}&to=${__url.timeRange.to}",
-                            "targetBlank": True
-                        }]
-                if not has_links:
-                    override['properties'].append({
-                        "id": "links",
-                        "value": [{
-                            "title": "위치별 충격량 보기",
-                            "url": "/d/crane_pos_detail/crane-position-impact-detail?var-Crane_ID=${__value.text}&from=${__url.timeRange.from}&to=${__url.timeRange.to}",
-                            "targetBlank": True
-                        }]
-                    })
-    elif panel.get('title') == "🛰️ ARMGC 38대 (Stress Index Stress)":
-        panel['fieldConfig']['defaults']['links'] = [{
-            "title": "위치별 충격량 보기",
-            "url": "/d/crane_pos_detail/crane-position-impact-detail?var-Crane_ID=${__field.labels.crane_id}&from=${__url.timeRange.from}&to=${__url.timeRange.to}",
-            "targetBlank": True
-        }]
-
-main_dash['id'] = None
-main_dash['version'] = None
-
-r_main = requests.post(
-    'http://localhost:3000/api/dashboards/db',
-    headers={'Content-Type': 'application/json'},
-    auth=('admin', 'adminpassword'),
-    json={"dashboard": main_dash, "overwrite": True, "message": "Add detail dashboard links"}
-)
-print("Main Dashboard Push:", r_main.status_code, r_main.text)
-
-
-# 2. Create the Detail Dashboard
-detail_dash = {
-  "annotations": {"list": []},
-  "editable": True,
-  "fiscalYearStartMonth": 0,
-  "graphTooltip": 1,
-  "id": None,
-  "links": [],
-  "panels": [
-    {
-      "datasource": {"type": "influxdb", "uid": "P951FEA4DE68E13C5"},
-      "fieldConfig": {
-        "defaults": {
-          "color": {"mode": "fixed", "fixedColor": "red"},
-          "custom": {
-            "hideFrom": {"legend": False, "tooltip": False, "viz": False},
-            "lineStyle": {"fill": "solid"},
-            "lineWidth": 0,
-            "pointSize": 8,
-            "showPoints": "always"
-          }
-        },
-        "overrides": []
-      },
-      "gridPos": {"h": 20, "w": 24, "x": 0, "y": 0},
-      "id": 1,
-      "options": {
-        "legend": {"calcs": [], "displayMode": "list", "placement": "bottom"},
-        "tooltip": {"mode": "single", "sort": "none"}
-      },
-      "targets": [
-        {
-          "query": "from(bucket: \"cranepdm_kpis\")\n  |> range(start: v.timeRangeStart, stop: v.timeRangeStop)\n  |> filter(fn: (r) => r[\"_measurement\"] == \"crane_movement\")\n  |> filter(fn: (r) => (r[\"source\"] == \"v24_unified\" or r[\"source\"] == \"live_v26\"))\n  |> filter(fn: (r) => r[\"crane_id\"] == \"${Crane_ID}\")\n  |> filter(fn: (r) => r[\"_field\"] == \"peak_shock\" or r[\"_field\"] == \"peak_shock_pos\")\n  |> pivot(rowKey:[\"_time\"], columnKey: [\"_field\"], valueColumn: \"_value\")\n  |> filter(fn: (r) => r[\"peak_shock\"] >= 30.0)\n  |> keep(columns: [\"_time\", \"peak_shock_pos\", \"peak_shock\"])",
-          "refId": "A",
-          "datasource": {"type": "influxdb", "uid": "P951FEA4DE68E13C5"}
-        }
-      ],
-      "title": "호기 ${Crane_ID} - Gantry Position별 고위험 충격량 (Shock >= 30)",
-      "type": "xychart"
-    }
-  ],
-  "schemaVersion": 39,
-  "style": "dark",
-  "tags": ["Detail", "Position"],
-  "templating": {
-    "list": [
-      {
-        "current": {"selected": False, "text": "256", "value": "256"},
-        "datasource": {"type": "influxdb", "uid": "P951FEA4DE68E13C5"},
-        "definition": "import \"influxdata/influxdb/schema\"\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
-        "hide": 0,
-        "includeAll": False,
-        "multi": False,
-        "name": "Crane_ID",
-        "options": [],
-        "query": "import \"influxdata/influxdb/schema\"\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
-        "refresh": 1,
-        "regex": "",
-        "skipUrlSync": False,
-        "sort": 0,
-        "type": "query"
-      }
-    ]
-  },
-  "time": {"from": "now-30d", "to": "now"},
-  "timepicker": {},
-  "timezone": "browser",
-  "title": "Crane Position Impact Detail",
-  "uid": "crane_pos_detail",
-  "version": 1
+import os
+import sys
+
+from deploy_rollups import (INFLUX_BUCKET, REDUCE, ROLLUP_FIELDS, ROOT, panel_query, range_start, raw_events,
+                            stitched)
+
+GRAFANA_URL = "http://localhost:3000"
+GRAFANA_AUTH = ('admin', 'adminpassword')
+INFLUX_DS = {"type": "influxdb", "uid": "P951FEA4DE68E13C5"}
+DASHBOARD_DS = {"type": "datasource", "uid": "-- Dashboard --"}
+DETAIL_URL = "/d/crane_pos_detail/crane-position-impact-detail?var-Crane_ID="
+
+CRANE_VARIABLE = {
+    "current": {"selected": False, "text": "All", "value": "$__all"},
+    "datasource": INFLUX_DS,
+    "definition": "import \"influxdata/influxdb/schema\"\r\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
+    "hide": 0, "includeAll": True, "multi": True, "name": "Crane_ID", "options": [],
+    "query": "import \"influxdata/influxdb/schema\"\r\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
+    "refresh": 1, "regex": "/^2.*/", "skipUrlSync": False, "sort": 0, "type": "query", "customAllValue": ".*",
+}
+QC_CRANES = [str(n) for n in range(101, 113)]
+QC_VARIABLE = {
+    "current": {"selected": False, "text": "All", "value": "$__all"},
+    "hide": 0, "includeAll": True, "multi": True, "name": "Crane_ID",
+    "options": [{"selected": True, "text": "All", "value": "$__all"}]
+               + [{"selected": False, "text": c, "value": c} for c in QC_CRANES],
+    "query": ",".join(QC_CRANES), "skipUrlSync": False, "type": "custom", "customAllValue": ".*",
 }
+DETAIL_VARIABLE = {
+    "current": {"selected": False, "text": "256", "value": "256"},
+    "datasource": INFLUX_DS,
+    "definition": "import \"influxdata/influxdb/schema\"\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
+    "hide": 0, "includeAll": False, "multi": False, "name": "Crane_ID", "options": [],
+    "query": "import \"influxdata/influxdb/schema\"\nschema.tagValues(bucket: \"cranepdm_kpis\", tag: \"crane_id\")",
+    "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query",
+}
+
+POSITION_QUERY = '''from(bucket: "cranepdm_kpis")
+  |> range(start: v.timeRangeStart, stop: v.timeRangeStop)
+  |> filter(fn: (r) => r["_measurement"] == "crane_movement")
+  |> filter(fn: (r) => r["source"] =~ /^(v24_unified|live_v26)$/)
+  |> filter(fn: (r) => r["crane_id"] == "${Crane_ID}")
+  |> filter(fn: (r) => r["_field"] =~ /^(peak_shock|peak_shock_pos|avg_pos)$/)
+  |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
+  |> group()
+  |> map(fn: (r) => ({ r with peak_shock_pos: if exists r.peak_shock_pos then r.peak_shock_pos else r.avg_pos }))
+  |> filter(fn: (r) => exists r["peak_shock"] and exists r["peak_shock_pos"])
+  |> filter(fn: (r) => r["peak_shock"] >= 24.0)
+  |> keep(columns: ["peak_shock_pos", "peak_shock"])
+'''
+
+# rail_cube: per-sample damage in RAIL_BIN_M position bins, day totals per node (crane_edge_logger.RailCube)
+RAIL_QUERY = '''from(bucket: "cranepdm_kpis")
+  |> range(start: v.timeRangeStart, stop: v.timeRangeStop)
+  |> filter(fn: (r) => r["_measurement"] == "rail_cube")
+  |> filter(fn: (r) => r["crane_id"] == "${Crane_ID}")
+  |> filter(fn: (r) => r["_field"] == "damage")
+  |> group(columns: ["bin", "is_loaded"])
+  |> sum()
+  |> group()
+  |> pivot(rowKey: ["bin"], columnKey: ["is_loaded"], valueColumn: "_value")
+  |> map(fn: (r) => ({ pos_m: float(v: r.bin),
+      Loaded: if exists r.Loaded then r.Loaded else 0.0,
+      Empty: if exists r.Empty then r.Empty else 0.0 }))
+  |> sort(columns: ["pos_m"])
+'''
+
+# ---------------------------------------------------------------- panel spec
+
+SPEC = {
+    'crane_pdm.json': {
+        'crane_type': 'ARMGC', 'uid': 'total_control_tower_v1', 'version': 6,
+        'title': "CranePdM V2.6 - Reducer Damage Diagnostics", 'tags': ["V2.6", "ReducerDamage", "PdM"],
+        'variable': CRANE_VARIABLE, 'stress': (40, 50), 'gauge_max': 100, 'links': True,
+        'labels': {'crane': "호기", 'table': "호기 (Crane ID)", 'value': "Avg Reducer Damage"},
+        'panels': [
+            (2, 'top', "🔥 Top 5 Risk Cranes (Stress Index)", (0, 0, 7, 7)),
+            (1, 'stat', "🛰️ ARMGC 38대 (Stress Index Stress)", (7, 0, 17, 7)),
+            (12, 'daily', "📅 ARMGC 일일 Stress Index 트렌드", (0, 7, 24, 10)),
+            (11, 'trend', "📈 Stress Index Stress Trend (호기별 평균 추세)", (0, 17, 24, 12)),
+            (101, 'shock25', "선택 기간 극단치 발생 빈도 (Shock >= 25G)", (0, 20, 12, 8)),
+            (102, 'max_shock', "선택 기간 최고 위험도 (Max Peak Shock)", (12, 20, 12, 8)),
+        ],
+    },
+    'qc_spreader_pdm.json': {
+        'crane_type': 'QC', 'uid': 'qc_spreader_pdm', 'version': 1,
+        'title': "QC Spreader Cable Reducer Diagnostics (V3.0 Hoist Dedicated)", 'tags': ["QC", "SpreaderCable", "PdM"],
+        'variable': QC_VARIABLE, 'stress': (25, 30), 'gauge_max': 40, 'links': False,
+        'labels': {'crane': "QC 호기", 'table': "QC 호기", 'value': "Avg Stress Index"},
+        'panels': [
+            (2, 'top', "🔥 Top QC Cranes (Stress Index)", (0, 0, 7, 7)),
+            (1, 'stat', "🛰️ QC Stress Index (Spreader Cable)", (7, 0, 17, 7)),
+            (12, 'daily', "📅 QC 일일 Stress Index 트렌드", (0, 7, 24, 10)),
+            (11, 'trend', "📈 QC Stress Index Trend (호기별 평균 추세)", (0, 17, 24, 12)),
+            (101, 'shock25', "선택 기간 극단치 발생 빈도 (Shock >= 25G)", (0, 29, 12, 8)),
+            (102, 'max_shock', "선택 기간 최고 위험도 (Max Peak Shock)", (12, 29, 12, 8)),
+        ],
+    },
+    'crane_position_detail.json': {
+        'crane_type': None, 'uid': 'crane_pos_detail', 'version': 1, 'annotations': False,
+        'title': "Crane Position Impact Detail", 'tags': ["Detail", "Position"], 'variable': DETAIL_VARIABLE,
+        'panels': [
+            (1, 'position', "호기 ${Crane_ID} - Gantry Position별 고위험 충격량 (Shock >= 24)", (0, 0, 24, 12)),
+            (2, 'rail', "호기 ${Crane_ID} - 레일 구간별 누적 손상도 (10 m 구간, 전체 샘플)", (0, 12, 24, 12)),
+        ],
+    },
+}
+
+# ---------------------------------------------------------------- shared base query
+
+def base_query(crane_type, raw=False):
+    """Per-crane daily rollup rows for the dashboard range, one table (the shared panels' input)."""
+    if raw:  # fallback straight from crane_movement, same scoping as the rollup tasks
+        narrow = f'\n  |> filter(fn: (r) => r["crane_type"] == "{crane_type}")'
+        source = f'''timeStart = {range_start(crane_type)}
+{raw_events('timeStart', 'v.timeRangeStop', narrow=narrow)}
+  |> group(columns: ["crane_id"])'''
+    else:
+        source = stitched(crane_type)
+    columns = ", ".join(f'"{c}"' for c in ['_time', 'crane_id'] + ROLLUP_FIELDS)
+    return f'''{source}
+  |> window(every: 1d)
+  |> {REDUCE}
+  |> map(fn: (r) => ({{r with _time: r._start}}))
+  |> keep(columns: [{columns}])
+  |> group()
+  |> sort(columns: ["_time", "crane_id"])'''
+
+# ---------------------------------------------------------------- transformations
+
+def group_by_crane():
+    agg = {f: {"aggregations": ["max" if f == 'peak_shock_max' else "sum"], "operation": "aggregate"}
+           for f in ('stress_sum', 'stress_count', 'shock25_count', 'peak_shock_max')}
+    return {"id": "groupBy", "options": {"fields": {"crane_id": {"aggregations": [], "operation": "groupby"}, **agg}}}
+
+
+def stress_mean(total=True):
+    """_value = stress_sum / stress_count, rows without counted events dropped."""
+    s, n = ('stress_sum (sum)', 'stress_count (sum)') if total else ('stress_sum', 'stress_count')
+    return [where((n, 'greater', {"value": 0})),
+            {"id": "calculateField", "options": {"mode": "binary", "alias": "_value",
+                                                 "binary": {"left": s, "operator": "/", "right": n}}}]
+
+
+def where(*conditions):
+    return {"id": "filterByValue", "options": {"type": "include", "match": "all", "filters": [
+        {"fieldName": field, "config": {"id": op, "options": options}} for field, op, options in conditions]}}
+
+
+def sort_by(field, desc=True):
+    return {"id": "sortBy", "options": {"sort": [{"field": field, "desc": desc}]}}
+
+
+def keep(*names):
+    return {"id": "filterFieldsByName", "options": {"include": {"names": list(names)}}}
+
+
+def rename(mapping):
+    return {"id": "organize", "options": {"excludeByName": {}, "renameByName": mapping,
+                                          "indexByName": {name: i for i, name in enumerate(mapping)}}}
+
+
+def shared_transformations(kind, dash):
+    """Grafana transformations turning the base rows into what the per-panel query returned."""
+    table = dash.get('labels', {}).get('table')
+    if kind == 'top':
+        return [group_by_crane(), *stress_mean(), sort_by('_value'), {"id": "limit", "options": {"limitField": 5}},
+                keep('crane_id', '_value')]
+    if kind == 'stat':
+        return [group_by_crane(), *stress_mean(), sort_by('crane_id', desc=False), keep('crane_id', '_value')]
+    if kind == 'daily':
+        return [where(('crane_id', 'regex', {"value": "${Crane_ID:regex}"})), *stress_mean(total=False),
+                {"id": "organize", "options": {"excludeByName": {f: True for f in ROLLUP_FIELDS}}},
+                {"id": "partitionByValues", "options": {"fields": ["crane_id"], "naming": {"asLabels": True}}}]
+    if kind == 'shock25':
+        return [group_by_crane(), where(('shock25_count (sum)', 'greater', {"value": 0})),
+                sort_by('shock25_count (sum)'), keep('crane_id', 'shock25_count (sum)'),
+                rename({'crane_id': table, 'shock25_count (sum)': "발생 빈도 (회)"})]
+    if kind == 'max_shock':
+        return [group_by_crane(), where(('peak_shock_max (max)', 'greater', {"value": 0})),
+                sort_by('peak_shock_max (max)'), keep('crane_id', 'peak_shock_max (max)'),
+                rename({'crane_id': table, 'peak_shock_max (max)': "최고 충격량 (G)"})]
+    return None
+
+# ---------------------------------------------------------------- panel JSON
+
+def thresholds(orange, red):
+    return {"mode": "absolute", "steps": [{"color": "green", "value": None}, {"color": "orange", "value": orange},
+                                          {"color": "red", "value": red}]}
+
+
+def detail_link(value):
+    return [{"title": "호기 상세 Gantry 분석 열기", "url": DETAIL_URL + value, "targetBlank": False}]
+
+
+def table_config(steps, overrides=(), **defaults):
+    return {"defaults": {"color": {"mode": "thresholds"}, "custom": {"align": "center", "cellOptions": {"type": "auto"}},
+                         "thresholds": thresholds(*steps), **defaults},
+            "overrides": list(overrides)}
+
+
+def series_config(dash, width, fill, point, links=None):
+    defaults = {"displayName": "${__field.labels.crane_id}", "thresholds": thresholds(*dash['stress']),
+                "custom": {"thresholdsStyle": {"mode": "line"}, "drawStyle": "line", "lineWidth": width,
+                           "fillOpacity": fill, "pointSize": point, "showPoints": "always"}}
+    if links:
+        defaults['links'] = links
+    return {"defaults": defaults}
+
+
+TABLE_OPTIONS = {"cellHeight": "sm", "showHeader": True}
+SERIES_OPTIONS = {"legend": {"displayMode": "table", "placement": "right", "calcs": ["mean", "max"]},
+                  "tooltip": {"mode": "multi"}}
+
+
+def panel_look(kind, dash):
+    """(type, fieldConfig, options) of one panel kind."""
+    labels, links = dash.get('labels', {}), dash.get('links')
+    if kind == 'top':
+        crane = [{"id": "displayName", "value": labels['crane']}]
+        if links:
+            crane.append({"id": "links", "value": [{
+                "title": "위치별 충격량 보기",
+                "url": DETAIL_URL + "${__value.text}&from=${__url.timeRange.from}&to=${__url.timeRange.to}",
+                "targetBlank": True}]})
+        return 'table', table_config(dash['stress'], [
+            {"matcher": {"id": "byName", "options": "_value"},
+             "properties": [{"id": "displayName", "value": labels['value']}, {"id": "min", "value": 0},
+                            {"id": "max", "value": dash['gauge_max']},
+                            {"id": "custom.cellOptions",
+                             "value": {"mode": "gradient", "type": "gauge", "valueDisplayMode": "text"}}]},
+            {"matcher": {"id": "byName", "options": "crane_id"}, "properties": crane}]), TABLE_OPTIONS
+    if kind == 'stat':
+        defaults = {"color": {"mode": "thresholds"}, "displayName": "${__data.fields.crane_id}",
+                    "thresholds": thresholds(*dash['stress'])}
+        if links:
+            defaults['links'] = detail_link("${__data.fields.crane_id}")
+        return 'stat', {"defaults": defaults}, {
+            "colorMode": "background", "reduceOptions": {"values": True, "calcs": [], "fields": "/^_value$/"},
+            "textMode": "value_and_name", "text": {"titleSize": 24, "valueSize": 12}}
+    if kind == 'daily':
+        return 'timeseries', series_config(dash, 3, 15, 6, links and detail_link("${__field.labels.crane_id}")), SERIES_OPTIONS
+    if kind == 'trend':
+        return 'timeseries', series_config(dash, 2, 10, 5), SERIES_OPTIONS
+    if kind == 'shock25':
+        return 'table', table_config((5, 15), decimals=0, displayName=""), TABLE_OPTIONS
+    if kind == 'max_shock':
+        return 'table', table_config((24, 30), displayName=""), TABLE_OPTIONS
+    if kind == 'position':
+        return 'xychart', {
+            "defaults": {"color": {"mode": "fixed", "fixedColor": "red"},
+                         "custom": {"hideFrom": {"legend": False, "tooltip": False, "viz": False},
+                                    "lineStyle": {"fill": "solid"}, "lineWidth": 0, "pointSize": 8, "showPoints": "always"}},
+            "overrides": []}, {
+            "legend": {"calcs": [], "displayMode": "list", "placement": "bottom"},
+            "tooltip": {"mode": "single", "sort": "none"},
+            "dims": {"frame": 0, "x": "peak_shock_pos"},
+            "series": [{"show": True, "y": "peak_shock", "pointSize": 10, "lineStyle": {"fill": "dash"}, "lineWidth": 0}]}
+    if kind == 'rail':
+        return 'xychart', {
+            "defaults": {"custom": {"hideFrom": {"legend": False, "tooltip": False, "viz": False},
+                                    "lineStyle": {"fill": "solid"}, "lineWidth": 1, "pointSize": 4, "showPoints": "always"},
+                         "unit": "short"},
+            "overrides": [{"matcher": {"id": "byName", "options": "Loaded"},
+                           "properties": [{"id": "color", "value": {"mode": "fixed", "fixedColor": "red"}}]},
+                          {"matcher": {"id": "byName", "options": "Empty"},
+                           "properties": [{"id": "color", "value": {"mode": "fixed", "fixedColor": "blue"}}]}]}, {
+            "legend": {"calcs": ["sum", "max"], "displayMode": "list", "placement": "bottom"},
+            "tooltip": {"mode": "multi", "sort": "desc"},
+            "dims": {"frame": 0, "x": "pos_m"},
+            "series": [{"show": True, "y": "Loaded"}, {"show": True, "y": "Empty"}]}
+    raise ValueError(f"unknown panel kind {kind!r}")
+
+
+def influx_targets(query, fallback=None):
+    targets = [{"query": query, "refId": "A", "datasource": INFLUX_DS}]
+    if fallback:
+        targets.append({"query": fallback, "refId": "RAW", "datasource": INFLUX_DS, "hide": True})
+    return targets
+
+
+def build_dashboard(dash):
+    crane_type, host = dash['crane_type'], None
+    panels = []
+    for panel_id, kind, title, (x, y, w, h) in dash['panels']:
+        kind_type, field_config, options = panel_look(kind, dash)
+        transformations = shared_transformations(kind, dash)
+        panel = {"datasource": INFLUX_DS, "fieldConfig": field_config, "gridPos": {"h": h, "w": w, "x": x, "y": y},
+                 "id": panel_id, "options": options}
+        if transformations is None:  # own query
+            if kind == 'position':
+                panel['targets'] = influx_targets(POSITION_QUERY)
+            elif kind == 'rail':
+                panel['targets'] = influx_targets(RAIL_QUERY)
+            else:
+                panel['targets'] = influx_targets(panel_query(crane_type, panel_id), raw_trend(crane_type))
+        elif host is None:  # first shared panel runs the base query for all of them
+            host = panel_id
+            panel['targets'] = influx_targets(base_query(crane_type), base_query(crane_type, raw=True))
+        else:
+            panel['datasource'] = DASHBOARD_DS
+            panel['targets'] = [{"datasource": DASHBOARD_DS, "panelId": host, "refId": "A", "withTransforms": False}]
+        panel.update(title=title, type=kind_type)
+        if transformations:
+            panel['transformations'] = transformations
+        panels.append(panel)
+    builtin = [{"builtIn": 1, "datasource": {"type": "grafana", "uid": "-- Grafana --"}, "enable": True,
+                "hide": True, "iconColor": "rgba(0, 211, 255, 1)", "name": "Annotations & Alerts",
+                "type": "dashboard"}]
+    return {
+        "annotations": {"list": builtin if dash.get('annotations', True) else []},
+        "editable": True, "fiscalYearStartMonth": 0, "graphTooltip": 1, "id": None, "links": [],
+        "panels": panels,
+        "schemaVersion": 39, "style": "dark", "tags": dash['tags'],
+        "templating": {"list": [dash['variable']]},
+        "time": {"from": "now-30d", "to": "now"}, "timepicker": {}, "timezone": "browser",
+        "title": dash['title'], "uid": dash['uid'], "version": dash['version'],
+    }
+
+
+def raw_trend(crane_type):
+    """Hidden RAW target of the trend panel: mean stress_index straight from crane_movement."""
+    if crane_type == 'ARMGC':
+        head, start = f'timeStart = {range_start(crane_type)}\n', 'timeStart'
+        scope = 'r["source"] =~ /^(v24_unified|live_v26)$/'
+    else:
+        head, start = '', 'v.timeRangeStart'
+        scope = 'r["crane_type"] == "QC" and r["component"] == "SpreaderCable"'
+    return f'''{head}from(bucket: "{INFLUX_BUCKET}")
+  |> range(start: {start}, stop: v.timeRangeStop)
+  |> filter(fn: (r) => r["_measurement"] == "crane_movement")
+  |> filter(fn: (r) => {scope})
+  |> filter(fn: (r) => r["_field"] == "stress_index")
+  |> filter(fn: (r) => r._value > 0.0)
+  |> filter(fn: (r) => r["crane_id"] =~ /${{Crane_ID:regex}}/)
+  |> group(columns: ["crane_id"])
+  |> aggregateWindow(every: v.windowPeriod, fn: mean, createEmpty: false)'''
+
+# ---------------------------------------------------------------- files / Grafana
+
+def path_of(name):
+    return os.path.join(ROOT, 'grafana', 'dashboards', name)
+
+
+def rendered(dash):
+    return json.dumps(build_dashboard(dash), ensure_ascii=False, indent=2) + '\n'
+
+
+def influx_queries(dash):
+    """InfluxDB queries one page load runs (the Crane_ID variable aside)."""
+    return sum(1 for p in build_dashboard(dash)['panels'] if p['datasource'] == INFLUX_DS)
+
+
+def build():
+    for name, dash in SPEC.items():
+        with open(path_of(name), 'w', encoding='utf-8') as f:
+            f.write(rendered(dash))
+        print(f"{name}: {len(dash['panels'])} panels, {influx_queries(dash)} InfluxDB queries per load")
+
+
+def check():
+    stale = []
+    for name, dash in SPEC.items():
+        try:
+            with open(path_of(name), encoding='utf-8') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        ok = current == rendered(dash)
+        print(f"{name}: {'up to date' if ok else 'differs from SPEC'}")
+        if not ok:
+            stale.append(name)
+    return not stale
+
+
+def push():
+    import requests
+    build()
+    for name, dash in SPEC.items():
+        r = requests.post(f"{GRAFANA_URL}/api/dashboards/db", auth=GRAFANA_AUTH,
+                          json={"dashboard": dict(build_dashboard(dash), id=None, version=None), "overwrite": True,
+                                "message": "deploy_dashboards.py (generated from SPEC)"})
+        print(f"{name}: {r.status_code} {r.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate grafana/dashboards/*.json from the panel SPEC and push them to Grafana",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('build', help='Write grafana/dashboards/*.json from SPEC')
+    sub.add_parser('check', help='Exit 1 if a dashboard JSON differs from SPEC')
+    sub.add_parser('push', help='build, then POST every dashboard to Grafana')
+    args = parser.parse_args()
 
-r_detail = requests.post(
-    'http://localhost:3000/api/dashboards/db',
-    headers={'Content-Type': 'application/json'},
-    auth=('admin', 'adminpassword'),
-    json={"dashboard": detail_dash, "overwrite": True, "message": "Initial deploy"}
-)
-print("Detail Dashboard Push:", r_detail.status_code, r_detail.text)
+    if args.cmd == 'build':
+        build()
+    elif args.cmd == 'check':
+        sys.exit(0 if check() else 1)
+    else:
+        push()
 
-with open('grafana/dashboards/crane_pdm.json', 'w', encoding='utf-8') as f:
-    json.dump(main_dash, f, indent=2, ensure_ascii=False)
 
-with open('grafana/dashboards/crane_position_detail.json', 'w', encoding='utf-8') as f:
-    json.dump(detail_dash, f, indent=2, ensure_ascii=False)
+if __name__ == '__main__':
+    main()
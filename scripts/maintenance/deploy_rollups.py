@@ -0,0 +1,337 @@
+"""
+deploy_rollups.py — InfluxDB 시간/일 단위 롤업 버킷·태스크 배포 및 대시보드 쿼리 전환
+
+대시보드 패널은 30~90일 범위에서 cranepdm_kpis 의 이벤트 원본을 매 새로고침마다
+filter → pivot → map → 집계한다. 이 도구는 크레인별 롤업을 미리 계산해 두고
+패널이 롤업을 읽도록 바꾼다.
+
+  버킷 (measurement crane_rollup, tag crane_id / crane_type):
+    cranepdm_rollup_1h  (보존 ROLLUP_1H_RETENTION_DAYS)   cranepdm_rollup_1d (무기한)
+  필드 (시간/일 구간별 합계 — 기간 평균은 stress_sum / stress_count 로 정확히 재구성):
+    stress_sum, stress_count   stress_index 필드 (backfill_stress_index.py 참조) 합 / 이벤트 수
+    damage_sum, events         reducer_damage 합 / 이벤트 수 (Stress Index 와 같은 source 범위)
+    shock25_count              peak_shock >= 25 이벤트 수
+    peak_shock_max             peak_shock 최대값
+  태스크: cranepdm_rollup_1h (매시 5분, 직전 2시간 재계산), cranepdm_rollup_1d (매시 10분, 어제~오늘 재계산)
+
+  대시보드 쿼리는 [일 롤업 | 시간 롤업 | 원본 꼬리(마지막 완료 시간 이후)] 를 이어 붙이므로
+  최신 이벤트도 바로 반영된다. 원본 집계는 숨김 타깃 RAW 로 남는다 (롤업 장애 시 표시 전환용).
+  대시보드 JSON 자체는 deploy_dashboards.py 가 패널 명세로 생성한다 (공유 기본 쿼리 + 추세 패널).
+  crane_position_detail.json (이벤트별 위치 산점도)은 집계가 아니므로 원본을 그대로 읽는다.
+
+  과거 데이터를 다시 쓰는 스크립트(reprocess_*, precise_downscale 등)를 실행한 뒤에는
+  backfill 로 해당 기간의 롤업을 다시 계산해야 한다.
+
+사용 예:
+  python scripts/maintenance/deploy_rollups.py provision            # 버킷 + 태스크 생성/갱신
+  python scripts/maintenance/deploy_rollups.py backfill --days 120  # 과거 롤업 계산
+  python scripts/maintenance/deploy_rollups.py dashboards           # = deploy_dashboards.py build
+  python scripts/maintenance/deploy_dashboards.py push              # Grafana 에 반영
+  python scripts/maintenance/deploy_rollups.py bench --ranges 7,30,90   # 패널 쿼리 지연 원본 vs 롤업
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+# Must match crane_edge_logger.py / docker-compose.yml
+# (CRANEPDM_INFLUX_URL=http://localhost:8087 goes through the logger's query cache, QUERY_CACHE_PORT)
+INFLUX_URL = os.environ.get("CRANEPDM_INFLUX_URL", "http://localhost:8086")
+INFLUX_TOKEN = "my-super-secret-auth-token"
+INFLUX_ORG = "myorg"
+INFLUX_BUCKET = "cranepdm_kpis"
+
+ROLLUP_1H = "cranepdm_rollup_1h"
+ROLLUP_1D = "cranepdm_rollup_1d"
+ROLLUP_1H_RETENTION_DAYS = 400
+ROLLUP_MEASUREMENT = "crane_rollup"
+ROLLUP_FIELDS = ['stress_sum', 'stress_count', 'damage_sum', 'events', 'shock25_count', 'peak_shock_max']
+RAW_TAIL_LAG = "10m"   # Hourly task runs at :05; the raw tail covers the hour it may not have written yet
+ARMGC_SINCE = "2026-05-15T00:00:00Z"  # ARMGC panels ignore earlier (pre-V2.6) events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DASHBOARDS = {
+    'ARMGC': os.path.join(ROOT, 'grafana', 'dashboards', 'crane_pdm.json'),
+    'QC': os.path.join(ROOT, 'grafana', 'dashboards', 'qc_spreader_pdm.json'),
+}
+
+# ---------------------------------------------------------------- Flux building blocks
+
+def raw_events(start, stop, narrow=''):
+    """Per-event rollup contributions from crane_movement, with the panels' own scoping rules.
+    `narrow`: extra tag filter stages, applied before the pivot so they stay in the storage pushdown."""
+    return f'''from(bucket: "{INFLUX_BUCKET}")
+  |> range(start: {start}, stop: {stop})
+  |> filter(fn: (r) => r["_measurement"] == "crane_movement")
+  |> filter(fn: (r) => r["_field"] =~ /^(stress_index|reducer_damage|peak_shock)$/){narrow}
+  |> pivot(rowKey:["_time", "crane_id"], columnKey:["_field"], valueColumn:"_value")
+  |> map(fn: (r) => {{
+      armgc = r.crane_id =~ /^2/
+      armgc_src = armgc and exists r.source and (r.source == "v24_unified" or r.source == "live_v26")
+      qc = exists r.crane_type and r.crane_type == "QC" and exists r.component and r.component == "SpreaderCable"
+      stress = if (armgc_src or qc) and exists r.stress_index then r.stress_index else 0.0
+      counted = stress > 0.0
+      shock = if exists r.peak_shock then r.peak_shock else 0.0
+      return {{
+          _time: r._time, crane_id: r.crane_id, crane_type: if armgc then "ARMGC" else "QC", in_scope: armgc or qc,
+          stress_sum: stress, stress_count: if counted then 1.0 else 0.0,
+          damage_sum: if counted and exists r.reducer_damage then r.reducer_damage else 0.0,
+          events: if counted then 1.0 else 0.0,
+          shock25_count: if shock >= 25.0 then 1.0 else 0.0, peak_shock_max: shock,
+      }}
+  }})
+  |> filter(fn: (r) => r.in_scope)
+  |> drop(columns: ["in_scope"])'''
+
+
+REDUCE = '''reduce(identity: {stress_sum: 0.0, stress_count: 0.0, damage_sum: 0.0, events: 0.0, shock25_count: 0.0, peak_shock_max: 0.0},
+      fn: (r, accumulator) => ({
+          stress_sum: accumulator.stress_sum + r.stress_sum,
+          stress_count: accumulator.stress_count + r.stress_count,
+          damage_sum: accumulator.damage_sum + r.damage_sum,
+          events: accumulator.events + r.events,
+          shock25_count: accumulator.shock25_count + r.shock25_count,
+          peak_shock_max: if r.peak_shock_max > accumulator.peak_shock_max then r.peak_shock_max else accumulator.peak_shock_max,
+      }))'''
+
+
+def write_rollup(bucket):
+    fields = ", ".join(f'"{f}": r.{f}' for f in ROLLUP_FIELDS)
+    return f'''  |> map(fn: (r) => ({{r with _time: r._start, _measurement: "{ROLLUP_MEASUREMENT}"}}))
+  |> to(bucket: "{bucket}", org: "{INFLUX_ORG}", tagColumns: ["crane_id", "crane_type"],
+        fieldFn: (r) => ({{{fields}}}))'''
+
+
+def hourly_body(start, stop):
+    return f'''{raw_events(start, stop)}
+  |> group(columns: ["crane_id", "crane_type"])
+  |> window(every: 1h)
+  |> {REDUCE}
+{write_rollup(ROLLUP_1H)}'''
+
+
+def daily_body(start, stop):
+    return f'''from(bucket: "{ROLLUP_1H}")
+  |> range(start: {start}, stop: {stop})
+  |> filter(fn: (r) => r["_measurement"] == "{ROLLUP_MEASUREMENT}")
+  |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")
+  |> group(columns: ["crane_id", "crane_type"])
+  |> window(every: 1d)
+  |> {REDUCE}
+{write_rollup(ROLLUP_1D)}'''
+
+
+TASKS = {
+    'cranepdm_rollup_1h': lambda: f'''import "date"
+
+option task = {{name: "cranepdm_rollup_1h", every: 1h, offset: 5m}}
+
+stop = date.truncate(t: now(), unit: 1h)
+start = date.sub(d: 2h, from: stop)
+
+{hourly_body('start', 'stop')}
+''',
+    'cranepdm_rollup_1d': lambda: f'''import "date"
+
+option task = {{name: "cranepdm_rollup_1d", every: 1h, offset: 10m}}
+
+stop = date.truncate(t: now(), unit: 1h)
+start = date.sub(d: 1d, from: date.truncate(t: stop, unit: 1d))
+
+{daily_body('start', 'stop')}
+''',
+}
+
+# ---------------------------------------------------------------- dashboard queries
+
+def range_start(crane_type):
+    """Flux expression for the first instant a panel of `crane_type` covers."""
+    return (f'if v.timeRangeStart < {ARMGC_SINCE} then {ARMGC_SINCE} else v.timeRangeStart'
+            if crane_type == 'ARMGC' else 'v.timeRangeStart')
+
+
+def stitched(crane_type, daily=True, crane_filter=False):
+    """
+    Rollup rows + raw tail as one stream of rollup-shaped rows for [timeStart, v.timeRangeStop):
+    daily rows for whole days, hourly rows for the partial first day / today up to `split`
+    (last hour the task has written), raw events after `split`.
+    """
+    start = range_start(crane_type)
+    crane = '\n  |> filter(fn: (r) => r["crane_id"] =~ /${Crane_ID:regex}/)' if crane_filter else ''
+    # The tail only spans the last hour, which the live logger always tags with crane_type
+    tail_filter = f'\n  |> filter(fn: (r) => r["crane_type"] == "{crane_type}")' + crane
+
+    def rollup(bucket, cond):
+        return f'''from(bucket: "{bucket}")
+  |> range(start: timeStart, stop: v.timeRangeStop)
+  |> filter(fn: (r) => r["_measurement"] == "{ROLLUP_MEASUREMENT}" and r["crane_type"] == "{crane_type}")
+  |> filter(fn: (r) => {cond}){crane}
+  |> pivot(rowKey:["_time"], columnKey:["_field"], valueColumn:"_value")'''
+
+    if daily:
+        tiers = f'''days = {rollup(ROLLUP_1D, 'r._time >= dayFrom and r._time < dayTo')}
+hours = {rollup(ROLLUP_1H, '(r._time < dayFrom or r._time >= dayTo) and r._time < split')}'''
+        streams = 'days, hours, tail'
+    else:
+        tiers = f'''hours = {rollup(ROLLUP_1H, 'r._time < split')}'''
+        streams = 'hours, tail'
+    return f'''import "date"
+
+timeStart = {start}
+split = date.truncate(t: date.sub(d: {RAW_TAIL_LAG}, from: v.timeRangeStop), unit: 1h)
+rawStart = if split > timeStart then split else timeStart
+dayFrom = date.truncate(t: date.add(d: 1d, to: date.sub(d: 1ns, from: timeStart)), unit: 1d)
+dayTo = date.truncate(t: split, unit: 1d)
+
+{tiers}
+tail = {raw_events('rawStart', 'v.timeRangeStop', narrow=tail_filter)}
+
+union(tables: [{streams}])
+  |> group(columns: ["crane_id"])'''
+
+
+def panel_query(crane_type, panel_id):
+    """
+    Rollup query of a panel that keeps its own query: the Stress Index trend (11), whose
+    resolution follows v.windowPeriod. The other aggregate panels derive from the shared
+    daily base query (deploy_dashboards.py).
+    """
+    mean = '''  |> filter(fn: (r) => r.stress_count > 0.0)
+  |> map(fn: (r) => ({r with _value: r.stress_sum / r.stress_count}))'''
+    if panel_id == 11:  # Stress Index trend at the panel resolution (>= 1h)
+        return f'''{stitched(crane_type, daily=False, crane_filter=True)}
+  |> window(every: if int(v: v.windowPeriod) < int(v: 1h) then 1h else v.windowPeriod)
+  |> {REDUCE}
+{mean}
+  |> map(fn: (r) => ({{r with _time: r._stop}}))
+  |> keep(columns: ["_time", "crane_id", "_value"])'''
+    return None
+
+
+def rewrite_dashboards():
+    """Dashboards are generated from deploy_dashboards.SPEC, rollup queries included."""
+    from deploy_dashboards import build
+    build()
+
+# ---------------------------------------------------------------- InfluxDB side
+
+def client():
+    from influxdb_client import InfluxDBClient
+    return InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG, timeout=600_000)
+
+
+def provision():
+    from influxdb_client import BucketRetentionRules, TaskCreateRequest
+    with client() as c:
+        buckets = c.buckets_api()
+        org_id = c.organizations_api().find_organizations(org=INFLUX_ORG)[0].id
+        for name, days in ((ROLLUP_1H, ROLLUP_1H_RETENTION_DAYS), (ROLLUP_1D, 0)):
+            if buckets.find_bucket_by_name(name):
+                print(f"bucket {name}: exists")
+                continue
+            rules = [BucketRetentionRules(type='expire', every_seconds=days * 86400)] if days else []
+            buckets.create_bucket(bucket_name=name, retention_rules=rules, org_id=org_id)
+            print(f"bucket {name}: created (retention {f'{days}d' if days else 'infinite'})")
+        tasks = c.tasks_api()
+        for name, flux in TASKS.items():
+            existing = tasks.find_tasks(name=name)
+            if existing:
+                task = existing[0]
+                task.flux = flux()
+                task.status = 'active'
+                tasks.update_task(task)
+                print(f"task {name}: updated")
+            else:
+                tasks.create_task(task_create_request=TaskCreateRequest(org_id=org_id, flux=flux(), status='active'))
+                print(f"task {name}: created")
+
+
+def backfill(days):
+    """Recompute hourly rollups day by day, then the daily rollups, for the last `days` days."""
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    first = (end - timedelta(days=days)).replace(hour=0)
+    with client() as c:
+        query = c.query_api()
+        t = first
+        while t < end:
+            stop = min(t + timedelta(days=1), end)
+            t0 = time.time()
+            query.query(hourly_body(t.isoformat().replace('+00:00', 'Z'), stop.isoformat().replace('+00:00', 'Z')))
+            print(f"{ROLLUP_1H} {t:%Y-%m-%d}: {time.time() - t0:.1f}s")
+            t = stop
+        t0 = time.time()
+        query.query(daily_body(first.isoformat().replace('+00:00', 'Z'), end.isoformat().replace('+00:00', 'Z')))
+        print(f"{ROLLUP_1D} {first:%Y-%m-%d}..{end:%Y-%m-%d}: {time.time() - t0:.1f}s")
+
+
+def with_range(query, days, stop):
+    """Panel query with the variables Grafana injects (v.*, $Crane_ID), for the query API."""
+    start = stop - timedelta(days=days)
+    v = (f'v = {{timeRangeStart: {start:%Y-%m-%dT%H:%M:%SZ}, timeRangeStop: {stop:%Y-%m-%dT%H:%M:%SZ}, '
+         f'windowPeriod: {max(1, days * 86400 // 1500)}s}}')
+    lines = query.replace('${Crane_ID:regex}', '.*').split('\n')
+    n_imports = 0
+    while n_imports < len(lines) and (lines[n_imports].startswith('import ') or not lines[n_imports].strip()):
+        n_imports += 1
+    return '\n'.join(lines[:n_imports] + [v] + lines[n_imports:])
+
+
+def bench(ranges, repeat):
+    stop = datetime.now(timezone.utc)
+    with client() as c:
+        query = c.query_api()
+        print(f"{'dashboard':<6} {'panel':<44} {'range':>5} {'raw ms':>8} {'rollup ms':>9} {'speedup':>7}")
+        for crane_type, path in DASHBOARDS.items():
+            with open(path, encoding='utf-8') as f:
+                dash = json.load(f)
+            for panel in dash['panels']:
+                targets = {t.get('refId'): t['query'] for t in panel['targets']}
+                if 'RAW' not in targets:
+                    continue
+                for days in ranges:
+                    timings = {}
+                    for ref in ('RAW', 'A'):
+                        flux = with_range(targets[ref], days, stop)
+                        samples = []
+                        for _ in range(repeat):
+                            t0 = time.perf_counter()
+                            query.query(flux)
+                            samples.append((time.perf_counter() - t0) * 1000)
+                        timings[ref] = statistics.median(samples)
+                    print(f"{crane_type:<6} {panel.get('title', '')[:44]:<44} {days:>4}d {timings['RAW']:>8.0f} "
+                          f"{timings['A']:>9.0f} {timings['RAW'] / max(timings['A'], 1e-3):>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Provision InfluxDB rollup buckets/tasks and move the dashboards onto them",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('provision', help='Create the rollup buckets and create/update the tasks')
+    p_back = sub.add_parser('backfill', help='Recompute rollups for past days')
+    p_back.add_argument('--days', type=int, default=120)
+    sub.add_parser('dashboards', help='Regenerate grafana/dashboards/*.json (deploy_dashboards.py build)')
+    p_bench = sub.add_parser('bench', help='Median panel query latency, raw vs rollup')
+    p_bench.add_argument('--ranges', default='7,30,90', help='Comma-separated range lengths in days')
+    p_bench.add_argument('--repeat', type=int, default=5)
+    sub.add_parser('show', help='Print the task Flux')
+    args = parser.parse_args()
+
+    if args.cmd == 'provision':
+        provision()
+    elif args.cmd == 'backfill':
+        backfill(args.days)
+    elif args.cmd == 'dashboards':
+        rewrite_dashboards()
+    elif args.cmd == 'bench':
+        bench([int(d) for d in args.ranges.split(',')], args.repeat)
+    else:
+        for name, flux in TASKS.items():
+            print(f"// ---- {name}\n{flux()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+"""
+flux_pushdown.py — 대시보드 Flux 쿼리 분석기 / 재작성기 (스토리지 pushdown 저해 패턴)
+
+InfluxDB 는 from() |> range() |> filter() 로 시작하는 구간을 스토리지 엔진에서 직접 처리한다(pushdown).
+grafana/dashboards/*.json 의 모든 패널 쿼리를 파싱해 이 구간을 끊거나 넓히는 패턴을 찾고 고친다.
+
+  규칙 (자동 수정 = *):
+    string-time*      timeStart = if string(v: v.timeRangeStart) < "..." → 시간 값 직접 비교
+    or-chain*         r["source"] == "a" or r["source"] == "b" → r["source"] =~ /^(a|b)$/  (_field 포함)
+    crane-id-prefix*  r["crane_id"] =~ /^2.*/ → r["crane_type"] == "ARMGC"
+                      range 시작이 CRANE_TYPE_SINCE 이후로 고정된 쿼리만 수정 (그 이전 재처리 데이터는
+                      crane_type 태그가 없음: unify_v24 / precise_downscale / force_smooth_history)
+    late-tag-filter*  pivot / map 뒤의 태그 전용 filter → pushdown 구간(pivot 앞)으로 이동
+    group-time*       pivot 앞 group(columns: ["_time", ...]) (이벤트마다 테이블 1개) → 제거 (뒤에 group() 이 있을 때)
+    wide-pivot        _field 를 좁히지 않은 pivot (보고만)
+
+  fixture : 로컬 InfluxDB 에 FIXTURE_BUCKET 을 만들고 운영과 같은 태그/필드 구성의 합성 이벤트를 쓴다
+            (CRANE_TYPE_SINCE 이전은 crane_type 태그 없는 v24_unified, 이후는 live_v26 / live_qc_v30).
+  bench   : 수정되는 패널 타깃마다 원본 / 재작성 쿼리를 fixture 버킷에 실행 → 중앙값 지연과 결과 일치 여부.
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - 운영 버킷(cranepdm_kpis)에 쓰지 않는다. fixture / bench 는 FIXTURE_BUCKET 만 사용한다.
+
+사용 예:
+  python scripts/maintenance/flux_pushdown.py lint
+  python scripts/maintenance/flux_pushdown.py rewrite --dry-run     # 변경 diff 만 출력
+  python scripts/maintenance/flux_pushdown.py fixture --days 180
+  python scripts/maintenance/flux_pushdown.py bench --ranges 7,30,90
+  python scripts/maintenance/flux_pushdown.py rewrite               # grafana/dashboards/*.json 갱신
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from deploy_rollups import INFLUX_ORG, INFLUX_TOKEN, INFLUX_URL, with_range
+
+FIXTURE_BUCKET = "cranepdm_fixture"
+CRANE_TYPE_SINCE = "2026-05-15T00:00:00Z"  # Every crane_movement point from here on carries crane_type
+CRANE_PREFIX_TYPE = {'1': 'QC', '2': 'ARMGC'}
+TAGS = {'crane_id', 'crane_type', 'component', 'source', 'algo_version', 'is_loaded', 'fault_name'}
+PUSHDOWN = {'range', 'filter'}
+CROSSABLE = {'pivot', 'filter', 'group', 'sort', 'keep', 'drop'}  # Row-preserving: a tag filter commutes with them
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DASHBOARD_GLOB = os.path.join(ROOT, 'grafana', 'dashboards', '*.json')
+
+STRING_TIME = re.compile(r'string\(v: (v\.timeRange(?:Start|Stop))\) (<=|>=|<|>) "(\d{4}-\d\d-\d\dT[\d:.]+Z)"')
+TIME_LITERAL = re.compile(r'\d{4}-\d\d-\d\dT[\d:.]+Z')
+COLUMN_REF = re.compile(r'\br(?:\["(\w+)"\]|\.(\w+))')
+OR_CHAIN = re.compile(r'(\()?\s*r\["(\w+)"\] == "([^"\\]*)"((?:\s+or\s+r\["\2"\] == "[^"\\]*")+)\s*(?(1)\))')
+CRANE_PREFIX = re.compile(r'r\["crane_id"\] =~ /\^(\d)(?:\.\*)?/')
+
+# ---------------------------------------------------------------- parsing
+
+def scan(text):
+    """Depth-0 offsets of '|>' and newlines, skipping strings, regex literals and comments."""
+    pipes, newlines = [], []
+    depth = i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '"' or (c == '/' and re.search(r'[=!]~\s*$', text[max(0, i - 8):i])):
+            i += 1
+            while i < len(text) and text[i] != c:
+                i += 2 if text[i] == '\\' else 1
+        elif text.startswith('//', i):
+            while i < len(text) and text[i] != '\n':
+                i += 1
+            continue
+        elif c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif depth == 0 and text.startswith('|>', i):
+            pipes.append(i)
+        elif depth == 0 and c == '\n':
+            newlines.append(i)
+        i += 1
+    return pipes, newlines
+
+
+class Stage:
+    """One `|> name(args)` step; `sep` / `lead` keep the original whitespace so untouched stages render verbatim."""
+    def __init__(self, text, sep='\n  ', lead=' '):
+        self.sep = sep
+        self.lead = lead
+        self.text = text
+
+    @property
+    def name(self):
+        m = re.match(r'\s*([\w.]+)\s*\(', self.text)
+        return m.group(1) if m else ''
+
+    @property
+    def args(self):
+        return self.text[self.text.find('(') + 1:self.text.rfind(')')]
+
+    @property
+    def predicate(self):
+        """Body of fn: (r) => ... for filter/map, else ''."""
+        m = re.search(r'fn:\s*\(r\)\s*=>\s*(.*)', self.args, re.S)
+        return m.group(1).strip() if m else ''
+
+    def columns(self):
+        return {a or b for a, b in COLUMN_REF.findall(self.predicate)}
+
+
+class Statement:
+    def __init__(self, text):
+        pipes, _ = scan(text)
+        bounds = [0] + pipes + [len(text)]
+        pieces = [text[:bounds[1]]] + [text[p + 2:q] for p, q in zip(pipes, bounds[2:])]
+        self.head = pieces[0].rstrip()
+        sep = pieces[0][len(self.head):]
+        self.stages = []
+        for piece in pieces[1:]:
+            core = piece.strip()
+            lead = piece[:len(piece) - len(piece.lstrip())]
+            self.stages.append(Stage(core, sep=sep, lead=lead))
+            sep = piece[len(lead) + len(core):]
+
+    def render(self):
+        return self.head + ''.join(f"{s.sep}|>{s.lead}{s.text}" for s in self.stages)
+
+
+class Program:
+    """Flux text as statements + the whitespace between them; render() reproduces the input exactly."""
+    def __init__(self, text):
+        pipes, newlines = scan(text)
+        pipe_set = set(pipes)
+        self.parts = []
+        start = 0
+        for nl in newlines + [len(text)]:
+            j = nl
+            while j < len(text) and text[j] in ' \t\r\n':
+                j += 1
+            if j in pipe_set:
+                continue  # the pipeline continues on the next line
+            segment = text[start:nl]
+            body = segment.strip()
+            if body:
+                lead = segment[:len(segment) - len(segment.lstrip())]
+                self.parts += [lead, Statement(body), segment[len(lead) + len(body):]]
+            else:
+                self.parts.append(segment)
+            start = nl
+        self.parts.append(text[start:])
+
+    @property
+    def statements(self):
+        return [p for p in self.parts if isinstance(p, Statement)]
+
+    def assignment(self, name):
+        for st in self.statements:
+            m = re.match(rf'{re.escape(name)}\s*=\s*(.*)', st.render(), re.S)
+            if m:
+                return m.group(1)
+        return None
+
+    def render(self):
+        return ''.join(p.render() if isinstance(p, Statement) else p for p in self.parts)
+
+# ---------------------------------------------------------------- rules
+
+def range_start_since(program, st):
+    """Earliest time the statement's range() can start at, if it is pinned by a literal (clamp) — else None."""
+    rng = next((s for s in st.stages if s.name == 'range'), None)
+    m = re.search(r'start:\s*([^,)]+)', rng.args) if rng else None
+    if not m:
+        return None
+    expr = m.group(1).strip()
+    if TIME_LITERAL.fullmatch(expr):
+        return expr
+    defined = program.assignment(expr)
+    if defined and re.match(r'if\b.*\bthen\b.*\belse\b', defined, re.S):
+        times = TIME_LITERAL.findall(defined)
+        return max(times) if times else None
+    return None
+
+
+def rule_or_chain(stage):
+    def to_regex(m):
+        values = [m.group(3)] + re.findall(r'== "([^"\\]*)"', m.group(4))
+        alternation = '|'.join(re.escape(v).replace('/', r'\/') for v in values)
+        return f'r["{m.group(2)}"] =~ /^({alternation})$/'
+
+    pred = stage.predicate
+    out, findings = pred, []
+    for m in OR_CHAIN.finditer(pred):
+        if m.group(1) or m.group(0).strip() == pred:  # parenthesized, or the whole predicate (`and` binds tighter)
+            findings.append(f'{m.group(2)}: {1 + m.group(4).count(" or ")} values')
+            out = out.replace(m.group(0).strip(), to_regex(m), 1)
+    if findings:
+        stage.text = stage.text.replace(pred, out, 1)
+    return findings
+
+
+def analyze(query, fix=True):
+    """-> (rewritten query, [(rule, detail, fixed)])."""
+    findings = []
+    for m in STRING_TIME.finditer(query):
+        findings.append(('string-time', f'{m.group(1)} {m.group(2)} "{m.group(3)}"', True))
+    query = STRING_TIME.sub(r'\1 \2 \3', query)
+
+    program = Program(query)
+    for st in program.statements:
+        stages = st.stages
+        if not any(s.name == 'range' for s in stages):
+            continue
+        for s in stages:
+            if s.name != 'filter':
+                continue
+            findings += [('or-chain', d, True) for d in rule_or_chain(s)]
+            for m in CRANE_PREFIX.finditer(s.predicate):
+                crane_type = CRANE_PREFIX_TYPE.get(m.group(1))
+                since = range_start_since(program, st)
+                safe = crane_type and since is not None and since >= CRANE_TYPE_SINCE
+                findings.append(('crane-id-prefix', f'{m.group(0)} (range from {since or "unbounded"})', bool(safe)))
+                if safe:
+                    s.text = s.text.replace(m.group(0), f'r["crane_type"] == "{crane_type}"', 1)
+
+        # group(columns: ["_time", ...]) straight before a pivot; a later group() restores the layout
+        for k, s in enumerate(stages[:-1]):
+            if (s.name == 'group' and '"_time"' in s.args and stages[k + 1].name == 'pivot'
+                    and any(t.name == 'group' and not t.args.strip() for t in stages[k + 2:])):
+                findings.append(('group-time', s.text, True))
+                stages[k + 1].sep = s.sep
+                del stages[k]
+                break
+
+        barrier = next((k for k, s in enumerate(stages) if s.name not in PUSHDOWN), len(stages))
+        k = barrier
+        while k < len(stages):
+            s = stages[k]
+            cols = s.columns()
+            if s.name == 'filter' and cols and cols <= TAGS and k > barrier:
+                between = stages[barrier:k]
+                movable = all(
+                    t.name in CROSSABLE or (t.name == 'map' and re.match(r'\(\{\s*r with\b', t.predicate)
+                                            and not cols & set(re.findall(r'(\w+):', t.predicate)))
+                    for t in between)
+                findings.append(('late-tag-filter', f'{s.text} (after {stages[barrier].name})', movable))
+                if movable:
+                    stages.insert(barrier, stages.pop(k))
+                    stages[barrier].sep = '\n  '
+                    barrier += 1
+            k += 1
+
+        for k, s in enumerate(stages):
+            if s.name == 'pivot' and '_field' in s.args and '"crane_movement"' in st.render():
+                narrowed = any(t.name == 'filter' and '_field' in t.columns() for t in stages[:k])
+                if not narrowed:
+                    findings.append(('wide-pivot', 'pivot over every field of the measurement', False))
+    return (program.render() if fix else query), findings
+
+
+def dashboard_targets():
+    """Yields (path, dashboard, panel, target) for every Flux target."""
+    for path in sorted(glob.glob(DASHBOARD_GLOB)):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        dash = data.get('dashboard', data)
+        for panel in dash.get('panels', []):
+            for target in panel.get('targets', []):
+                if target.get('query'):
+                    yield path, data, panel, target
+
+
+def lint():
+    total = fixable = 0
+    for path, _, panel, target in dashboard_targets():
+        _, findings = analyze(target['query'], fix=False)
+        for rule, detail, fixed in findings:
+            total += 1
+            fixable += fixed
+            print(f"{os.path.basename(path)} panel {panel['id']} {target.get('refId')}: "
+                  f"{'*' if fixed else ' '} {rule:<16} {detail}")
+    print(f"{total} findings, {fixable} auto-fixable (*)")
+
+
+def rewrite(dry_run):
+    files = {}
+    for path, data, panel, target in dashboard_targets():
+        new, findings = analyze(target['query'])
+        if new == target['query']:
+            continue
+        if dry_run:
+            print(f"--- {os.path.basename(path)} panel {panel['id']} {target.get('refId')}: {panel.get('title')}")
+            print(''.join(difflib.unified_diff(target['query'].splitlines(True), new.splitlines(True), n=1))[:4000])
+        target['query'] = new
+        files[path] = data
+        print(f"[{os.path.basename(path)}] panel {panel['id']} {target.get('refId')}: "
+              f"{', '.join(sorted({r for r, _, fixed in findings if fixed}))}")
+    if not dry_run:
+        for path, data in files.items():
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+    print(f"{len(files)} dashboard file(s) {'would change' if dry_run else 'updated'}")
+
+# ---------------------------------------------------------------- fixture + bench
+
+def fixture(days, events, reset):
+    from influxdb_client import InfluxDBClient
+    from influxdb_client.client.write_api import SYNCHRONOUS
+
+    rng = random.Random(7)
+    armgc = [f"2{row}{n}" for row in range(1, 7) for n in range(1, 7)] + ['271', '272']
+    qc = [f"1{n:02d}" for n in range(1, 13)]
+    tagged_since = datetime.fromisoformat(CRANE_TYPE_SINCE.replace('Z', '+00:00'))
+    with InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG, timeout=600_000) as client:
+        buckets = client.buckets_api()
+        bucket = buckets.find_bucket_by_name(FIXTURE_BUCKET)
+        if bucket and reset:
+            buckets.delete_bucket(bucket)
+            bucket = None
+        if not bucket:
+            buckets.create_bucket(bucket_name=FIXTURE_BUCKET, org=INFLUX_ORG)
+        write_api = client.write_api(write_options=SYNCHRONOUS)
+        end = datetime.now(timezone.utc)
+        t0 = time.time()
+        n = 0
+        for d in range(days, 0, -1):
+            day = end - timedelta(days=d)
+            lines = []
+            for cid in armgc + qc:
+                for _ in range(events):
+                    t = day + timedelta(seconds=rng.uniform(0, 86400))
+                    shock = rng.uniform(1.0, 2.5)
+                    curr = rng.uniform(1.0, 2.0)
+                    if cid in qc:
+                        tags = 'crane_type=QC,component=SpreaderCable,source=live_qc_v30,algo_version=3.0'
+                        load = rng.uniform(1.0, 3.0)
+                    elif t >= tagged_since:
+                        tags = 'crane_type=ARMGC,component=CableReel,source=live_v26,algo_version=2.6.1'
+                        load = rng.uniform(1.0, 1.8)
+                    else:  # Rewritten history: no crane_type / component tags, older sources kept alongside
+                        source = 'v24_unified' if rng.random() < 0.8 else 'csv_backup_before_apr9_v24'
+                        tags = f'source={source},algo_version=2.4'
+                        load = rng.uniform(1.0, 1.8)
+                    tags += f',is_loaded={"Loaded" if rng.random() < 0.6 else "Empty"}'
+                    peak = rng.lognormvariate(2.4, 0.45)
+                    duration = rng.uniform(5, 90)
+                    pos = rng.uniform(0, 1200)
+                    fields = {
+                        'duration_s': duration, 'peak_order': rng.uniform(800, 1500), 'reducer_damage':
+                        shock * curr * load * duration / 10.0, 'shock_penalty': shock, 'peak_shock': peak,
+                        'curr_penalty': curr, 'track_penalty': load, 'load_factor': load,
+                        'stress_index': shock * curr * load, 'start_pos': pos, 'end_pos': pos + rng.uniform(-200, 200),
+                        'avg_pos': pos, 'peak_shock_pos': pos + rng.uniform(-50, 50),
+                    }
+                    body = ','.join(f'{k}={v:.4f}' for k, v in fields.items())
+                    lines.append(f"crane_movement,crane_id={cid},{tags} {body} {int(t.timestamp() * 1e9)}")
+            for i in range(0, len(lines), 5000):
+                write_api.write(bucket=FIXTURE_BUCKET, org=INFLUX_ORG, record=lines[i:i + 5000])
+            n += len(lines)
+        print(f"{FIXTURE_BUCKET}: {n} events ({len(armgc)} ARMGC + {len(qc)} QC cranes x {events}/day x {days} days) "
+              f"in {time.time() - t0:.0f}s")
+
+
+def result_rows(tables):
+    rows = []
+    for table in tables:
+        for rec in table.records:
+            rows.append(tuple(sorted((k, round(v, 6) if isinstance(v, float) else str(v))
+                                     for k, v in rec.values.items() if k not in ('result', 'table'))))
+    return sorted(rows)
+
+
+def bench(ranges, repeat):
+    from influxdb_client import InfluxDBClient
+
+    stop = datetime.now(timezone.utc)
+    on_fixture = lambda q: re.sub(r'from\(bucket: "cranepdm_\w+"\)', f'from(bucket: "{FIXTURE_BUCKET}")', q)
+    with InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG, timeout=600_000) as client:
+        query_api = client.query_api()
+        print(f"{'panel':<48} {'range':>5} {'before ms':>9} {'after ms':>8} {'speedup':>7}  result")
+        for path, _, panel, target in dashboard_targets():
+            new, _ = analyze(target['query'])
+            if new == target['query']:
+                continue
+            label = f"{os.path.basename(path)[:-5]} {panel['id']} {target.get('refId')} {panel.get('title', '')}"
+            for days in ranges:
+                timings, results = [], []
+                for flux in (target['query'], new):
+                    flux = on_fixture(with_range(flux, days, stop))
+                    samples = []
+                    for _ in range(repeat):
+                        t0 = time.perf_counter()
+                        tables = query_api.query(flux)
+                        samples.append((time.perf_counter() - t0) * 1000)
+                    timings.append(statistics.median(samples))
+                    results.append(result_rows(tables))
+                same = 'same' if results[0] == results[1] else f'DIFFERS ({len(results[0])} vs {len(results[1])} rows)'
+                print(f"{label[:48]:<48} {days:>4}d {timings[0]:>9.0f} {timings[1]:>8.0f} "
+                      f"{timings[0] / max(timings[1], 1e-3):>6.1f}x  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find and rewrite Flux patterns that defeat storage pushdown in grafana/dashboards/*.json",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('lint', help='List findings per panel target')
+    p_rw = sub.add_parser('rewrite', help='Apply the auto-fixes to the dashboard JSON')
+    p_rw.add_argument('--dry-run', action='store_true', help='Print diffs, write nothing')
+    p_fx = sub.add_parser('fixture', help=f'Load synthetic crane_movement events into {FIXTURE_BUCKET}')
+    p_fx.add_argument('--days', type=int, default=180)
+    p_fx.add_argument('--events', type=int, default=80, help='Events per crane per day')
+    p_fx.add_argument('--reset', action='store_true', help='Drop and recreate the fixture bucket first')
+    p_bench = sub.add_parser('bench', help='Median runtime before/after rewrite on the fixture bucket')
+    p_bench.add_argument('--ranges', default='7,30,90', help='Comma-separated range lengths in days')
+    p_bench.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == 'lint':
+        lint()
+    elif args.cmd == 'rewrite':
+        rewrite(args.dry_run)
+    elif args.cmd == 'fixture':
+        fixture(args.days, args.events, args.reset)
+    else:
+        bench([int(d) for d in args.ranges.split(',')], args.repeat)
+
+
+if __name__ == '__main__':
+    main()
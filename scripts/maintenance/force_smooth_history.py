@@ -52,7 +52,7 @@ for date, group in df.groupby('date'):
         p = Point("crane_movement").tag("crane_id", str(row['crane_id'])).tag("algo_version", "2.6.1").tag("source", "live_v26").time(row['_time'])
         
         for col in df.columns:
-            if col not in ['_time', 'crane_id', 'date', 'reducer_damage', 'shock_penalty', 'curr_penalty']:
+            if col not in ['_time', 'crane_id', 'date', 'reducer_damage', 'shock_penalty', 'curr_penalty', 'stress_index']:
                 val = row[col]
                 if pd.notnull(val):
                     if isinstance(val, str):
@@ -63,6 +63,9 @@ for date, group in df.groupby('date'):
         p.field("reducer_damage", float(new_damage))
         p.field("shock_penalty", float(new_shock))
         p.field("curr_penalty", float(new_curr))
+        track = row.get('track_penalty')
+        if pd.notnull(track):
+            p.field("stress_index", float(new_shock) * float(new_curr) * float(track))
         
         pts.append(p)
 
@@ -0,0 +1,112 @@
+"""
+plc_read.py — 실행 중인 crane_edge_logger 의 PLC 브로커를 통해 PLC 값을 읽는 진단 도구
+
+운영 PLC 는 S7 접속 슬롯이 적으므로 진단 스크립트가 snap7 으로 직접 접속하지 않는다.
+이 도구는 로거가 이미 열어 둔 세션으로 읽기를 요청하거나(크레인당 BROKER_READ_RATE 제한),
+로거가 수집하는 실시간 샘플을 구독한다. 쓰기 기능은 없다.
+
+사용 예:
+  python scripts/maintenance/plc_read.py cranes
+  python scripts/maintenance/plc_read.py read 264 DB170 0 6          # 릴 속도/전류/토크 (INT x3)
+  python scripts/maintenance/plc_read.py read 264 DB57 8 2           # Gantry Order Speed
+  python scripts/maintenance/plc_read.py read 264 M 450 2            # MW450
+  python scripts/maintenance/plc_read.py watch 235 264               # 실시간 샘플 (Ctrl+C 종료)
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+
+class BrokerClient:
+    """Connection to the logger's PLC broker (127.0.0.1:BROKER_PORT, per-install key IPC_KEY_FILE)."""
+    def __init__(self, port=logger.BROKER_PORT):
+        try:
+            self.conn = Client(('127.0.0.1', port), authkey=logger.ipc_authkey())
+        except ConnectionRefusedError:
+            raise SystemExit(f"[!] crane_edge_logger broker is not running on port {port}.")
+        except AuthenticationError:
+            raise SystemExit(f"[!] Broker rejected the key in {logger.IPC_KEY_FILE} "
+                             f"(run as the logger's Windows account, or set CRANEPDM_IPC_KEY).")
+
+    def request(self, *msg):
+        self.conn.send(msg)
+        status, value = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(value)
+        return value
+
+    def read(self, crane_id, area, db, start, size):
+        """Raw bytes via the logger's session. area: 'DB' or 'M'."""
+        return self.request('read', crane_id, area, db, start, size)
+
+    def cranes(self):
+        return self.request('cranes')
+
+    def subscribe(self, crane_ids=None):
+        """Yields (crane_id, t, kind, values) for every sample the logger takes."""
+        self.conn.send(('subscribe', list(crane_ids) if crane_ids else None))
+        while True:
+            _, batch, dropped = self.conn.recv()
+            if dropped:
+                print(f"[!] {dropped} samples dropped (reader too slow)", file=sys.stderr)
+            yield from batch
+
+
+def parse_area(text):
+    """'DB170' -> ('DB', 170), 'M' -> ('M', 0)."""
+    text = text.upper()
+    if text == 'M':
+        return 'M', 0
+    if text.startswith('DB') and text[2:].isdigit():
+        return 'DB', int(text[2:])
+    raise argparse.ArgumentTypeError(f"area must be DB<n> or M, not {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Read PLC values through the running logger (no extra S7 connection)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('cranes', help='List cranes and whether their PLC session is up')
+    p_read = sub.add_parser('read', help='On-demand read: crane area start size')
+    p_read.add_argument('crane')
+    p_read.add_argument('area', type=parse_area, help='DB<n> or M')
+    p_read.add_argument('start', type=int)
+    p_read.add_argument('size', type=int)
+    p_watch = sub.add_parser('watch', help='Stream live samples')
+    p_watch.add_argument('cranes', nargs='*', help='Crane ids (default: all)')
+    args = parser.parse_args()
+
+    client = BrokerClient()
+    if args.cmd == 'cranes':
+        for cid, connected in sorted(client.cranes().items()):
+            print(f"{cid}: {'connected' if connected else 'DOWN'}")
+    elif args.cmd == 'read':
+        area, db = args.area
+        try:
+            data = client.read(args.crane, area, db, args.start, args.size)
+        except RuntimeError as e:
+            raise SystemExit(f"[!] {e}")
+        print(f"[{args.crane}] {area}{db if area == 'DB' else ''} @{args.start}: {data.hex(' ')}")
+        if len(data) % 2 == 0:
+            ints = struct.unpack(f'>{len(data) // 2}h', data)
+            print("INT: " + ", ".join(f"+{args.start + 2 * i}={v}" for i, v in enumerate(ints)))
+    else:
+        try:
+            for cid, t, kind, values in client.subscribe(args.cranes):
+                print(f"{time.strftime('%H:%M:%S', time.localtime(t))}.{int(t % 1 * 1000):03d} [{cid}] {kind}: {values}")
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
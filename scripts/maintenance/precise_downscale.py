@@ -41,7 +41,7 @@ for _, row in df.iterrows():
         .time(row['_time']))
         
     for col in df.columns:
-        if col not in ['_time', 'crane_id', 'algo_version', 'source', 'shock_penalty', 'curr_penalty', 'reducer_damage']:
+        if col not in ['_time', 'crane_id', 'algo_version', 'source', 'shock_penalty', 'curr_penalty', 'reducer_damage', 'stress_index']:
             val = row[col]
             if pd.notnull(val):
                 if isinstance(val, str):
@@ -52,6 +52,9 @@ for _, row in df.iterrows():
     p.field("shock_penalty", new_shock)
     p.field("curr_penalty", new_curr)
     p.field("reducer_damage", new_damage)
+    track = row.get('track_penalty')
+    if pd.notnull(track):
+        p.field("stress_index", new_shock * new_curr * float(track))
     
     points.append(p)
 
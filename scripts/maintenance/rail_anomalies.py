@@ -0,0 +1,80 @@
+"""
+rail_anomalies.py — 레일 구간 손상도 큐브(rail_cube.sqlite)로 레일 이상 구간(침하·이음부) 전수 검출 / 조회
+
+crane_edge_logger.py 의 RailAnomalyDetector 가 매일 전날까지의 큐브로 이상 구간을 갱신한다 (증분).
+이 도구는 같은 검출기로 전체 이력을 다시 훑거나 (scan) 현재 구간 상태를 출력한다 (sites).
+
+  판정 (같은 블록 = 같은 레일을 쓰는 2<블록>x 호기들):
+    호기별로 최근 RAIL_ANOMALY_WINDOW_D 일의 10 m 구간 평균 충격 ÷ 그 호기의 구간 중앙값 = 비율.
+    비율 RAIL_ANOMALY_RATIO 이상인 호기가 RAIL_ANOMALY_CRANES 대 이상이고, 그 구간에 데이터가 있는
+    호기의 RAIL_ANOMALY_SHARE 이상이면 그날 그 구간은 이상. 한 호기만 높으면 호기(릴/운전) 문제로 본다.
+  상태: active (이상 지속) → 데이터가 있는 정상일이 RAIL_RECOVER_D 일 연속이면 recovered (보수 효과 확인)
+        → 다시 이상이면 active (reopened 로그).
+
+  scan  : 상태를 지우고 전체 이력을 다시 계산 (backfill_rail_cube.py 실행 후, 임계값 변경 후).
+          rail_anomaly 포인트도 다시 쓴다 (같은 시리즈·자정 타임스탬프라 덮어씀).
+  sites : 현재 구간 상태 표 (기본 active 만, --all 은 recovered 포함).
+
+안전 원칙 (AI_GUIDE.md 준수):
+  - 큐브(cells)는 읽기만 한다. rail_sites / rail_meta 상태 테이블만 다시 만든다.
+  - 로거 PC 에서 실행한다 (큐브는 노드별 파일. LEASE_DB 운영 시 그 노드 호기만 비교된다).
+
+사용 예:
+  python scripts/maintenance/rail_anomalies.py scan --no-write
+  python scripts/maintenance/rail_anomalies.py scan
+  python scripts/maintenance/rail_anomalies.py sites --all
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import crane_edge_logger as logger
+
+
+def scan(write):
+    detector = logger.RAIL_ANOMALY
+    t0 = time.time()
+    messages = detector.scan(write=write)
+    if write:
+        logger.write_api.close()  # batched writer: flush before exit
+    for message in messages:
+        print(f"  {message}")
+    active = sum(1 for s in detector.sites.values() if s['status'] == 'active')
+    print(f"through {detector.day}: {len(detector.sites)} sites ({active} active) in {time.time() - t0:.1f}s")
+
+
+def sites(show_all):
+    detector = logger.RAIL_ANOMALY
+    print(f"processed through {detector.day or '-'}  (bin {logger.RAIL_BIN_M} m)")
+    print(f"{'block':>5} {'position (m)':>13} {'status':>9} {'first':>10} {'last':>10} {'recovered':>10} "
+          f"{'days':>5} {'peak x':>7} {'cranes':>6}")
+    for (block, rail_bin), s in sorted(detector.sites.items()):
+        if s['status'] != 'active' and not show_all:
+            continue
+        print(f"{block:>5} {f'{rail_bin}-{rail_bin + logger.RAIL_BIN_M}':>13} {s['status']:>9} {s['first_day']:>10} "
+              f"{s['last_day']:>10} {s['recovered_day'] or '-':>10} {s['flagged_days']:>5} "
+              f"{s['peak_ratio']:>7.2f} {s['cranes']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cross-crane rail anomaly detection on the rail damage cube",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('scan', help='Reset the site states and replay the whole cube history')
+    p.add_argument('--no-write', action='store_true', help='Do not write rail_anomaly points to InfluxDB')
+    p = sub.add_parser('sites', help='List rail sites')
+    p.add_argument('--all', action='store_true', help='Include recovered sites')
+    args = parser.parse_args()
+    logger.RAIL_ANOMALY.open(os.path.join(ROOT, logger.RAIL_CUBE_DB))
+    if args.cmd == 'scan':
+        scan(not args.no_write)
+    elif args.cmd == 'sites':
+        sites(args.all)
+
+
+if __name__ == '__main__':
+    main()
@@ -101,6 +101,7 @@ for idx, row in df_all.iterrows():
         .field("curr_penalty", round(new_curr, 3))
         .field("track_penalty", round(load_factor, 3))
         .field("load_factor", round(load_factor, 3))
+        .field("stress_index", round(new_shock, 3) * round(new_curr, 3) * round(load_factor, 3))
         .field("start_pos", 0.0)
         .field("end_pos", 0.0)
         .field("avg_pos", 0.0)
@@ -283,6 +283,7 @@ def main():
                     .field("shock_penalty", float(new_shock)) \
                     .field("curr_penalty", float(new_curr)) \
                     .field("track_penalty", float(new_track)) \
+                    .field("stress_index", float(new_shock) * float(new_curr) * float(new_track)) \
                     .field("peak_shock", float(r["peak_shock"] or 1.0)) \
                     .field("peak_order", float(r["peak_order"] or 0)) \
                     .field("avg_pos", float(avg_pos)) \
@@ -339,6 +340,7 @@ def main():
                     .field("shock_penalty", float(kpis['shock_penalty'])) \
                     .field("curr_penalty", float(kpis['curr_penalty'])) \
                     .field("track_penalty", float(kpis['track_penalty'])) \
+                    .field("stress_index", float(kpis['shock_penalty']) * float(kpis['curr_penalty']) * float(kpis['track_penalty'])) \
                     .field("peak_shock", float(kpis['peak_shock'])) \
                     .field("peak_order", float(kpis['peak_order'])) \
                     .field("avg_pos", float(kpis['avg_pos'])) \
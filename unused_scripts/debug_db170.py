@@ -1,33 +1,42 @@
-import snap7
-from snap7.util import get_int
+from multiprocessing.connection import Client
+import os
+import struct
+import sys
 
-ip = "10.200.71.43"
-rack = 0
-slot = 2
+# Reads go through the running crane_edge_logger (PLC broker), never a second S7
+# session on the production PLC. Port and key come from crane_edge_logger.py.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crane_edge_logger import BROKER_PORT, ipc_authkey
 
-client = snap7.client.Client()
-print(f"Connecting to Crane 264 at {ip}...")
+crane_id = "264"
+
+def get_int(data, offset):
+    return struct.unpack_from('>h', data, offset)[0]
+
+print(f"Connecting to logger broker for Crane {crane_id}...")
 try:
-    client.connect(ip, rack, slot)
+    broker = Client(('127.0.0.1', BROKER_PORT), authkey=ipc_authkey())
     print("Connected successfully.")
-    
+
     # Try reading DB57 (sanity check)
-    try:
-        db57 = client.db_read(57, 8, 2)
+    broker.send(('read', crane_id, 'DB', 57, 8, 2))
+    status, db57 = broker.recv()
+    if status == 'ok':
         print(f"DB57 read success: {get_int(db57, 0)}")
-    except Exception as e:
-        print(f"Failed to read DB57: {e}")
+    else:
+        print(f"Failed to read DB57: {db57}")
 
     # Try reading DB170
-    try:
-        db170 = client.db_read(170, 0, 6)
+    broker.send(('read', crane_id, 'DB', 170, 0, 6))
+    status, db170 = broker.recv()
+    if status == 'ok':
         print("DB170 read success!")
         print(f"Speed: {get_int(db170, 0)}")
         print(f"Current: {get_int(db170, 2)}")
         print(f"Torque: {get_int(db170, 4)}")
-    except Exception as e:
-        print(f"Failed to read DB170! Error type: {type(e).__name__}, Message: {e}")
+    else:
+        print(f"Failed to read DB170! {db170}")
 
-    client.disconnect()
+    broker.close()
 except Exception as e:
-    print(f"Connection failed: {e}")
+    print(f"Connection failed (is crane_edge_logger running?): {e}")
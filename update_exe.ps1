@@ -1,10 +1,45 @@
-Write-Host "Killing existing crane_edge_logger.exe..."
-Get-CimInstance Win32_Process -Filter "Name='crane_edge_logger.exe'" | Invoke-CimMethod -MethodName Terminate | Out-Null
-Start-Sleep -Seconds 2
+# Hot restart: the new exe connects to the PLCs while the old one keeps logging, then the
+# old one hands over its in-flight events and exits (crane_edge_logger.py, HANDOFF_PORT).
+# A running exe cannot be overwritten but can be renamed, so the old file is moved aside.
+# Only when the old process listens on HANDOFF_PORT: an older build, ACQUISITION_MODE
+# "processes" or LEASE_DB mode has no handoff, and starting a second logger next to it
+# would open a second S7 session per PLC (AI_GUIDE.md: one) and log every event twice.
+# A listener with another key (a build from before IPC_KEY_FILE) cannot hand over: the new
+# exe then waits for the port to close, i.e. until the old process is killed below.
+$exe = "deploy_package\crane_edge_logger.exe"
+$oldExe = "deploy_package\crane_edge_logger.old.exe"
+$handoffPort = 47651  # HANDOFF_PORT
+$running = Get-CimInstance Win32_Process -Filter "Name='crane_edge_logger.exe'"
+$handoff = $running -and (Test-NetConnection -ComputerName 127.0.0.1 -Port $handoffPort `
+    -InformationLevel Quiet -WarningAction SilentlyContinue)
+
+if (-not $handoff -and $running) {
+    Write-Host "No handoff listener on port $handoffPort, killing existing crane_edge_logger.exe..."
+    $running | Invoke-CimMethod -MethodName Terminate | Out-Null
+    Start-Sleep -Seconds 2
+}
 
 Write-Host "Updating executable..."
-Move-Item -Path dist\crane_edge_logger.exe -Destination deploy_package\crane_edge_logger.exe -Force
+Remove-Item -Path $oldExe -Force -ErrorAction SilentlyContinue
+if (Test-Path $exe) { Move-Item -Path $exe -Destination $oldExe -Force }
+Move-Item -Path dist\crane_edge_logger.exe -Destination $exe -Force
+
+if ($handoff) {
+    Write-Host "Starting new executable (takes over from the running one)..."
+} else {
+    Write-Host "Starting new executable..."
+}
+Start-Process -FilePath $exe -WindowStyle Hidden
 
-Write-Host "Starting new executable..."
-Start-Process -FilePath deploy_package\crane_edge_logger.exe -WindowStyle Hidden
+if ($handoff) {
+    foreach ($p in $running) {
+        # Handoff waits for PLC connects (~15 s for the full fleet, at most HANDOFF_WARMUP_S)
+        Wait-Process -Id $p.ProcessId -Timeout 60 -ErrorAction SilentlyContinue
+        if (Get-Process -Id $p.ProcessId -ErrorAction SilentlyContinue) {
+            Write-Host "Old process $($p.ProcessId) did not hand over, killing it..."
+            Stop-Process -Id $p.ProcessId -Force
+        }
+    }
+}
+Remove-Item -Path $oldExe -Force -ErrorAction SilentlyContinue
 Write-Host "Done."